@@ -0,0 +1,140 @@
+# Cumuls par année (sommes préfixes) pour répondre aux requêtes sur une période sans nouveau groupement
+import numpy as np
+import pandas as pd
+
+
+def build_cumulative_aggregates(df, key_column, sum_columns, year_column = "startYear"):
+    '''
+    Calcule, pour chaque clé (genre, personne...) et chaque colonne à sommer, les valeurs des seules années
+    où la clé a des données, et leurs sommes cumulées.
+
+    Parameters:
+    ----------
+    df : pandas.DataFrame
+        Données détaillées, avec la colonne clé, la colonne de l'année et les colonnes à sommer.
+    key_column : str
+        Colonne de regroupement (ex. : "genres", "primaryName").
+    sum_columns : list
+        Colonnes dont on veut les sommes sur une période.
+    year_column : str
+        Colonne de l'année.
+
+    Returns:
+    -------
+    dict
+        Dictionnaire contenant :
+        - 'keys' : les clés triées
+        - 'years' : les années, de la première à la dernière des données
+        - 'indptr' : début et fin des années de chaque clé dans 'codes' (CSR) : les années de la clé i
+          sont codes[indptr[i]:indptr[i + 1]]
+        - 'codes' : pour chaque couple (clé, année) ayant des données, triés par clé puis par année,
+          le code i * len(years) + (année - years[0])
+        - 'cumulative' : dictionnaire colonne -> tableau (couples + 1) des sommes cumulées des valeurs
+          des couples, dans l'ordre de 'codes' (entiers pour les colonnes entières, réels sinon)
+
+    Notes:
+    ------
+    La somme d'une colonne sur une période [début, fin] s'obtient en soustrayant deux cumuls, dont les
+    positions sont trouvées par recherche dichotomique (numpy.searchsorted) dans les codes triés. Seuls
+    les couples (clé, année) ayant des données sont stockés, et non un tableau clés x années.
+    Les lignes sans clé (NaN, par exemple un nom "NA" lu par pandas.read_csv) sont ignorées, comme par
+    un groupement pandas.
+    '''
+
+    df = df[df[key_column].notna()]
+    key_codes, keys = pd.factorize(df[key_column], sort = True)
+    years = df[year_column].astype(int).to_numpy()
+    first_year = int(years.min()) if len(years) > 0 else 0
+    last_year = int(years.max()) if len(years) > 0 else -1
+    nb_years = last_year - first_year + 1
+
+    # Couples (clé, année) distincts, triés, et couple de chaque ligne
+    codes, entry_codes = np.unique(key_codes.astype(np.int64) * nb_years + (years - first_year),
+                                   return_inverse = True)
+    entry_codes = entry_codes.ravel()
+    indptr = np.zeros(len(keys) + 1, dtype = np.int64)
+    np.cumsum(np.bincount(codes // max(nb_years, 1), minlength = len(keys)), out = indptr[1:])
+
+    cumulative = {}
+    for column in sum_columns:
+        dtype = np.int64 if pd.api.types.is_integer_dtype(df[column]) else np.float64
+        sums = np.zeros(len(codes) + 1, dtype = dtype)
+        np.add.at(sums, entry_codes + 1, df[column].to_numpy(dtype = dtype))
+        cumulative[column] = np.cumsum(sums)
+
+    return {"keys" : np.asarray(keys), "years" : np.arange(first_year, last_year + 1), "indptr" : indptr,
+            "codes" : codes, "cumulative" : cumulative}
+
+
+def _entry_bounds(aggregates, year_start, year_end):
+    '''
+    Renvoie, pour chaque clé, les positions (début, fin) dans les tableaux de cumuls des couples
+    (clé, année) de la période [year_start, year_end].
+    '''
+
+    years = aggregates["years"]
+    nb_years = len(years)
+    key_offsets = np.arange(len(aggregates["keys"]), dtype = np.int64) * nb_years
+    if nb_years == 0 or year_end < year_start or year_end < years[0] or year_start > years[-1]:
+        return aggregates["indptr"][:-1], aggregates["indptr"][:-1]
+    start = max(year_start, int(years[0])) - int(years[0])
+    end = min(year_end, int(years[-1])) - int(years[0])
+    return (np.searchsorted(aggregates["codes"], key_offsets + start, side = "left"),
+            np.searchsorted(aggregates["codes"], key_offsets + end, side = "right"))
+
+
+def window_sums(aggregates, year_start, year_end):
+    '''
+    Renvoie les sommes de chaque colonne, par clé, sur la période [year_start, year_end] (bornes incluses).
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Une ligne par clé (en index), une colonne par colonne sommée.
+    '''
+
+    start, end = _entry_bounds(aggregates, year_start, year_end)
+    return pd.DataFrame(
+        {column : cumulative[end] - cumulative[start] for column, cumulative in aggregates["cumulative"].items()},
+        index = aggregates["keys"])
+
+
+def yearly_values(aggregates, year_start, year_end, keys = None):
+    '''
+    Renvoie les valeurs de chaque année de la période [year_start, year_end], par clé, sous forme "longue".
+
+    Parameters:
+    ----------
+    aggregates : dict
+        Cumuls renvoyés par build_cumulative_aggregates.
+    year_start, year_end : int
+        Bornes (incluses) de la période.
+    keys : list, optional
+        Clés à conserver (toutes par défaut).
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Une ligne par clé et par année ayant au moins une valeur non nulle, avec la colonne de l'année
+        ("startYear"), la colonne clé ("key") et les colonnes sommées.
+    '''
+
+    start, end = _entry_bounds(aggregates, year_start, year_end)
+    rows = np.arange(len(aggregates["keys"]))
+    if keys is not None:
+        rows = rows[np.isin(aggregates["keys"], list(keys))]
+
+    # Couples (clé, année) de la période pour les clés conservées, et leurs valeurs :
+    # différences entre deux cumuls successifs
+    lengths = end[rows] - start[rows]
+    entries = np.repeat(start[rows] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    first_year = int(aggregates["years"][0]) if len(aggregates["years"]) > 0 else 0
+    nb_years = max(len(aggregates["years"]), 1)
+    codes = aggregates["codes"][entries]
+    df = pd.DataFrame({
+        "startYear" : first_year + codes % nb_years,
+        "key" : aggregates["keys"][codes // nb_years],
+        **{column : cumulative[entries + 1] - cumulative[entries]
+           for column, cumulative in aggregates["cumulative"].items()}})
+    columns = list(aggregates["cumulative"])
+    return df[(df[columns] != 0).any(axis = 1)].reset_index(drop = True)
@@ -5,8 +5,20 @@ import streamlit as st
 import plotly.express as px
 import time
 from PIL import Image
-from sklearn.neighbors import NearestNeighbors
-from sklearn.preprocessing import StandardScaler
+from movie_recommendation import (build_content_index, format_recommendations,
+    recommend_movies_content, recommend_movies_nearest_neighbors, recommend_movies_profile)
+from movie_ingestion import load_title_principals_and_name_basics_out_of_core
+from movie_download import local_path, read_csv_cached, source_version
+from movie_disk_cache import disk_cache, track_version
+from movie_aggregates import build_cumulative_aggregates, window_sums, yearly_values
+from movie_warmup import STATUS_DONE, WarmUp
+from movie_graph import build_cast_graph, collaborators, person_rows, recommend_movies_same_people
+from movie_person_search import build_person_search_index, filmography, search_persons
+from movie_processing import (build_movies_recommendation, group_persons_votes_ratings, keep_processed_movies,
+    process_genres)
+from movie_partitions import DATASET_DIR, current_dataset_dir, imdb_dataset_version, list_regions, read_partitions
+from movie_sources import (DATASET_MIN_YEAR, PATH_NAME_BASICS, PATH_TITLE_AKAS, PATH_TITLE_BASICS,
+    PATH_TITLE_PRINCIPALS, URL_TITLE_RATINGS)
 
 # Changement de la largeur de la page pour l'élargir
 st.set_page_config(layout="wide")
@@ -22,12 +34,52 @@ st.markdown("<h1 style='text-align: center;'>Analyses et recommandations de film
 # Sinon, depuis IMDb ou en local : False
 data_loading_type_from_github = True
 
-@st.cache_data
-def load_and_process_title_akas_and_basics():
+# Chemins des fichiers IMDb (chargement depuis IMDb ou en local) et URL du fichier des notes sur IMDb,
+# à modifier dans movie_sources.py : ils servent aussi à la construction hors ligne du jeu de données partitionné
+path_title_akas = PATH_TITLE_AKAS
+path_title_basics = PATH_TITLE_BASICS
+path_title_principals = PATH_TITLE_PRINCIPALS
+path_name_basics = PATH_NAME_BASICS
+url_title_ratings = URL_TITLE_RATINGS
+
+# URL des fichiers déjà "traités" sur github
+url_github_data = "https://raw.githubusercontent.com/Miche5967/Projet_WCS_02_Systeme_recommandation_films/main/"
+
+# Budget mémoire (en Mo) pour la lecture "out-of-core" des fichiers title.principals et name.basics
+# (partitionnement sur disque puis fusion partition par partition)
+# None : lecture complète des fichiers en mémoire
+ingestion_memory_budget_mb = None
+
+# Dossier du jeu de données partitionné par région et par décennie de sortie,
+# utilisé pour changer de région (marché) dans l'application
+dataset_dir = DATASET_DIR
+
+# Région chargée au démarrage et première année de sortie des films conservés
+default_region = "FR"
+dataset_min_year = DATASET_MIN_YEAR
+
+# Lecture d'un fichier source (csv ou tsv), mise en cache sur le disque et partagée entre les instances
+# de l'application : le fichier n'est relu que s'il a changé (nouvelle version sur le site ou en local).
+# La version revalide le fichier auprès du serveur : les lectures des fonctions mises en cache réutilisent
+# ensuite le fichier du cache sans nouvelle requête (revalidate = False).
+@disk_cache(data_version = lambda path, **kwargs: source_version([path], revalidate = True))
+def read_source_csv(path, **kwargs):
+    return read_csv_cached(path, revalidate = False, **kwargs)
+
+@disk_cache(data_version = lambda *args, **kwargs: source_version([path_title_akas, path_title_basics],
+                                                                  revalidate = True))
+def load_and_process_title_akas_and_basics(region = default_region, min_year = dataset_min_year):
     '''
     Charge et traite les données de 2 fichiers lus sur le site d'IMDb, puis renvoie un DataFrame pandas
     contenant les données pertinentes.
 
+    Parameters:
+    ----------
+    region : str
+        Code de la région dans laquelle les films sont distribués.
+    min_year : int
+        Première année de sortie des films conservés.
+
     Returns:
     -------
     pandas.DataFrame
@@ -40,9 +92,10 @@ def load_and_process_title_akas_and_basics():
     spécifiées du site IMDb. Les colonnes pertinentes sont sélectionnées pour chaque fichier,
     puis les données sont filtrées et traitées. Les deux DataFrames résultants sont fusionnés
     et les colonnes inutiles sont supprimées. Le DataFrame final contient les titres de films
-    distribués en France à partir de 1980, avec les colonnes suivantes :
+    distribués dans la région à partir de min_year (en France à partir de 1980 par défaut),
+    avec les colonnes suivantes :
     - 'tconst': Identifiant unique du titre
-    - 'title': Titre du film (en France)
+    - 'title': Titre du film (dans la région)
     - 'startYear': Année de sortie du film
     - 'runtimeMinutes': Durée du film en minutes
     - 'genres': Genres du film
@@ -58,18 +111,16 @@ def load_and_process_title_akas_and_basics():
     df_title_akas_fr_trim = pd.DataFrame()
     
     # Lecture du fichier title.akas.tsv.gz avec des chunks
-    #path_akas = r"https://datasets.imdbws.com/title.akas.tsv.gz"
-    path_akas = r"C:/Données/d_ Wild Code School/d_ Projet 02/datasets/title_akas.tsv"
-    df_chunks_akas = pd.read_csv(
-    	path_akas, usecols = columns_to_include_akas,
+    df_chunks_akas = read_csv_cached(
+    	path_title_akas, revalidate = False, usecols = columns_to_include_akas,
     	dtype = {'titleId': 'string', 'title': 'string', 'region': 'string'}, delimiter = '\t',
     	chunksize = chunksize)
     
     for chunk in df_chunks_akas:
         # Filtrer et traiter chaque morceau
         
-        # Filtre sur la colonne "region" pour ne garder que la valeur "FR"
-        chunk = chunk[chunk["region"] == "FR"]
+        # Filtre sur la colonne "region" pour ne garder que la région choisie ("FR" par défaut)
+        chunk = chunk[chunk["region"] == region]
 
         # Suppression de la colonne "region"
         chunk.drop(columns = "region", inplace = True)
@@ -84,10 +135,8 @@ def load_and_process_title_akas_and_basics():
     df_title_basics_recent_years = pd.DataFrame()
     
     # Lecture du fichier title.basics.tsv.gz avec des chunks
-    #path_basics = r"https://datasets.imdbws.com/title.basics.tsv.gz"
-    path_basics = r"C:/Données/d_ Wild Code School/d_ Projet 02/datasets/title_basics.tsv"
-    df_chunks = pd.read_csv(
-        path_basics, usecols = columns_to_include_basics,
+    df_chunks = read_csv_cached(
+        path_title_basics, revalidate = False, usecols = columns_to_include_basics,
         dtype = {'tconst': 'string', 'titleType': 'string', 'startYear': 'string',
                  'runtimeMinutes': 'string', 'genres': 'string'},
         delimiter = '\t', low_memory = False, chunksize = chunksize)
@@ -101,8 +150,8 @@ def load_and_process_title_akas_and_basics():
         # Changement de type de données de la colonne "startYear", passage en type "integer"
         chunk["startYear"] = chunk["startYear"].astype("int32")
         
-        # Filtre sur la colonne "startYear" pour ne garder que les années à partir de 1980
-        chunk = chunk[chunk["startYear"] >= 1980]
+        # Filtre sur la colonne "startYear" pour ne garder que les années à partir de min_year (1980 par défaut)
+        chunk = chunk[chunk["startYear"] >= min_year]
         
         # Filtre sur la colonne "titleType" pour ne garder les titres de type "movie"
         chunk = chunk[chunk["titleType"] == "movie"]
@@ -138,93 +187,6 @@ def load_and_process_title_akas_and_basics():
     # Renvoi du DataFrame traité
     return df_movie_fr_recent_years_trim
 
-@st.cache_data
-def process_genres(df):
-    '''
-    Extrait les différents genres à partir du DataFrame donné, transforme la chaîne représentant les genres
-    en liste, supprime certaines lignes en fonction des genres spécifiés, et renvoie un DataFrame des genres.
-
-    Parameters:
-    ----------
-    df : pandas.DataFrame
-        DataFrame contenant les données traitées avec une colonne "genres" représentant les genres de chaque film.
-
-    Returns:
-    -------
-    Tuple[pandas.DataFrame, pandas.DataFrame]
-        Un tuple contenant deux DataFrames :
-        - Le premier DataFrame est une copie du DataFrame d'entrée avec les modifications suivantes :
-            - La colonne "genres" est convertie en listes de genres.
-            - Les lignes contenant des genres spécifiés à supprimer sont supprimées.
-        - Le deuxième DataFrame contient les genres et le nombre d'occurrences de chaque genre.
-
-    Notes:
-    ------
-    La fonction extrait les différents genres présents dans la colonne "genres" du DataFrame donné.
-    Elle transforme la chaîne de genres en une liste de genres. Ensuite, elle crée un dictionnaire
-    qui associe chaque genre à son nombre d'occurrences. Un DataFrame des genres est ensuite créé à
-    partir du dictionnaire, trié par le nombre d'occurrences décroissant. Enfin, la fonction supprime
-    les lignes du DataFrame d'entrée qui contiennent certains genres spécifiés à supprimer, et renvoie
-    le DataFrame modifié ainsi que le DataFrame des genres.
-    '''
-
-    # Création d'une copie du DataFrame et reset des index
-    df_copy = df.copy()
-    df_copy.reset_index(inplace = True, drop = True)
-    df_copy["genres"] = df_copy["genres"].astype("object")
-
-    # Initialisation d'un dictionnaire qui va servir à lister les genres présents, avec :
-        # chaque clé est un genre
-        # chaque valeur est la nombre d'occurences de ce genre
-    dict_genres = {}
-
-    list_tmp = [] # liste temporaire utilisée dans la boucle
-    nb_movies = len(df_copy) # Nbre de films
-
-    # Boucle sur les films de notre DataFrame ..._copy
-    for i in range(nb_movies):
-        list_tmp = df_copy["genres"][i].split(",")
-            # Affectation la liste des genres de la ligne courant à la ligne temp
-        df_copy["genres"][i] = list_tmp
-            # Remplacement de la valeur dans la colonne "genres" par cette liste de genres
-        # Vérification, pour chaque genre de cette liste, s'il est déjà présent dans le dictionnaire
-        for str_genre in list_tmp:
-            if not str_genre in dict_genres:
-                # Si le genre n'est pas dans le dictionnaire, on l'ajoute
-                dict_genres[str_genre] = 1
-            else:
-                # Si le genre est déjà dans le dictionnaire, on incrémente son nombre d'occurences
-                dict_genres[str_genre] += 1
-    
-    # Création d'un DataFrame des genres
-    df_genres = pd.DataFrame.from_dict(dict_genres, orient = 'index', columns = ['Occurences'])
-    df_genres.sort_values(by = "Occurences", ascending = False, inplace = True)
-    df_genres.reset_index(inplace = True)
-    df_genres.rename(columns = {"index" : "Genre"}, inplace = True)
-    df_genres["Selected"] = False
-    
-    # Changement de type de données de la colonne "Genre", passage en type "string"
-    df_genres["Genre"] = df_genres["Genre"].astype("string")
-
-    # Liste des genres que l'on veut supprimer
-    list_genres_to_delete = ['Adult','News', 'Reality-TV', 'Talk-Show', 'Short', 'Game-Show']
-
-    # Ajout d'une colonne "genres_to_delete" montrant s'il y a l'un des genres à supprimer dans la colonne "genres" (True)
-    df_copy["genres_to_delete"] = df_copy.genres.apply(lambda x : any(gen in x for gen in list_genres_to_delete))
-    
-    # Suppression des lignes pour lesquelles "genres_to_delete" est True, c'est-à-dire
-    # les lignes ayant un genre que l'on veut supprimer
-    df_copy.drop(df_copy[df_copy.genres_to_delete == True].index, inplace = True)
-    
-    # Reset des index
-    df_copy.reset_index(inplace = True, drop = True)
-    
-    # Suppression de la colonne temporaire "genres_to_delete"
-    df_copy.drop("genres_to_delete", axis = 1, inplace = True)
-    
-    return df_copy, df_genres
-
-@st.cache_data
 def load_and_process_title_ratings():
     '''
     Charge et les données du fichier des "ratings"" lu sur le site d'IMDb, puis renvoie un
@@ -238,16 +200,17 @@ def load_and_process_title_ratings():
     Notes:
     ------
     La fonction charge le fichier title.ratings.tsv.gz à partir de l'URL spécifiée du site
-    IMDb. Le DataFrame final contient toutes les données des notes et votes pour tous
-    les titres.
+    IMDb, en passant par le cache local des téléchargements : le fichier n'est transféré que s'il a
+    changé sur le site depuis le dernier téléchargement. Le DataFrame final contient toutes les
+    données des notes et votes pour tous les titres.
     '''
 
-    df_title_ratings = pd.read_csv(r"https://datasets.imdbws.com/title.ratings.tsv.gz",
-                                   delimiter = '\t', low_memory = False)
+    df_title_ratings = read_source_csv(url_title_ratings, delimiter = '\t', low_memory = False)
     return df_title_ratings
 
-@st.cache_data
-def load_and_process_title_principals_and_name_basics():
+@disk_cache(data_version = lambda *args, **kwargs: source_version([path_title_principals, path_name_basics],
+                                                                  revalidate = True))
+def load_and_process_title_principals_and_name_basics(df_title_ratings):
     # Définition des "chunks"
     chunksize = 600000
     
@@ -258,10 +221,8 @@ def load_and_process_title_principals_and_name_basics():
     df_title_principals = pd.DataFrame()
     
     # Lecture du fichier csv title.principals.tsv avec des chunks
-    #path_principals = r"https://datasets.imdbws.com/title.principals.tsv.gz"
-    path_principals = r"C:/Données/d_ Wild Code School/d_ Projet 02/datasets/title_principals.tsv"
-    df_chunks_principals = pd.read_csv(
-        path_principals, usecols = columns_to_include_principals,
+    df_chunks_principals = read_csv_cached(
+        path_title_principals, revalidate = False, usecols = columns_to_include_principals,
         dtype = {'tconst': 'string', 'nconst': 'string', 'category': 'category'}, delimiter = '\t',
         chunksize = chunksize)
     
@@ -294,10 +255,8 @@ def load_and_process_title_principals_and_name_basics():
     df_name_basics = pd.DataFrame()
     
     # Lecture du fichier csv name.basics.tsv avec des chunks
-    #path_principals = r"https://datasets.imdbws.com/name.basics.tsv.gz"
-    path_principals = r"C:/Données/d_ Wild Code School/d_ Projet 02/datasets/name_basics.tsv"
-    df_chunks_name = pd.read_csv(
-        path_principals, usecols = columns_to_include_name,
+    df_chunks_name = read_csv_cached(
+        path_name_basics, revalidate = False, usecols = columns_to_include_name,
         dtype = {'nconst': 'string', 'primaryName': 'string'}, delimiter = '\t', chunksize = chunksize)
     
     for chunk in df_chunks_name:
@@ -324,44 +283,50 @@ def load_and_process_title_principals_and_name_basics():
     
     return df_actors_movies_ratings, df_directors_movies_ratings
 
-@st.cache_data
+@disk_cache(data_version = lambda *args, **kwargs: source_version([path_title_principals, path_name_basics],
+                                                                  revalidate = True))
+def load_and_process_title_principals_and_name_basics_out_of_core(df_title_ratings, memory_budget_mb, df_movies):
+    # Même résultat que load_and_process_title_principals_and_name_basics, limité aux films de df_movies,
+    # avec une mémoire bornée par memory_budget_mb
+    return load_title_principals_and_name_basics_out_of_core(
+        local_path(path_title_principals, revalidate = False), local_path(path_name_basics, revalidate = False),
+        df_title_ratings,
+        memory_budget_mb = memory_budget_mb, tconst_filter = df_movies["tconst"])
+
 def load_movies_fr_recent_years_from_github():
-	with st.spinner('Import de du fichier movies_fr_recent_years.csv'):
-		df_movie_fr_recent_years = pd.read_csv(
-			"https://raw.githubusercontent.com/Miche5967/Projet_WCS_02_Systeme_recommandation_films/main/movies_fr_recent_years.csv")
+	df_movie_fr_recent_years = read_source_csv(url_github_data + "movies_fr_recent_years.csv")
 	return df_movie_fr_recent_years
 
-@st.cache_data
 def load_movies_fr_recent_years_trim_from_github():
-	with st.spinner('Import de du fichier movies_fr_recent_years_trim.csv'):
-		df_movie_fr_recent_years_trim = pd.read_csv(
-			"https://raw.githubusercontent.com/Miche5967/Projet_WCS_02_Systeme_recommandation_films/main/movies_fr_recent_years_trim.csv")
+	df_movie_fr_recent_years_trim = read_source_csv(url_github_data + "movies_fr_recent_years_trim.csv")
 	return df_movie_fr_recent_years_trim
 
-@st.cache_data
 def load_genres_from_github():
-	df_genres = pd.read_csv("https://raw.githubusercontent.com/Miche5967/Projet_WCS_02_Systeme_recommandation_films/main/genres.csv")
+	df_genres = read_source_csv(url_github_data + "genres.csv")
 	return df_genres
 
-@st.cache_data
 def load_movies_fr_from_1980_actors_from_github():
-	with st.spinner('Import de du fichier movies_fr_from_1980_actors_ratings.csv'):
-		df_movie_in_FR_from_1980_actor_rating = pd.read_csv(
-			"https://raw.githubusercontent.com/Miche5967/Projet_WCS_02_Systeme_recommandation_films/main/movies_fr_from_1980_actors_ratings.csv")
+	df_movie_in_FR_from_1980_actor_rating = read_source_csv(url_github_data + "movies_fr_from_1980_actors_ratings.csv")
 	return df_movie_in_FR_from_1980_actor_rating
 
-@st.cache_data
 def load_movies_fr_from_1980_directors_from_github():
-	with st.spinner('Import de du fichier movies_fr_from_1980_directors_ratings.csv'):
-		df_movies_Fr_from_1980_director_rating = pd.read_csv(
-			"https://raw.githubusercontent.com/Miche5967/Projet_WCS_02_Systeme_recommandation_films/main/movies_fr_from_1980_directors_ratings.csv")
+	df_movies_Fr_from_1980_director_rating = read_source_csv(url_github_data + "movies_fr_from_1980_directors_ratings.csv")
 	return df_movies_Fr_from_1980_director_rating
 
-# Top des x acteurs ayant le plus de votes, classés par note moyenne
-@st.cache_data
-def top_actors(nb_top_actors, sort_by_rating = False):
+# Top des x acteurs ayant le plus de votes, classés par note moyenne. Le classement et les cumuls par année
+# de la région sont passés en arguments : ils sont identifiés dans la clé du cache sur le disque par la clé
+# de leur calcul (voir track_version), sans hachage de leur contenu
+@disk_cache()
+def top_actors(df_group_actors_votes_ratings, actors_aggregates, nb_top_actors, sort_by_rating = False,
+	year_start = None, year_end = None):
+	# Votes et notes des acteurs sur toutes les années, ou sur la période choisie à partir des cumuls par année
+	if year_start is None:
+		df_actors_votes_ratings = df_group_actors_votes_ratings
+	else:
+		df_actors_votes_ratings = window_persons_votes_ratings(actors_aggregates, year_start, year_end)
+
 	# Définition d'un "top" des acteurs ayant le plus de votes
-	df_actors_with_more_votes = df_group_actors_votes_ratings.sort_values(
+	df_actors_with_more_votes = df_actors_votes_ratings.sort_values(
 		by = ['numVotes'], ascending = False).head(nb_top_actors)
 
 	# Classement de ces acteurs ayant le plus de votes par le note moyenne pondérée
@@ -372,11 +337,18 @@ def top_actors(nb_top_actors, sort_by_rating = False):
 
 	return df_top_actors
 
-# Top des x rélisateurs ayant le plus de vote classés par note moyenne
-@st.cache_data
-def top_directors(nb_top_directors, sort_by_rating = False):
+# Top des x rélisateurs ayant le plus de vote classés par note moyenne (mêmes clés du cache que top_actors)
+@disk_cache()
+def top_directors(df_group_directors_votes_ratings, directors_aggregates, nb_top_directors, sort_by_rating = False,
+	year_start = None, year_end = None):
+	# Votes et notes des réalisateurs sur toutes les années, ou sur la période choisie à partir des cumuls par année
+	if year_start is None:
+		df_directors_votes_ratings = df_group_directors_votes_ratings
+	else:
+		df_directors_votes_ratings = window_persons_votes_ratings(directors_aggregates, year_start, year_end)
+
 	# Définition d'un "top" des réalisateurs ayant le plus de votes
-	df_directors_with_more_votes = df_group_directors_votes_ratings.sort_values(
+	df_directors_with_more_votes = df_directors_votes_ratings.sort_values(
 		by = ['numVotes'], ascending = False).head(nb_top_directors)
 
 	# Classement de ces réalisateurs ayant le plus de votes par le note moyenne pondérée
@@ -388,25 +360,228 @@ def top_directors(nb_top_directors, sort_by_rating = False):
 
 	return df_top_directors
 
+# Les calculs rapides (fusion, groupement, cumuls des personnes, graphe) ne sont pas mis en cache sur le disque :
+# les relire coûterait autant que les refaire. Leurs résultats sont seulement marqués par la clé de l'appel,
+# pour identifier sans hachage de leur contenu les arguments des fonctions mises en cache.
+
+# Fusion des notes des films des personnes (acteurs ou réalisateurs) avec le DataFrame des films
+@track_version()
+def merge_movies_persons_ratings(df_movies, df_persons_movies_ratings):
+	df_movies_persons_rating = pd.merge(left = df_movies, right = df_persons_movies_ratings, how = "inner",
+		left_on = "tconst", right_on = "tconst")
+
+	# Ajout d'une colonne "weighted_rating" pour le calcul de la moyenne pondérée des notes des films
+	df_movies_persons_rating['weighted_rating'] = \
+		df_movies_persons_rating['averageRating'] * df_movies_persons_rating['numVotes']
+
+	# Ajout d'une colonne "nb_movies" pour le calcul du nombre de films par personne
+	df_movies_persons_rating['nb_movies'] = 1
+
+	return df_movies_persons_rating
+
+# Cumuls par année, et par genre, des votes, des notes pondérées, des nombres de films et des durées
+@disk_cache()
+def build_genres_cumulative_aggregates(df_movies_trim, df_title_ratings):
+	# Création d'un DataFrame avec la colonne "genres" éclatée
+	df_movies_exploded = df_movies_trim.explode(column = "genres")
+	df_movies_exploded["genres"] = df_movies_exploded["genres"].astype("string")
+
+	# Jointure avec les notes, pour ne garder que les films dont les notes et nombres de votes sont disponibles
+	df_years_genres_ratings = pd.merge(left = df_movies_exploded, right = df_title_ratings, how = 'inner',
+		left_on = "tconst", right_on = "tconst")
+
+	# Nouvelles colonnes "weighted_rating" et "nbMovies" pour le calcul des moyennes pondérées et des nombres de films
+	df_years_genres_ratings["weighted_rating"] = df_years_genres_ratings.averageRating * df_years_genres_ratings.numVotes
+	df_years_genres_ratings["nbMovies"] = 1
+
+	return build_cumulative_aggregates(df_years_genres_ratings, "genres",
+		["numVotes", "weighted_rating", "nbMovies", "runtimeMinutes"])
+
+# Cumuls par année, et par personne, des votes, des notes pondérées et des nombres de films
+@track_version()
+def build_persons_cumulative_aggregates(df_movies_persons_rating):
+	return build_cumulative_aggregates(df_movies_persons_rating, "primaryName",
+		["numVotes", "weighted_rating", "nb_movies"])
+
+# Moyenne pondérée des notes des films par personne sur une période, à partir des cumuls par année
+def window_persons_votes_ratings(aggregates, year_start, year_end):
+	df_window_persons_votes_ratings = window_sums(aggregates, year_start, year_end)
+
+	# Suppression des personnes sans film sur la période
+	df_window_persons_votes_ratings = df_window_persons_votes_ratings[
+		df_window_persons_votes_ratings["nb_movies"] > 0].astype({"numVotes" : int, "nb_movies" : int})
+
+	# Calcul de la moyenne des notes pondérée en divisant weighted_rating par le nombre de votes
+	df_window_persons_votes_ratings["weighted_rating"] = \
+		df_window_persons_votes_ratings["weighted_rating"] / df_window_persons_votes_ratings["numVotes"]
+
+	# Nom de la personne en colonne, comme dans group_persons_votes_ratings
+	return df_window_persons_votes_ratings.rename_axis("primaryName").reset_index()[
+		["primaryName", "numVotes", "weighted_rating", "nb_movies"]]
+
+# Graphe films - personnes (acteurs et réalisateurs), en tableaux CSR d'identifiants entiers
+@track_version()
+def build_collaboration_graph(df_movies_actors_rating, df_movies_directors_rating):
+	return build_cast_graph(df_movies_actors_rating, df_movies_directors_rating)
+
+# Index de recherche des personnes par nom, avec la liste des films de chaque personne
+@disk_cache()
+def build_person_index(graph, df_movies_actors_rating, df_movies_directors_rating):
+	return build_person_search_index(graph, pd.concat([df_movies_actors_rating, df_movies_directors_rating]))
+
+# Tableau des collaborateurs d'une personne, par nombre de films en commun
+def collaborators_table(graph, name, role):
+	return collaborators(graph, person_rows(graph, name), role = role)[["primaryName", "nb_movies"]]
+
 def keep_on_movie_analyse_page():
 	st.session_state.radio = 'Analyses de films'
 
-with st.spinner('Merci de patienter pendant le chargement des données. Cela peut prendre plusieurs minutes...'):
+# Version du jeu de données partitionné de toutes les régions construite hors ligne depuis les fichiers IMDb
+# (python movie_partitions.py), si elle correspond aux fichiers sources actuels. Renvoie son dossier, ou None.
+def find_imdb_dataset():
+	return current_dataset_dir(dataset_dir, imdb_dataset_version(path_title_akas, path_title_basics,
+		path_title_principals, path_name_basics, url_title_ratings))
+
+# Table d'une région lue dans une version du jeu de données partitionné, à partir de dataset_min_year
+@track_version(data_version = lambda *args, **kwargs: dataset_min_year)
+def read_region_table(version_dir, table, region):
+	df = read_partitions(version_dir, table, region, year_min = dataset_min_year)
+	return df.drop(columns = "startYear") if table == "ratings" else df
+
+# Tables dérivées des films, des notes, des acteurs et des réalisateurs d'une région, calculées en arrière-plan
+def derived_tables():
+	return {
+		"Classement des acteurs" : (group_persons_votes_ratings, ["Acteurs"]),
+		"Classement des réalisateurs" : (group_persons_votes_ratings, ["Réalisateurs"]),
+		"Cumuls des genres" : (
+			lambda movies_genres, df_title_ratings: build_genres_cumulative_aggregates(movies_genres[0], df_title_ratings),
+			["Genres", "Notes"]),
+		"Cumuls des acteurs" : (build_persons_cumulative_aggregates, ["Acteurs"]),
+		"Cumuls des réalisateurs" : (build_persons_cumulative_aggregates, ["Réalisateurs"]),
+		"Graphe des collaborations" : (build_collaboration_graph, ["Acteurs", "Réalisateurs"]),
+		"Index des personnes" : (build_person_index, ["Graphe des collaborations", "Acteurs", "Réalisateurs"]),
+		"Films à recommander" : (build_movies_recommendation,
+			["Acteurs", "Réalisateurs", "Classement des acteurs", "Classement des réalisateurs"])}
+
+# Préparation des données d'une autre région en arrière-plan, depuis une version du jeu de données partitionné
+# (seules les partitions de la région, à partir de dataset_min_year, sont lues) : une seule fois par région
+# et par processus serveur, partagée sans copie par toutes les sessions
+@st.cache_resource(max_entries = 4)
+def start_region_warm_up(region, version_dir):
+	sources = {
+		"Films" : lambda: read_region_table(version_dir, "movies", region),
+		"Notes" : lambda: read_region_table(version_dir, "ratings", region),
+		"Acteurs (jeu de données)" : lambda: read_region_table(version_dir, "actors", region),
+		"Réalisateurs (jeu de données)" : lambda: read_region_table(version_dir, "directors", region)}
+	derived = {
+		"Genres" : (process_genres, ["Films"]),
+		"Acteurs" : (keep_processed_movies, ["Genres", "Acteurs (jeu de données)"]),
+		"Réalisateurs" : (keep_processed_movies, ["Genres", "Réalisateurs (jeu de données)"])}
+	derived.update(derived_tables())
+	return WarmUp(sources, derived).start()
+
+# Préchargement des données : une seule fois par processus serveur, partagé par toutes les sessions.
+# Les sources sont chargées en parallèle, puis les tables dérivées sont calculées en arrière-plan
+# dès que leurs données sont disponibles.
+@st.cache_resource
+def start_warm_up():
 	if data_loading_type_from_github:
-		df_movie_fr_recent_years = load_movies_fr_recent_years_from_github()
-		df_movie_fr_recent_years_trim, df_genres = process_genres(df_movie_fr_recent_years)
-		df_title_ratings = load_and_process_title_ratings()
-		df_movie_in_FR_from_1980_actor_rating = load_movies_fr_from_1980_actors_from_github()
-		df_movies_Fr_from_1980_director_rating = load_movies_fr_from_1980_directors_from_github()
+		sources = {
+			"Films" : load_movies_fr_recent_years_from_github,
+			"Notes" : load_and_process_title_ratings,
+			"Acteurs" : load_movies_fr_from_1980_actors_from_github,
+			"Réalisateurs" : load_movies_fr_from_1980_directors_from_github}
+		derived = {"Genres" : (process_genres, ["Films"])}
 	else:
-		df_movie_fr_recent_years = load_and_process_title_akas_and_basics()
-		df_movie_fr_recent_years_trim, df_genres = process_genres(df_movie_fr_recent_years)
-		df_title_ratings = load_and_process_title_ratings()
-		df_actors_movies_ratings, df_directors_movies_ratings = load_and_process_title_principals_and_name_basics()
+		sources = {
+			"Films" : load_and_process_title_akas_and_basics,
+			"Notes" : load_and_process_title_ratings}
+		derived = {"Genres" : (process_genres, ["Films"])}
+		if ingestion_memory_budget_mb is None:
+			derived["Acteurs et réalisateurs"] = (load_and_process_title_principals_and_name_basics, ["Notes"])
+		else:
+			derived["Acteurs et réalisateurs"] = (
+				lambda df_title_ratings, movies_genres: load_and_process_title_principals_and_name_basics_out_of_core(
+					df_title_ratings, ingestion_memory_budget_mb, movies_genres[0]),
+				["Notes", "Genres"])
+		derived["Acteurs"] = (
+			lambda movies_genres, persons: merge_movies_persons_ratings(movies_genres[0], persons[0]),
+			["Genres", "Acteurs et réalisateurs"])
+		derived["Réalisateurs"] = (
+			lambda movies_genres, persons: merge_movies_persons_ratings(movies_genres[0], persons[1]),
+			["Genres", "Acteurs et réalisateurs"])
+	derived.update(derived_tables())
+	return WarmUp(sources, derived).start()
+
+def wait_for_warm_up(region_warm_up, names):
+	# Affichage de l'état de préparation des données tant que celles demandées ne sont pas disponibles
+	if region_warm_up.is_ready(names):
+		return
+	placeholder = st.empty()
+	while not region_warm_up.is_ready(names):
+		with placeholder.container():
+			st.progress(region_warm_up.progress(), text = "Préparation des données...")
+			st.markdown("  \n".join(f"{name} : {status}" for name, status in region_warm_up.status().items()))
+		time.sleep(0.2)
+	placeholder.empty()
+
+def get_table(name):
+	# Table de la région choisie, préparée en arrière-plan : au démarrage du serveur pour la région par défaut,
+	# au premier choix de la région pour les autres. L'état de préparation est affiché si elle n'est pas prête.
+	wait_for_warm_up(region_warm_up, [name])
+	return region_warm_up.result(name)
+
+# Les tâches en erreur (réseau, fichier manquant...) sont relancées à chaque exécution du script,
+# comme les fonctions de chargement mises en cache par st.cache_data, qui ne gardent pas les erreurs
+warm_up = start_warm_up()
+warm_up.retry_failed()
+
+# Jeu de données des autres régions, construit hors ligne depuis les fichiers IMDb (quel que soit le mode de chargement
+# de la région par défaut). Recherché à chaque exécution du script (quelques lectures de fichiers) : une nouvelle
+# construction est reprise sans redémarrer le serveur. La version dépend du fichier des notes, téléchargé au préchargement.
+imdb_dataset_dir = find_imdb_dataset() if warm_up.status()["Notes"] == STATUS_DONE else None
+
+# Choix de la région (marché) parmi celles du jeu de données partitionné
+list_regions_available = [default_region]
+if imdb_dataset_dir is not None:
+	list_regions_available = sorted(set(list_regions(imdb_dataset_dir)) | {default_region})
+selected_region = st.sidebar.selectbox("Région", list_regions_available,
+	index = list_regions_available.index(default_region))
+if warm_up.status()["Notes"] == STATUS_DONE and imdb_dataset_dir is None:
+	st.sidebar.caption("Autres régions indisponibles : jeu de données à construire avec `python movie_partitions.py`")
+
+# Préparation des données de la région choisie
+if selected_region == default_region:
+	region_warm_up = warm_up
+else:
+	region_warm_up = start_region_warm_up(selected_region, imdb_dataset_dir)
+	region_warm_up.retry_failed()
+
+df_movie_fr_recent_years = get_table("Films")
+df_movie_fr_recent_years_trim, df_genres = get_table("Genres")
+df_title_ratings = get_table("Notes")
 
-if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de films'), key = "radio") == 'Analyses de films':
+# Copie du DataFrame des genres, partagé entre les sessions et modifié par les cases à cocher
+df_genres = df_genres.copy()
+
+page = st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de films', 'Recherche de personnes'),
+	key = "radio")
+
+if page == 'Analyses de films':
 	st.header("Analyses de films")
 
+	# Choix de la période d'analyse (années de sortie des films)
+	genres_aggregates = get_table("Cumuls des genres")
+	year_first, year_last = int(genres_aggregates["years"][0]), int(genres_aggregates["years"][-1])
+	year_start, year_end = st.slider("Période (années de sortie)", min_value = year_first, max_value = year_last,
+		value = (year_first, year_last), key = "slider_years", on_change = keep_on_movie_analyse_page)
+
+	# Période des classements des acteurs et réalisateurs (None : toutes les années, classement précalculé)
+	if (year_start, year_end) == (year_first, year_last):
+		period_start, period_end = None, None
+	else:
+		period_start, period_end = year_start, year_end
+
 	tab_genres, tab_actors, tab_directors = st.tabs(["Genres", "Actors/Actresses", "Directors"])
 
 	with tab_genres:
@@ -464,46 +639,31 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 			chk_Western = st.checkbox("Western", key = "chk_western", on_change = keep_on_movie_analyse_page)
 			df_genres.loc[df_genres["Genre"] == "Western", "Selected"] = chk_Western
 
-		# Création d'un DataFrame avec la colonne "genres" éclatée
-		df_movie_title_fr_recent_years_exploded = df_movie_fr_recent_years_trim.explode(column = "genres")
-		df_movie_title_fr_recent_years_exploded["genres"] = df_movie_title_fr_recent_years_exploded["genres"].astype("string")
-
-		# Création d'un DataFrame des genres ne contenant que les genres à conserver
-		df_genres_trim = df_genres.loc[df_genres.Selected]
-
-		# Création d'un DataFrame avec uniquement les genres à conserver définis plus haut
-		df_movie_title_fr_recent_years_exploded_trim = df_movie_title_fr_recent_years_exploded.loc[
-			df_movie_title_fr_recent_years_exploded["genres"].isin(df_genres_trim["Genre"])]
-
-		# Création d'un nouveau DataFrame comme résultat de cette jointure
-		# Merge de type inner join (how = 'inner') sur les champs "tconst" de chaque table
-		# pour récupérer les lignes pour lesquelles les notes et nombes de votes sont disponibles.
-		df_movie_title_fr_recent_years_exploded_ratings = pd.merge(
-		    left = df_movie_title_fr_recent_years_exploded_trim, right = df_title_ratings, how = 'inner',
-		    left_on = "tconst", right_on = "tconst")
-
-		# Groupement des données par genre et année et aggréagation
-		# Création d'un nouveau DataFrame pour ne conserver que les colonnes qui nous intéressent
-		df_years_genres_ratings = df_movie_title_fr_recent_years_exploded_ratings[
-			["startYear", "genres", "runtimeMinutes", "averageRating", "numVotes"]]
-
-		# Nouvelle colonne "weighted_rating" pour le calcul des moyennes pondérées
-		df_years_genres_ratings["weighted_rating"] = df_years_genres_ratings.averageRating * df_years_genres_ratings.numVotes
-
-		# Nouvelle colonne "nbMovies" pour le calcul du nombre de films par catégorie
-		df_years_genres_ratings["nbMovies"] = 1
-
-		# Création d'un nouveau DataFrame df_group_years_genres en groupant les données du précédent par année et par genre
-		# avec comme aggrégation les somme des nombres de votes et des valeurs de la nouvelle colonne weighted_rating"
-		df_group_years_genres = df_years_genres_ratings.groupby(
-		    by = ["startYear", "genres"]).agg(
-		    {"numVotes" : "sum", "weighted_rating" : "sum", "nbMovies": "sum", "runtimeMinutes" : "mean"})
+		# Valeurs par année et par genre sur la période choisie, pour les genres sélectionnés,
+		# obtenues par différence des cumuls par année (sans nouveau groupement des données)
+		df_group_years_genres_to_plot = yearly_values(genres_aggregates, year_start, year_end,
+			keys = df_genres.loc[df_genres.Selected, "Genre"]).rename(columns = {"key" : "genres"})
 
 		# Division de la colonne "weighted_rating"  par le nombre de vote pour calculer la moyenne pondérée
-		df_group_years_genres.weighted_rating = df_group_years_genres.weighted_rating / df_group_years_genres.numVotes
-
-		# Création d'un DataFrame pour le tracé, en ré-initialisant les index
-		df_group_years_genres_to_plot = df_group_years_genres.reset_index()
+		df_group_years_genres_to_plot["weighted_rating"] = \
+			df_group_years_genres_to_plot["weighted_rating"] / df_group_years_genres_to_plot["numVotes"]
+
+		# Division de la colonne "runtimeMinutes" par le nombre de films pour calculer la durée moyenne
+		df_group_years_genres_to_plot["runtimeMinutes"] = \
+			df_group_years_genres_to_plot["runtimeMinutes"] / df_group_years_genres_to_plot["nbMovies"]
+
+		# Synthèse par genre sur toute la période choisie (différence de deux colonnes des cumuls)
+		df_genres_period = window_sums(genres_aggregates, year_start, year_end)
+		df_genres_period = df_genres_period[df_genres_period.index.isin(df_genres.loc[df_genres.Selected, "Genre"])]
+		df_genres_period["weighted_rating"] = df_genres_period["weighted_rating"] / df_genres_period["numVotes"]
+		df_genres_period["runtimeMinutes"] = df_genres_period["runtimeMinutes"] / df_genres_period["nbMovies"]
+		df_genres_period = df_genres_period.astype({"numVotes" : int, "nbMovies" : int}).sort_values(
+			by = "nbMovies", ascending = False)
+
+		st.markdown(f"### Synthèse des genres de {year_start} à {year_end}")
+		st.dataframe(df_genres_period.rename_axis("genres").rename(columns = {
+			"numVotes" : "Nombre de votes", "weighted_rating" : "Moyenne pondérée", "nbMovies" : "Nombre de films",
+			"runtimeMinutes" : "Durée moyenne"}))
 
 		
 		### Tracés ###
@@ -526,7 +686,7 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 		fig_2.update_layout(title = {'y': 0.9, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top',
 			'font' : dict(size = 24)}, plot_bgcolor = 'white', yaxis=dict(range=[4, max(df_group_years_genres_to_plot['weighted_rating'])]))
 		fig_2.update_xaxes(ticks = 'outside', showline = True, linecolor = 'black', linewidth = 2,
-			gridcolor = 'lightgrey', griddash = 'dash', range=[1979, 2023])
+			gridcolor = 'lightgrey', griddash = 'dash', range=[year_start - 1, year_end + 1])
 		fig_2.update_yaxes(ticks = 'outside', showline = True, linecolor = 'black', linewidth = 2,
 			gridcolor = 'lightgrey', griddash = 'dash')
 
@@ -544,7 +704,7 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 		fig_1.update_layout(title = {'y': 0.9, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top',
 			'font' : dict(size = 24)}, plot_bgcolor = 'white')
 		fig_1.update_xaxes(ticks = 'outside', showline = True, linecolor = 'black', linewidth = 2,
-			gridcolor = 'lightgrey', griddash = 'dash', range=[1979, 2023])
+			gridcolor = 'lightgrey', griddash = 'dash', range=[year_start - 1, year_end + 1])
 		fig_1.update_yaxes(ticks = 'outside', showline = True, linecolor = 'black', linewidth = 2,
 			gridcolor = 'lightgrey', griddash = 'dash')
 
@@ -563,7 +723,7 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 		fig_3.update_layout(title = {'y': 0.9, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top',
 			'font' : dict(size = 24)}, plot_bgcolor = 'white')
 		fig_3.update_xaxes(ticks = 'outside', showline = True, linecolor = 'black', linewidth = 2,
-			gridcolor = 'lightgrey', griddash = 'dash', range = [1979, 2023])
+			gridcolor = 'lightgrey', griddash = 'dash', range = [year_start - 1, year_end + 1])
 		fig_3.update_yaxes(ticks = 'outside', showline = True, linecolor = 'black', linewidth = 2,
 			gridcolor = 'lightgrey', griddash = 'dash', range = [0, 1100])
 
@@ -581,7 +741,7 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 		fig_4.update_layout(title = {'y': 0.9, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top',
 			'font' : dict(size = 24)}, plot_bgcolor = 'white')
 		fig_4.update_xaxes(ticks = 'outside', showline = True, linecolor = 'black', linewidth = 2,
-			gridcolor = 'lightgrey', griddash = 'dash', range = [1979, 2023])
+			gridcolor = 'lightgrey', griddash = 'dash', range = [year_start - 1, year_end + 1])
 		fig_4.update_yaxes(ticks = 'outside', showline = True, linecolor = 'black', linewidth = 2,
 			gridcolor = 'lightgrey', griddash = 'dash')
 
@@ -595,38 +755,9 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 	with tab_actors:
 		st.subheader("Acteurs et Actrices")
 
-		# Fusion du DataFrame des notes des films des acteurs avec le DataFrame des films
-
-		# Création d'un nouveau DataFrame par fusion des DataFrame des notes des films des acteurs
-		# avec le DataFrame des films,
-		# SI les données n'ont pas été directement chargées depuis github
-		if not data_loading_type_from_github:
-			df_movie_in_FR_from_1980_actor_rating = pd.merge(left = df_movie_fr_recent_years_trim,
-				right =df_actors_movies_ratings, how = "inner", left_on = "tconst", right_on = "tconst")
-
-			# Ajout d'une colonne "weighted_rating" pour le calcul de la moyenne pondérée des notes des films
-			df_movie_in_FR_from_1980_actor_rating['weighted_rating'] = \
-				df_movie_in_FR_from_1980_actor_rating['averageRating'] * df_movie_in_FR_from_1980_actor_rating['numVotes']
-			
-			# Ajout d'une colonne "nb_movies" pour le calcul du nombre de films par acteur
-			df_movie_in_FR_from_1980_actor_rating['nb_movies'] = 1
-
-		# Moyenne pondérée des notes des films des acteurs
-
-		# Création d'un nouveau DataFrame df_actors_votes_ratings en conservant les colonnes qui nous intéressent
-		df_actors_votes_ratings = df_movie_in_FR_from_1980_actor_rating[
-			["nconst", "primaryName", "numVotes", "weighted_rating", "nb_movies", "startYear"]]
-
-		# Groupement des données par acteur, en sommant les autres colonnes
-		df_group_actors_votes_ratings = df_actors_votes_ratings.groupby(by = ["primaryName"]).agg(
-			{"numVotes" : "sum", "weighted_rating" : "sum", "nb_movies" : "sum"})
-		
-		# Calcul de la moyenne des notes pondérée en divisant weighted_rating par le nombre de votes
-		df_group_actors_votes_ratings["weighted_rating"] = \
-			df_group_actors_votes_ratings["weighted_rating"] / df_group_actors_votes_ratings["numVotes"]
-		
-		# Reset des index pour remettre le nom de l'acteur/actrice en colonne
-		df_group_actors_votes_ratings.reset_index(inplace = True)
+		# Moyenne pondérée des notes des films des acteurs, calculée en arrière-plan au démarrage
+		df_group_actors_votes_ratings = get_table("Classement des acteurs")
+		actors_aggregates = get_table("Cumuls des acteurs")
 
 		#df_top_15_actors = top_actors(15)
 
@@ -635,7 +766,8 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 
 		# Bar chart des acteurs ayant le plus de votes, classés par note moyenne
 		nb_actors = 20
-		fig_5 = px.bar(top_actors(nb_actors), x = 'primaryName', y = 'weighted_rating', height = 600, width = 1000,
+		fig_5 = px.bar(top_actors(df_group_actors_votes_ratings, actors_aggregates, nb_actors,
+			year_start = period_start, year_end = period_end), x = 'primaryName', y = 'weighted_rating', height = 600, width = 1000,
 			title = f'{nb_actors} acteurs ayant le plus de votes classés par note moyenne',
 			labels = {"primaryName": "Nom", "weighted_rating": "Note moyenne pondérée", "numVotes": "Nombre de votes"},
 			color_discrete_sequence = ['lightblue'], hover_data = ['numVotes', 'nb_movies'])
@@ -653,45 +785,32 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 		st.markdown("### Top 200 des acteurs dans les films ayant le plus de votes")
 
 		# Définition d'un top 200 des acteurs ayant participé aux films qui ont le plus de votes
-		df_top_200_actors = top_actors(200)
+		df_top_200_actors = top_actors(df_group_actors_votes_ratings, actors_aggregates, 200,
+			year_start = period_start, year_end = period_end)
 
 		# Affichage des acteurs du top 200
 		st.dataframe(df_top_200_actors)
 
-	with tab_directors:
-		st.subheader("Réalisateurs")
-
-		# Fusion du DataFrame des notes des films des acteurs avec le DataFrame des films
-
-		# Création d'un nouveau DataFrame par fusion des DataFrame des notes des films des réalisateurs
-		# avec le DataFrame des films
-		# SI les données n'ont pas été directement chargées depuis github
-		if not data_loading_type_from_github:
-			df_movies_Fr_from_1980_director_rating = pd.merge(left = df_movie_fr_recent_years_trim,
-				right = df_directors_movies_ratings, how = "inner", left_on = "tconst", right_on = "tconst")
-
-			# Ajout d'une colonne "weighted_rating" pour le calcul de la moyenne pondérée des notes des films
-			df_movies_Fr_from_1980_director_rating['weighted_rating'] = \
-				df_movies_Fr_from_1980_director_rating['averageRating'] * df_movies_Fr_from_1980_director_rating['numVotes']
+		st.markdown("### Collaborateurs d'un acteur ou d'une actrice")
 
-			# Ajout d'une colonne "nb_movies" pour le calcul du nombre de films par acteur
-			df_movies_Fr_from_1980_director_rating['nb_movies'] = 1
+		# Personnes ayant tourné le plus de films avec l'acteur choisi (parcours du graphe films - personnes)
+		collaboration_graph = get_table("Graphe des collaborations")
+		actor_name = st.selectbox("Acteur ou actrice", df_top_200_actors["primaryName"], key = "select_actor",
+			on_change = keep_on_movie_analyse_page)
+		col_actors, col_directors = st.columns(2)
+		with col_actors:
+			st.markdown("Acteurs et actrices")
+			st.dataframe(collaborators_table(collaboration_graph, actor_name, "actor"))
+		with col_directors:
+			st.markdown("Réalisateurs")
+			st.dataframe(collaborators_table(collaboration_graph, actor_name, "director"))
 
-		# Moyenne pondérée des notes des films des réalisateurs
-		# Création d'un nouveau DataFrame df_directors_votes_ratings en conservant les colonnes qui nous intéressent
-		df_directors_votes_ratings = df_movies_Fr_from_1980_director_rating[
-			["nconst", "primaryName", "numVotes", "weighted_rating", "nb_movies", "startYear"]]
-
-		# Groupement des données par réalisateur, en sommant les autres colonnes
-		df_group_directors_votes_ratings = df_directors_votes_ratings.groupby(by = ["primaryName"]).agg(
-			{"numVotes" : "sum", "weighted_rating" : "sum", "nb_movies" : "sum"})
-
-		# Calcul de la moyenne des notes pondérée en divisant weighted_rating par le nombre de votes
-		df_group_directors_votes_ratings["weighted_rating"] = \
-			df_group_directors_votes_ratings["weighted_rating"] / df_group_directors_votes_ratings["numVotes"]
+	with tab_directors:
+		st.subheader("Réalisateurs")
 
-		# Reset des index pour remettre le nom de l'acteur/actrice en colonne
-		df_group_directors_votes_ratings.reset_index(inplace = True)
+		# Moyenne pondérée des notes des films des réalisateurs, calculée en arrière-plan au démarrage
+		df_group_directors_votes_ratings = get_table("Classement des réalisateurs")
+		directors_aggregates = get_table("Cumuls des réalisateurs")
 
 		#df_top_15_directors = top_directors(15)
 
@@ -699,7 +818,8 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 
 		# Bar chart des réalisateurs ayant le plus de votes, classés par note moyenne
 		nb_directors = 20
-		fig_7 = px.bar(top_directors(nb_directors), x = 'primaryName', y = 'weighted_rating', height = 600, width = 1000,
+		fig_7 = px.bar(top_directors(df_group_directors_votes_ratings, directors_aggregates, nb_directors,
+			year_start = period_start, year_end = period_end), x = 'primaryName', y = 'weighted_rating', height = 600, width = 1000,
 			title = f'{nb_directors} réalisateurs ayant le plus de votes classés par note moyenne',
 			labels = {"primaryName": "Nom", "weighted_rating": "Note moyenne pondérée", "numVotes": "Nombre de votes"},
 			color_discrete_sequence = ['lightblue'], hover_data = ['numVotes', 'nb_movies'])
@@ -717,12 +837,21 @@ if st.sidebar.radio('Choix de la page', ('Analyses de films', 'Recommandation de
 		st.markdown("### Top 50 des réalisateurs les films ayant le plus de votes")
 
 		# Définition d'un top 50 des réalisateurs ayant réalisé les films qui ont le plus de votes
-		df_top_50_directors = top_directors(50)
+		df_top_50_directors = top_directors(df_group_directors_votes_ratings, directors_aggregates, 50,
+			year_start = period_start, year_end = period_end)
 
 		# Affichage des réalisateur du top 50
 		st.dataframe(df_top_50_directors)
 
-else:
+		st.markdown("### Acteurs et actrices favoris d'un réalisateur")
+
+		# Acteurs ayant tourné le plus de films avec le réalisateur choisi (parcours du graphe films - personnes)
+		collaboration_graph = get_table("Graphe des collaborations")
+		director_name = st.selectbox("Réalisateur", df_top_50_directors["primaryName"], key = "select_director",
+			on_change = keep_on_movie_analyse_page)
+		st.dataframe(collaborators_table(collaboration_graph, director_name, "actor"))
+
+elif page == 'Recommandation de films':
     st.header("Recommandations de films") 
 
     # Ajout du magnifique GIF des minions 
@@ -730,209 +859,104 @@ else:
     #st.image(gif, use_column_width=True, width = 300)
 
     
-    ### Ajout d'une nouvelle colonne "recommandé" ###
-
-    # Création d'un DataFrame temporaire avec uniquement l'id du film et le(s) noms du(des) réalisateur(s)
-    # Et changement de nom de la colonne "primaryName"
-    @st.cache_data
-    def get_movies_directors():
-    	df_movies_directors = df_movies_Fr_from_1980_director_rating[["tconst", "primaryName"]].rename(
-            columns = {"primaryName" : "dir_primaryName"})
-    	return df_movies_directors
-
-    # Création d'un DataFrame temporaire avec uniquement l'id du film et le(s) noms du(des) acteur/actrice(s)
-    # Et changement de nom de la colonne "primaryName"
-    #@st.cache_data
-    def get_movies_actors():
-        df_movies_actors = df_movie_in_FR_from_1980_actor_rating[["tconst", "primaryName"]].rename(
-            columns = {"primaryName" : "act_primaryName"})
-        return df_movies_actors
-
-    # DataFrame avec uniquement l'id du film et le(s) noms du(des) réalisateur(s)
-    df_movies_directors = get_movies_directors()
-    # DataFrame avec uniquement l'id du film et le(s) noms du(des) acteur/actrice(s)
-    df_movies_actors = get_movies_actors()
-
-    # Nouveau DataFrame créé en fusionnant df_movie_in_FR_from_1980_actor_rating avec df_movies_directors 
-    df_movie_fr_from_1980_ratings = pd.merge(
-        left = df_movie_in_FR_from_1980_actor_rating, right = df_movies_directors,
-        how = "inner", left_on = "tconst", right_on = "tconst").rename(columns = {"primaryName": "act_primaryName"})
-
-    # Ajout d'une nouvelle colonne "recommandé" avec valeur 0 par défaut
-    df_movie_fr_from_1980_ratings["recommended"] = 0
-
-    ## Critères pour passer "recommandé" à 1 :
-    # 60 min < durée < 180 min ET
-        # 1. nbre votes >= 100 K ET note moyenne >= 7 OU
-        # 2. nbre votes >= 10 K ET note moyenne >= 5 ET acteur dans le top 200 des acteurs les plus populaires
-        # 3. nbre votes >= 10 K ET note moyenne >= 5 ET réalisateur dans le top 50 des réalisateurs les plus populaires
-
-    df_top_200_actors = top_actors(200)
-    df_top_50_directors = top_directors(50)
-
-    # 1ère condition pour passer "recommandé" à 1
-    df_movie_fr_from_1980_ratings.loc[
-        (df_movie_fr_from_1980_ratings['runtimeMinutes'] >= 60) & (df_movie_fr_from_1980_ratings['runtimeMinutes'] <= 180) &
-        (df_movie_fr_from_1980_ratings['numVotes'] >= 100000) & (df_movie_fr_from_1980_ratings['averageRating'] >= 7),
-        'recommended'] = 1
-
-    # 2e condition pour passer "recommandé" à 1
-    df_movie_fr_from_1980_ratings.loc[
-        (df_movie_fr_from_1980_ratings['runtimeMinutes'] >= 60) & (df_movie_fr_from_1980_ratings['runtimeMinutes'] <= 180) &
-        (df_movie_fr_from_1980_ratings['numVotes'] >= 10000) & (df_movie_fr_from_1980_ratings['averageRating'] >= 5) &
-        (df_movie_fr_from_1980_ratings['act_primaryName'].isin(df_top_200_actors['primaryName'])),
-        'recommended'] = 1
-
-    # 3e condition pour passer "recommandé" à 1
-    df_movie_fr_from_1980_ratings.loc[
-        (df_movie_fr_from_1980_ratings['runtimeMinutes'] >= 60) & (df_movie_fr_from_1980_ratings['runtimeMinutes'] <= 180) &
-        (df_movie_fr_from_1980_ratings['numVotes'] >= 10000) & (df_movie_fr_from_1980_ratings['averageRating'] >= 5) &
-        (df_movie_fr_from_1980_ratings['dir_primaryName'].isin(df_top_50_directors['primaryName'])),
-        'recommended'] = 1
-
-    # On ne conserve que les colonnes qui nous intéressent, on supprime notamment les infos des acteurs/actrices
-    df_movie_fr_from_1980_ratings = df_movie_fr_from_1980_ratings[
-        ["tconst", "startYear", "runtimeMinutes", "genres", "title", "averageRating", "numVotes", "recommended"]]
-
-    # Création d'un DataFrame en groupant les films et leurs caractéristiques,
-    # et en sommant la colonne "recommended"
-    df_movie_fr_from_1980_ratings_recommendation = df_movie_fr_from_1980_ratings.groupby(
-        by = ["tconst", "startYear", "runtimeMinutes", "genres", "title",  "averageRating", "numVotes"],
-        as_index = False)["recommended"].sum()
-
-    # Changement de type de la colonne "recommended" en integer
-    df_movie_fr_from_1980_ratings_recommendation["recommended"] = \
-        df_movie_fr_from_1980_ratings_recommendation["recommended"].astype(int)
-
-    # Changement de type de la colonne "startYear" en integer
-    df_movie_fr_from_1980_ratings_recommendation["startYear"] = \
-        df_movie_fr_from_1980_ratings_recommendation["startYear"].astype(int)
-
-    # Changement de type de la colonne "runtimeMinutes" en integer
-    df_movie_fr_from_1980_ratings_recommendation["runtimeMinutes"] = \
-        df_movie_fr_from_1980_ratings_recommendation["runtimeMinutes"].astype(int)
-
-    # Changement de type de la colonne "title" en string
-    df_movie_fr_from_1980_ratings_recommendation["title"] = \
-        df_movie_fr_from_1980_ratings_recommendation["title"].astype("string")
-
-    # Fonction pour supprimer les "[" "]" à une chaîne de caractères
-    def remove_brackets(string):
-        if len(string) > 0:
-            if string[0] == "[":
-                string = string[1:]
-            if string[-1] == "]":
-                string = string[:-1]
-            return string
-        else:
-            return ""
-    
-    # Suppression des crochets ("brackets" "[" et "]") de la chaîne de caractères des genres
-    df_movie_fr_from_1980_ratings_recommendation["genres"] = \
-        df_movie_fr_from_1980_ratings_recommendation["genres"].apply(remove_brackets)
+    # DataFrames des acteurs et des réalisateurs, préchargés au démarrage
+    df_movie_in_FR_from_1980_actor_rating = get_table("Acteurs")
+    df_movies_Fr_from_1980_director_rating = get_table("Réalisateurs")
 
-    # Reset des index
-    df_movie_fr_from_1980_ratings_recommendation.reset_index(drop = True, inplace = True)
+    # DataFrame des films (une ligne par film) avec la colonne "recommended", précalculé au démarrage
+    df_movie_fr_from_1980_ratings_recommendation = get_table("Films à recommander")
 
 
 
     ### Machine Learning ###
 
+    # Index de similarité de contenu (genres, acteurs, réalisateurs), construit une seule fois
+    @st.cache_data
+    def get_content_index(df_movies):
+        return build_content_index(
+            df_movies, df_movie_in_FR_from_1980_actor_rating[["tconst", "nconst"]],
+            df_movies_Fr_from_1980_director_rating[["tconst", "nconst"]])
+
     # Recommandation de films
 
-    # Saisie d'un film par l'utilisateur
-    titre_film = st.text_input("Veuillez renseigner un titre")
-    #titre_film = titre_film
-
-    #df_algo["lower_title"] = df_algo["title"].str.lower()
-
-    # Choix d'un film
-    #titre_film = "Casino"
-
-    #
-    if len(titre_film) > 0:
-    	# Création du DataFrame du film choisi df_chosen_movie
-    	df_chosen_movie = df_movie_fr_from_1980_ratings_recommendation[
-    		df_movie_fr_from_1980_ratings_recommendation["title"] == titre_film]
-    	#print(df_movie_fr_from_1980_ratings_recommendation)
-    	#print(df_chosen_movie)
-
-    	# Définition des genres du film choisi
-    	genres_film = df_movie_fr_from_1980_ratings_recommendation.loc[
-    		df_movie_fr_from_1980_ratings_recommendation["title"] == titre_film, "genres"].values[0]
-
-    	# Définition de la liste des genres du film choisi
-    	list_genres_film = []
-    	for genre in df_genres.Genre:
-    		if genre in genres_film:
-    			list_genres_film.append(genre)
-
-    	# Fonction vérifiant si un genre de la liste est compris dans une chaîne
-    	def check_genre_match(string):
-    		nb_matches = 0
-    		for genre in list_genres_film:
-    			if genre in string:
-    				nb_matches += 1
-    		return nb_matches
-
-    	# Copie du DataFrame de base dans un df temporaire df_movie_tmp
-    	df_movie_tmp = df_movie_fr_from_1980_ratings_recommendation.copy()
-
-    	# Suppression du film choisi par l'utilisateur du DataFrame d'entraînement
-    	df_movie_tmp = df_movie_tmp[df_movie_tmp["title"] != titre_film]
-
-    	# Application de la fonction pour vérifier si les genres du film choisi "matchent"
-    	# avec les genres des films du DataFrame
-    	df_movie_tmp["nb_genre_matches"] = df_movie_tmp["genres"].apply(check_genre_match)
-
-    	# On ne garde que les films pour lesquels le genre "matche" avec le film choisi
-    	nb_mini_genre_matches = 50
-    	if len(df_movie_tmp[df_movie_tmp["nb_genre_matches"] == len(list_genres_film)]) >= nb_mini_genre_matches:
-    		df_movie_tmp = df_movie_tmp[df_movie_tmp["nb_genre_matches"] == len(list_genres_film)]
-    	elif len(list_genres_film) > 1:
-    		df_movie_tmp = df_movie_tmp[df_movie_tmp["nb_genre_matches"] >= len(list_genres_film) - 1]  
+    # Choix de la méthode de recommandation
+    methode_reco = st.radio("Méthode de recommandation",
+        ("Contenu (genres, acteurs, réalisateurs)", "Plus proches voisins (variables numériques)",
+         "Mêmes acteurs et réalisateurs", "Profil de goûts (plusieurs films)"),
+        horizontal = True)
+
+    # Poids du contenu face aux variables numériques (année, durée, note, votes, recommandé)
+    if methode_reco.startswith("Contenu") or methode_reco.startswith("Profil"):
+        blend_weight = st.slider("Poids du contenu par rapport aux variables numériques",
+            min_value = 0.0, max_value = 1.0, value = 0.7, step = 0.05)
+
+    if methode_reco.startswith("Profil"):
+        # Choix des films aimés et, éventuellement, des films pas aimés
+        list_titles = sorted(df_movie_fr_from_1980_ratings_recommendation["title"].dropna().unique())
+        liked_titles = st.multiselect("Films aimés", list_titles)
+        disliked_titles = st.multiselect("Films pas aimés (facultatif)",
+            [title for title in list_titles if title not in liked_titles])
+
+        if len(liked_titles) > 0:
+            # Un seul calcul de scores pour tous les films, à partir du profil des films choisis
+            content_index = get_content_index(df_movie_fr_from_1980_ratings_recommendation)
+            df_recommended_movies = recommend_movies_profile(
+                content_index, df_movie_fr_from_1980_ratings_recommendation, liked_titles, disliked_titles,
+                blend_weight = blend_weight)
+            st.dataframe(format_recommendations(df_recommended_movies))
+
+    else:
+        # Saisie d'un film par l'utilisateur
+        titre_film = st.text_input("Veuillez renseigner un titre")
+
+    if not methode_reco.startswith("Profil") and len(titre_film) > 0:
+    	if methode_reco.startswith("Contenu"):
+    		content_index = get_content_index(df_movie_fr_from_1980_ratings_recommendation)
+    		df_recommended_movies = recommend_movies_content(
+    			content_index, df_movie_fr_from_1980_ratings_recommendation, titre_film,
+    			blend_weight = blend_weight)
+    	elif methode_reco.startswith("Mêmes"):
+    		# Films partageant le plus d'acteurs et de réalisateurs avec le film choisi
+    		df_recommended_movies = recommend_movies_same_people(
+    			get_table("Graphe des collaborations"), df_movie_fr_from_1980_ratings_recommendation, titre_film)
+    	else:
+    		df_recommended_movies = recommend_movies_nearest_neighbors(
+    			df_movie_fr_from_1980_ratings_recommendation, df_genres.Genre, titre_film)
+
+    	if len(df_recommended_movies) == 0:
+    		st.warning("Aucun film ne correspond à ce titre")
     	else:
-    		df_movie_tmp = df_movie_tmp[df_movie_tmp["nb_genre_matches"] == len(list_genres_film)]
-
-    	# Définition des variable explicatives X, ici nos variables quantitatives (numériques)
-    	X = df_movie_tmp[["startYear", "runtimeMinutes", "averageRating", "numVotes", "recommended"]]
-
-    	# Création et entraînement du modèle "scaler" pour standardiser nos variables
-    	#scaler = StandardScaler().fit(X)
-
-    	# Transformation des données par le modèle scaler
-    	#X_scaled = scaler.transform(X)
-
-    	# Création et entraînement du modèle "NearestNeighbors" (plus proches voisins)
-    	# Choix du nombre de voisins
-    	k = 50
-    	modelNN = NearestNeighbors(n_neighbors = k).fit(X)
-    	#modelNN = NearestNeighbors(n_neighbors = k).fit(X_scaled)
-
-    	# kneighbors renvoie les distances et indices des k plus proches voisins renoyés par le modèle :
-    	neighbors = modelNN.kneighbors(
-    		df_movie_fr_from_1980_ratings_recommendation.loc[
-    			df_movie_fr_from_1980_ratings_recommendation['title'] == titre_film, X.columns])
-
-    	# Index des plus proches voisins
-    	arr_closest_movies_index = neighbors[1][0]
-
-    	# DataFrame des films recommandés
-    	df_recommended_movies = df_movie_tmp.iloc[arr_closest_movies_index]
-    	df_recommended_movies = df_recommended_movies[
-    		["startYear", "runtimeMinutes", "genres", "title", "averageRating", "numVotes", "recommended"]]
-    	if len(df_recommended_movies[df_recommended_movies.recommended > 0]) > 10:
-    		df_recommended_movies = df_recommended_movies[df_recommended_movies.recommended > 0]
-    	df_recommended_movies.rename(
-    		columns = {"startYear" : "Année", "runtimeMinutes" : "Durée", "genres" : "Genres", "title": "Titre",
-    		"averageRating" : "Note moy.", "numVotes" : "Nbre de votes", "recommended" : "Recommandé"},
-    		inplace = True)
-    	if len(df_recommended_movies) > 10:
-    		df_recommended_movies = df_recommended_movies.head(10)
-
-    	st.dataframe(df_recommended_movies)
+    		st.dataframe(format_recommendations(df_recommended_movies))
 
 
+else:
+    st.header("Recherche d'acteurs et de réalisateurs")
+
+    # Index des noms et listes des films de chaque personne, préchargés au démarrage
+    person_index = get_table("Index des personnes")
+
+    # Saisie du début du nom, puis choix parmi les personnes correspondantes (les plus votées d'abord)
+    person_query = st.text_input("Nom de l'acteur, de l'actrice ou du réalisateur")
+    df_persons_found = search_persons(person_index, person_query)
+
+    if len(person_query) > 0 and len(df_persons_found) == 0:
+        st.warning("Aucune personne ne correspond à ce nom")
+    elif len(df_persons_found) > 0:
+        person = st.selectbox("Personne", df_persons_found.index,
+            format_func = lambda person: f"{df_persons_found.loc[person, 'primaryName']} "
+                                         f"({df_persons_found.loc[person, 'nconst']})")
+
+        # Statistiques précalculées de la personne
+        col_1, col_2, col_3 = st.columns(3)
+        col_1.metric("Nombre de films", int(df_persons_found.loc[person, "nb_movies"]))
+        col_2.metric("Nombre de votes", f"{int(df_persons_found.loc[person, 'numVotes']):,}".replace(",", " "))
+        col_3.metric("Note moyenne pondérée", f"{df_persons_found.loc[person, 'weighted_rating']:.2f}")
+
+        # Filmographie
+        st.dataframe(filmography(person_index, person).drop(columns = "tconst").rename(columns = {
+            "title" : "Titre", "startYear" : "Année", "averageRating" : "Note moy.", "numVotes" : "Nbre de votes",
+            "role" : "Rôle"}))
+
 
 #st.sidebar.markdown('<div style="height: 350px;"></div>', unsafe_allow_html=True)
 #image = Image.open("https://github.com/Miche5967/movie_analyse_recommendation_streamlit_app/blob/master/analystes_redim.png?raw=true")
@@ -0,0 +1,404 @@
+# Cache des résultats de calcul sur le disque, partagé entre plusieurs instances de l'application
+import functools
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import types
+import uuid
+import weakref
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+try:
+    import fcntl
+except ImportError:
+    # Pas de verrou de fichier hors Unix : l'éviction reste sûre grâce aux renommages atomiques
+    fcntl = None
+
+from movie_download import CACHE_DIR as DOWNLOAD_CACHE_DIR
+
+# Dossier du cache des résultats, à placer sur un disque partagé par les instances de l'application
+RESULTS_CACHE_DIR = os.environ.get("MOVIE_APP_RESULTS_CACHE_DIR", os.path.join(DOWNLOAD_CACHE_DIR, "results"))
+
+# Taille maximum du cache des résultats (en Mo), au-delà de laquelle les résultats les moins récemment utilisés
+# sont supprimés
+RESULTS_CACHE_MAX_MB = int(os.environ.get("MOVIE_APP_RESULTS_CACHE_MAX_MB", 2048))
+
+# Nom du fichier décrivant le contenu d'une entrée du cache
+MANIFEST_NAME = "manifest.json"
+
+# Clés des valeurs en mémoire renvoyées par les fonctions mises en cache (ou marquées par mark_version) :
+# id(valeur) -> (référence faible vers la valeur, clé)
+_VALUE_KEYS = {}
+_VALUE_KEYS_LOCK = threading.Lock()
+
+
+def _forget_value(value_id, ref):
+    '''
+    Oublie la clé d'une valeur supprimée de la mémoire (rappel de la référence faible).
+    '''
+
+    with _VALUE_KEYS_LOCK:
+        if _VALUE_KEYS.get(value_id, (None, None))[0] is ref:
+            del _VALUE_KEYS[value_id]
+
+
+def mark_version(value, key):
+    '''
+    Associe une clé (version) à une valeur en mémoire, et à chacun de ses éléments pour les tuples, listes
+    et dictionnaires : passée en argument d'une fonction mise en cache, la valeur est identifiée par
+    cette clé au lieu d'être hachée par son contenu. Renvoie la valeur.
+
+    Notes:
+    ------
+    La valeur ne doit plus être modifiée sur place ensuite (comme les valeurs de st.cache_resource) :
+    sa clé ne changerait pas. Seuls les objets acceptant les références faibles (DataFrames, Series,
+    tableaux numpy, matrices creuses) sont marqués ; la clé est oubliée quand l'objet est supprimé.
+    '''
+
+    try:
+        ref = weakref.ref(value, functools.partial(_forget_value, id(value)))
+    except TypeError:
+        ref = None
+    if ref is not None:
+        with _VALUE_KEYS_LOCK:
+            _VALUE_KEYS[id(value)] = (ref, key)
+
+    if isinstance(value, (tuple, list)):
+        for i, item in enumerate(value):
+            mark_version(item, f"{key}/{i}")
+    elif isinstance(value, dict):
+        for name, item in value.items():
+            mark_version(item, f"{key}/{name}")
+    return value
+
+
+def _value_key(value):
+    '''
+    Renvoie la clé associée à une valeur par mark_version, ou None.
+    '''
+
+    entry = _VALUE_KEYS.get(id(value))
+    if entry is not None and entry[0]() is value:
+        return entry[1]
+    return None
+
+
+def _hash_value(value, sha256):
+    '''
+    Met à jour l'empreinte sha256 avec une valeur (argument d'une fonction mise en cache).
+    Les valeurs renvoyées par une fonction mise en cache (ou marquées par mark_version) sont identifiées
+    par leur clé ; les autres DataFrames et tableaux sont hachés par leur contenu, et non par leur identité.
+    '''
+
+    key = _value_key(value)
+    if key is not None:
+        sha256.update(f"key:{key}".encode("utf-8"))
+    elif isinstance(value, pd.DataFrame):
+        # Les colonnes de chaînes ont le même type ("string") qu'elles soient relues depuis Arrow ou non
+        sha256.update(repr((list(value.columns), ["string" if pd.api.types.is_string_dtype(dtype) else str(dtype)
+                                                  for dtype in value.dtypes])).encode("utf-8"))
+        sha256.update(pd.util.hash_pandas_object(value.astype(str) if _has_unhashable(value) else value,
+                                                 index = True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        _hash_value(value.to_frame(), sha256)
+    elif isinstance(value, pd.Index):
+        _hash_value(value.to_series(), sha256)
+    elif isinstance(value, np.ndarray):
+        sha256.update(repr((value.dtype.str, value.shape)).encode("utf-8"))
+        sha256.update(value.tobytes() if value.dtype != object else repr(value.tolist()).encode("utf-8"))
+    elif isinstance(value, (list, tuple)):
+        sha256.update(f"{type(value).__name__}:{len(value)}".encode("utf-8"))
+        for item in value:
+            _hash_value(item, sha256)
+    elif isinstance(value, dict):
+        sha256.update(f"dict:{len(value)}".encode("utf-8"))
+        for key in sorted(value, key = repr):
+            _hash_value(key, sha256)
+            _hash_value(value[key], sha256)
+    else:
+        sha256.update(repr(value).encode("utf-8"))
+
+
+def _has_unhashable(df):
+    '''
+    Indique si un DataFrame contient des colonnes d'objets non hachables par pandas (listes des genres...).
+    '''
+
+    return any(df[column].map(lambda x: isinstance(x, (list, np.ndarray, dict))).any()
+               for column in df.columns if df[column].dtype == object)
+
+
+def _function_fingerprint(func):
+    '''
+    Empreinte du code d'une fonction : modifier la fonction invalide ses résultats en cache.
+    Les fonctions imbriquées (lambdas, compréhensions) sont prises en compte par leur propre code,
+    et non par leur adresse en mémoire, pour que l'empreinte soit la même d'un processus à l'autre.
+    Les fonctions du projet appelées par la fonction (fichiers du même dossier) sont prises en compte
+    elles aussi : modifier un module de calcul invalide les résultats des fonctions qui l'utilisent.
+    '''
+
+    project_dir = os.path.dirname(os.path.abspath(func.__code__.co_filename))
+    visited = set()
+
+    def update(code, namespace, sha256):
+        sha256.update(code.co_code)
+        for const in code.co_consts:
+            if hasattr(const, "co_code"):
+                update(const, namespace, sha256)
+            else:
+                sha256.update(repr(const).encode("utf-8"))
+        for name in code.co_names:
+            called = getattr(namespace.get(name), "__wrapped__", namespace.get(name))
+            if (isinstance(called, types.FunctionType) and called not in visited and
+                os.path.dirname(os.path.abspath(called.__code__.co_filename)) == project_dir):
+                visited.add(called)
+                sha256.update(name.encode("utf-8"))
+                update(called.__code__, called.__globals__, sha256)
+
+    sha256 = hashlib.sha256()
+    visited.add(func)
+    update(func.__code__, func.__globals__, sha256)
+    return sha256.hexdigest()
+
+
+def _dump(value, entry_dir, name):
+    '''
+    Écrit une valeur dans le dossier d'une entrée du cache et renvoie sa description pour le manifeste.
+    Les tableaux numpy numériques et les matrices creuses sont écrits au format ".npy", relu par projection
+    en mémoire ("memory-map") ; les DataFrames sont écrits au format Arrow IPC, lui aussi projeté en mémoire.
+    '''
+
+    if isinstance(value, pd.DataFrame) and not _has_unhashable(value):
+        import pyarrow as pa
+
+        file_name = name + ".arrow"
+        try:
+            table = pa.Table.from_pandas(value)
+        except pa.lib.ArrowException:
+            # Colonnes de types mélangés : le DataFrame est écrit avec pickle
+            table = None
+        if table is not None:
+            with pa.OSFile(os.path.join(entry_dir, file_name), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            return {"type" : "dataframe", "file" : file_name}
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        file_name = name + ".npy"
+        np.save(os.path.join(entry_dir, file_name), value)
+        return {"type" : "ndarray", "file" : file_name}
+    if sparse.issparse(value) and value.format == "csr":
+        return {"type" : "csr", "shape" : list(value.shape),
+                "data" : _dump(value.data, entry_dir, name + "_data"),
+                "indices" : _dump(value.indices, entry_dir, name + "_indices"),
+                "indptr" : _dump(value.indptr, entry_dir, name + "_indptr")}
+    if isinstance(value, (tuple, list)):
+        return {"type" : type(value).__name__,
+                "items" : [_dump(item, entry_dir, f"{name}_{i}") for i, item in enumerate(value)]}
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {"type" : "dict",
+                "items" : {key : _dump(item, entry_dir, f"{name}_{i}") for i, (key, item) in enumerate(value.items())}}
+
+    file_name = name + ".pkl"
+    with open(os.path.join(entry_dir, file_name), "wb") as file:
+        pickle.dump(value, file, protocol = pickle.HIGHEST_PROTOCOL)
+    return {"type" : "pickle", "file" : file_name}
+
+
+def _load(node, entry_dir):
+    '''
+    Relit une valeur écrite par _dump, en projetant les fichiers en mémoire quand c'est possible.
+    '''
+
+    if node["type"] == "dataframe":
+        import pyarrow as pa
+
+        # Les tampons Arrow gardent la projection en mémoire ouverte tant qu'ils sont utilisés.
+        # Un bloc par colonne : les colonnes numériques sans valeurs manquantes restent projetées (sans copie,
+        # en lecture seule) et partagées entre les instances ; les colonnes de texte sont copiées.
+        source = pa.memory_map(os.path.join(entry_dir, node["file"]), "r")
+        return pa.ipc.open_file(source).read_all().to_pandas(split_blocks = True)
+    if node["type"] == "ndarray":
+        return np.load(os.path.join(entry_dir, node["file"]), mmap_mode = "r")
+    if node["type"] == "csr":
+        return sparse.csr_matrix(
+            (_load(node["data"], entry_dir), _load(node["indices"], entry_dir), _load(node["indptr"], entry_dir)),
+            shape = tuple(node["shape"]))
+    if node["type"] == "tuple":
+        return tuple(_load(item, entry_dir) for item in node["items"])
+    if node["type"] == "list":
+        return [_load(item, entry_dir) for item in node["items"]]
+    if node["type"] == "dict":
+        return {key : _load(item, entry_dir) for key, item in node["items"].items()}
+    with open(os.path.join(entry_dir, node["file"]), "rb") as file:
+        return pickle.load(file)
+
+
+def _entry_size(entry_dir):
+    '''
+    Taille totale (en octets) des fichiers d'une entrée du cache.
+    '''
+
+    return sum(os.path.getsize(os.path.join(entry_dir, file_name)) for file_name in os.listdir(entry_dir))
+
+
+def evict(cache_dir = None, max_size_mb = None):
+    '''
+    Supprime les entrées les moins récemment utilisées du cache jusqu'à ce que sa taille soit sous la limite.
+
+    Notes:
+    ------
+    Une entrée est d'abord renommée (opération atomique) puis supprimée : une autre instance ne peut pas
+    lire une entrée à moitié supprimée, et les fichiers déjà projetés en mémoire restent lisibles
+    par les processus qui les utilisent.
+    '''
+
+    cache_dir = cache_dir or RESULTS_CACHE_DIR
+    max_size = (max_size_mb or RESULTS_CACHE_MAX_MB) * 1024 ** 2
+
+    with open(os.path.join(cache_dir, ".lock"), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        list_entries = []
+        for name in os.listdir(cache_dir):
+            manifest_path = os.path.join(cache_dir, name, MANIFEST_NAME)
+            if not name.startswith(".") and os.path.exists(manifest_path):
+                try:
+                    list_entries.append((os.path.getmtime(manifest_path), _entry_size(os.path.join(cache_dir, name)), name))
+                except OSError:
+                    continue
+
+        total_size = sum(size for _, size, _ in list_entries)
+        for _, size, name in sorted(list_entries):
+            if total_size <= max_size:
+                break
+            trash_dir = os.path.join(cache_dir, f".trash-{uuid.uuid4().hex}")
+            try:
+                os.rename(os.path.join(cache_dir, name), trash_dir)
+            except OSError:
+                continue
+            shutil.rmtree(trash_dir, ignore_errors = True)
+            total_size -= size
+
+
+def _call_key(func, fingerprint, data_version, args, kwargs):
+    '''
+    Clé d'un appel de fonction : nom et code de la fonction, clés ou contenus des arguments,
+    et version des données.
+    '''
+
+    if len(fingerprint) == 0:
+        # Empreinte calculée au premier appel, quand les fonctions appelées sont toutes définies
+        fingerprint.append(_function_fingerprint(func))
+    sha256 = hashlib.sha256(f"{func.__module__}.{func.__qualname__}:{fingerprint[0]}".encode("utf-8"))
+    _hash_value(list(args), sha256)
+    _hash_value(kwargs, sha256)
+    version = data_version(*args, **kwargs) if callable(data_version) else data_version
+    _hash_value(version, sha256)
+    return sha256.hexdigest()
+
+
+def track_version(data_version = None):
+    '''
+    Décorateur marquant le résultat d'une fonction (voir mark_version) par la clé de l'appel, sans le mettre
+    en cache : pour les calculs rapides dont les résultats sont passés à des fonctions mises en cache.
+
+    Parameters:
+    ----------
+    data_version : str ou callable, optional
+        Version des données dont dépend la fonction (voir disk_cache).
+    '''
+
+    def decorator(func):
+        fingerprint = []
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _call_key(func, fingerprint, data_version, args, kwargs)
+            return mark_version(func(*args, **kwargs), key)
+
+        return wrapper
+
+    return decorator
+
+
+def disk_cache(data_version = None, cache_dir = None, max_size_mb = None):
+    '''
+    Décorateur mettant en cache sur le disque les résultats d'une fonction.
+
+    Parameters:
+    ----------
+    data_version : str ou callable, optional
+        Version des données dont dépend la fonction. Si c'est une fonction, elle est appelée avec
+        les arguments de l'appel (voir movie_download.source_version).
+    cache_dir : str, optional
+        Dossier du cache (RESULTS_CACHE_DIR par défaut).
+    max_size_mb : int, optional
+        Taille maximum du cache en Mo (RESULTS_CACHE_MAX_MB par défaut).
+
+    Notes:
+    ------
+    La clé d'un résultat est l'empreinte du nom et du code de la fonction, de ses arguments et de la
+    version des données : le cache peut être partagé par plusieurs instances de l'application. Le résultat
+    renvoyé est marqué par sa clé (voir mark_version) : passé à une autre fonction mise en cache, il est
+    identifié par cette clé, sans hacher son contenu. Seuls les arguments non marqués sont hachés par
+    leur contenu, ce qui coûte autant qu'un calcul rapide : réserver le cache aux calculs coûteux.
+    Un résultat est écrit dans un dossier temporaire puis publié par renommage atomique ; si une autre
+    instance a publié le même résultat entre-temps, c'est le sien qui est conservé. Les résultats relus
+    sont projetés en mémoire depuis le disque au lieu d'être recalculés.
+    '''
+
+    def decorator(func):
+        fingerprint = []
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            directory = cache_dir or RESULTS_CACHE_DIR
+            os.makedirs(directory, exist_ok = True)
+
+            # Clé du résultat
+            key = _call_key(func, fingerprint, data_version, args, kwargs)
+            entry_dir = os.path.join(directory, key)
+
+            # Résultat déjà calculé, par cette instance ou par une autre
+            manifest_path = os.path.join(entry_dir, MANIFEST_NAME)
+            if os.path.exists(manifest_path):
+                try:
+                    with open(manifest_path) as file:
+                        manifest = json.load(file)
+                    result = _load(manifest["value"], entry_dir)
+                    os.utime(manifest_path)
+                    return mark_version(result, key)
+                except (OSError, ValueError, KeyError):
+                    # Entrée supprimée ou incomplète : le résultat est recalculé
+                    pass
+
+            result = func(*args, **kwargs)
+
+            # Écriture dans un dossier temporaire, puis publication par renommage
+            tmp_dir = tempfile.mkdtemp(prefix = ".tmp-", dir = directory)
+            try:
+                manifest = {"function" : f"{func.__module__}.{func.__qualname__}", "created_at" : time.time(),
+                            "value" : _dump(result, tmp_dir, "value")}
+                with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as file:
+                    json.dump(manifest, file)
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Résultat déjà publié par une autre instance, ou disque plein : le résultat calculé est renvoyé
+                shutil.rmtree(tmp_dir, ignore_errors = True)
+            else:
+                evict(directory, max_size_mb)
+
+            return mark_version(result, key)
+
+        return wrapper
+
+    return decorator
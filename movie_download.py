@@ -0,0 +1,274 @@
+# Téléchargement des fichiers de données (IMDb, GitHub) avec un cache local sur le disque
+import hashlib
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pandas as pd
+
+# Dossier du cache des téléchargements, partageable entre plusieurs instances de l'application
+CACHE_DIR = os.environ.get("MOVIE_APP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "movie_app_cache"))
+
+# Taille des blocs lus et écrits pendant le téléchargement (en octets)
+BLOCK_SIZE = 1024 ** 2
+
+
+def is_url(path):
+    '''
+    Indique si le chemin donné est une URL HTTP(S).
+    '''
+
+    return urllib.parse.urlparse(str(path)).scheme in ("http", "https")
+
+
+def _cache_paths(url, cache_dir):
+    '''
+    Renvoie les chemins du fichier de données et du fichier de métadonnées du cache pour une URL.
+    Le nom du fichier de données conserve l'extension de l'URL (".tsv.gz", ".csv"...), pour que
+    pandas puisse en déduire la compression.
+    '''
+
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    file_name = os.path.basename(urllib.parse.urlparse(url).path)
+    suffix = file_name[file_name.find("."):] if "." in file_name else ""
+    return os.path.join(cache_dir, key + suffix), os.path.join(cache_dir, key + ".json")
+
+
+def _file_sha256(path):
+    '''
+    Calcule l'empreinte SHA-256 d'un fichier, bloc par bloc.
+    '''
+
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(BLOCK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def write_json_atomic(path, data):
+    '''
+    Écrit un fichier JSON de façon atomique : fichier temporaire dans le même dossier, puis renommage.
+    '''
+
+    fd, tmp_path = tempfile.mkstemp(dir = os.path.dirname(path), suffix = ".tmp")
+    with os.fdopen(fd, "w") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def read_cache_metadata(url, cache_dir = None):
+    '''
+    Renvoie les métadonnées du cache pour une URL ("etag", "last_modified", "sha256", "size", "mtime_ns",
+    "downloaded_at", "checked_at"), ou None si l'URL n'est pas dans le cache.
+    '''
+
+    _, meta_path = _cache_paths(url, cache_dir or CACHE_DIR)
+    try:
+        with open(meta_path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_file_matches(data_path, meta_path, meta, verify):
+    '''
+    Indique si le fichier de données du cache correspond à ses métadonnées. Le fichier n'est haché que si
+    sa date de modification a changé depuis l'écriture des métadonnées ; les métadonnées d'un fichier
+    vérifié sont alors mises à jour, pour ne plus le hacher ensuite.
+    '''
+
+    try:
+        stat = os.stat(data_path)
+    except OSError:
+        return False
+    if stat.st_size != meta.get("size"):
+        return False
+    if not verify or stat.st_mtime_ns == meta.get("mtime_ns"):
+        return True
+    if _file_sha256(data_path) != meta.get("sha256"):
+        return False
+    meta["mtime_ns"] = stat.st_mtime_ns
+    write_json_atomic(meta_path, meta)
+    return True
+
+
+def cached_download(url, cache_dir = None, timeout = 60, expected_sha256 = None, verify = True, revalidate = True):
+    '''
+    Télécharge un fichier dans le cache local, seulement s'il a changé depuis le dernier téléchargement,
+    et renvoie le chemin du fichier dans le cache.
+
+    Parameters:
+    ----------
+    url : str
+        URL du fichier.
+    cache_dir : str, optional
+        Dossier du cache (CACHE_DIR par défaut).
+    timeout : int
+        Délai maximum d'attente de la réponse du serveur (en secondes).
+    expected_sha256 : str, optional
+        Empreinte SHA-256 attendue du fichier. Une erreur est levée si le fichier téléchargé ne correspond pas.
+    verify : bool
+        Vérifie l'empreinte du fichier du cache avant de le réutiliser, s'il a été modifié depuis
+        l'écriture de ses métadonnées (sa taille est toujours vérifiée).
+    revalidate : bool
+        Vérifie auprès du serveur que le fichier du cache est à jour. Sinon, le fichier du cache est
+        réutilisé sans requête s'il est valide (pour un appelant qui vient de le revalider).
+
+    Returns:
+    -------
+    str
+        Chemin du fichier dans le cache.
+
+    Notes:
+    ------
+    Si le fichier est déjà dans le cache, la requête est conditionnelle (en-têtes "If-None-Match" et
+    "If-Modified-Since") : le serveur répond "304 Not Modified" sans renvoyer le fichier s'il n'a pas changé.
+    Le fichier est écrit dans un fichier temporaire puis renommé, de sorte qu'un autre processus ne lit
+    jamais un fichier incomplet. Les métadonnées sont écrites après le fichier : un fichier du cache qui ne
+    correspond pas à ses métadonnées (taille ou empreinte, après un arrêt entre les deux écritures) est
+    téléchargé à nouveau. Si le serveur n'est pas joignable ou répond par une erreur serveur (5xx),
+    le fichier du cache est réutilisé.
+    '''
+
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok = True)
+    data_path, meta_path = _cache_paths(url, cache_dir)
+
+    # Vérification du fichier du cache (présent et non corrompu)
+    meta = read_cache_metadata(url, cache_dir)
+    if meta is not None and not _cache_file_matches(data_path, meta_path, meta, verify):
+        meta = None
+    if meta is not None and not revalidate:
+        return data_path
+
+    # Requête, conditionnelle si le fichier est dans le cache
+    headers = {"Accept-Encoding": "identity"}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = urllib.request.urlopen(urllib.request.Request(url, headers = headers), timeout = timeout)
+    except urllib.error.HTTPError as error:
+        if error.code == 304 and meta is not None:
+            # Fichier inchangé : aucun transfert
+            meta["checked_at"] = time.time()
+            write_json_atomic(meta_path, meta)
+            return data_path
+        if error.code >= 500 and meta is not None:
+            # Erreur du serveur : réutilisation du fichier du cache
+            return data_path
+        raise
+    except (urllib.error.URLError, OSError):
+        if meta is not None:
+            # Serveur injoignable : réutilisation du fichier du cache
+            return data_path
+        raise
+
+    # Téléchargement dans un fichier temporaire, avec calcul de l'empreinte au fil de l'eau
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir = cache_dir, suffix = ".part")
+    try:
+        with response, os.fdopen(fd, "wb") as file:
+            for block in iter(lambda: response.read(BLOCK_SIZE), b""):
+                sha256.update(block)
+                size += len(block)
+                file.write(block)
+
+        content_length = response.headers.get("Content-Length")
+        if content_length is not None and int(content_length) != size:
+            raise IOError(f"Téléchargement incomplet de {url} : {size} octets reçus sur {content_length}")
+        if expected_sha256 is not None and sha256.hexdigest() != expected_sha256:
+            raise IOError(f"Empreinte SHA-256 inattendue pour {url}")
+
+        os.replace(tmp_path, data_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # Métadonnées écrites en dernier, avec la date de modification du fichier publié
+    write_json_atomic(meta_path, {
+        "url": url, "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+        "sha256": sha256.hexdigest(), "size": size, "mtime_ns": os.stat(data_path).st_mtime_ns,
+        "downloaded_at": time.time(), "checked_at": time.time()})
+
+    return data_path
+
+
+def source_version(paths, cache_dir = None, revalidate = False):
+    '''
+    Calcule une "version" des fichiers sources, qui change dès que l'un d'eux change.
+
+    Parameters:
+    ----------
+    paths : list
+        URLs ou chemins locaux des fichiers sources.
+    cache_dir : str, optional
+        Dossier du cache (CACHE_DIR par défaut).
+    revalidate : bool
+        Pour les URLs, vérifie d'abord auprès du serveur que le fichier du cache est à jour
+        (requête conditionnelle, voir cached_download).
+
+    Returns:
+    -------
+    str
+        Empreinte SHA-256 des empreintes des fichiers des URLs (d'après le cache) et de la taille
+        et la date de modification des fichiers locaux.
+    '''
+
+    sha256 = hashlib.sha256()
+    for path in paths:
+        if is_url(path):
+            if revalidate:
+                cached_download(path, cache_dir = cache_dir)
+            meta = read_cache_metadata(path, cache_dir) or {}
+            sha256.update(f"{path}:{meta.get('sha256')}".encode("utf-8"))
+        elif os.path.exists(path):
+            stat = os.stat(path)
+            sha256.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        else:
+            sha256.update(f"{path}:".encode("utf-8"))
+    return sha256.hexdigest()
+
+
+def local_path(path, cache_dir = None, revalidate = True):
+    '''
+    Renvoie le chemin local d'un fichier source : le fichier du cache pour une URL (voir cached_download),
+    le chemin lui-même pour un fichier local. Permet de ne résoudre une URL qu'une fois pour plusieurs lectures.
+    '''
+
+    return cached_download(path, cache_dir = cache_dir, revalidate = revalidate) if is_url(path) else path
+
+
+def read_csv_cached(path, cache_dir = None, revalidate = True, **kwargs):
+    '''
+    Équivalent de pandas.read_csv qui passe par le cache local pour les URLs.
+
+    Parameters:
+    ----------
+    path : str
+        URL ou chemin local du fichier. Les chemins locaux sont lus directement.
+    cache_dir : str, optional
+        Dossier du cache (CACHE_DIR par défaut).
+    revalidate : bool
+        Vérifie auprès du serveur que le fichier du cache est à jour (voir cached_download). False si la
+        version du fichier vient d'être calculée avec revalidate = True (voir source_version).
+    **kwargs
+        Arguments passés à pandas.read_csv (delimiter, usecols, dtype, chunksize...).
+
+    Returns:
+    -------
+    pandas.DataFrame ou pandas.io.parsers.TextFileReader
+        Le résultat de pandas.read_csv. Les fichiers ".gz" du cache sont décompressés au fil de la lecture.
+    '''
+
+    return pd.read_csv(local_path(path, cache_dir = cache_dir, revalidate = revalidate), **kwargs)
@@ -0,0 +1,243 @@
+# Évaluation hors ligne des moteurs de recommandation : qualité par rapport au modèle de référence
+# (plus proches voisins + paliers de genres) et coûts (latence, construction de l'index, mémoire)
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from movie_graph import build_cast_graph, recommend_movies_same_people
+from movie_partitions import DATASET_DIR, current_dataset_dir, read_current_manifest, read_partitions
+from movie_processing import (build_movies_recommendation, group_persons_votes_ratings, keep_processed_movies,
+                              process_genres)
+from movie_recommendation import (build_content_index, format_recommendations, recommend_movies_content,
+                                  recommend_movies_nearest_neighbors)
+from movie_sources import DATASET_MIN_YEAR
+
+# Nom du moteur de référence, auquel les autres moteurs sont comparés
+BASELINE = "Plus proches voisins"
+
+
+def default_backends(df_actors, df_directors, list_all_genres, blend_weights = (1.0, 0.7, 0.5)):
+    '''
+    Renvoie les moteurs de recommandation de l'application, sous la forme attendue par evaluate_backends.
+
+    Parameters:
+    ----------
+    df_actors, df_directors : pandas.DataFrame
+        Lignes film - acteur et film - réalisateur, avec les colonnes "tconst", "nconst" et "primaryName".
+    list_all_genres : list
+        Liste de tous les genres connus (utilisée par le modèle des plus proches voisins).
+    blend_weights : tuple
+        Poids du contenu testés pour le moteur de similarité de contenu.
+
+    Returns:
+    -------
+    dict
+        Dictionnaire nom du moteur -> (construction, recommandation), où construction(df_movies) renvoie
+        l'index du moteur et recommandation(index, df_movies, titre_film) renvoie les films recommandés.
+    '''
+
+    backends = {BASELINE : (lambda df_movies: None,
+                            lambda index, df_movies, titre_film: recommend_movies_nearest_neighbors(
+                                df_movies, list_all_genres, titre_film))}
+
+    def build_content(df_movies):
+        return build_content_index(df_movies, df_actors[["tconst", "nconst"]], df_directors[["tconst", "nconst"]])
+
+    for blend_weight in blend_weights:
+        backends[f"Contenu (poids {blend_weight:g})"] = (
+            build_content,
+            lambda index, df_movies, titre_film, blend_weight = blend_weight: recommend_movies_content(
+                index, df_movies, titre_film, blend_weight = blend_weight))
+
+    backends["Mêmes acteurs et réalisateurs"] = (lambda df_movies: build_cast_graph(df_actors, df_directors),
+                                                 recommend_movies_same_people)
+    return backends
+
+
+def sample_queries(df_movies, nb_queries = 100, seed = 0):
+    '''
+    Tire au hasard (de façon reproductible) les titres de films utilisés comme requêtes.
+    '''
+
+    titles = pd.Series(df_movies["title"].unique())
+    return titles.sample(n = min(nb_queries, len(titles)), random_state = seed).tolist()
+
+
+def index_memory_bytes(value):
+    '''
+    Estime la mémoire (en octets) occupée par l'index d'un moteur : tableaux numpy, matrices creuses
+    et DataFrames, y compris dans des dictionnaires, listes ou tuples.
+    '''
+
+    if value is None:
+        return 0
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return value.nbytes + sum(sys.getsizeof(item) for item in value.ravel())
+        return value.nbytes
+    if sparse.issparse(value):
+        value = value.tocsr()
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep = True)))
+    if isinstance(value, dict):
+        return sum(index_memory_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(index_memory_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _displayed_tconst(df_movies, df_recommended_movies, k):
+    '''
+    Identifiants des films affichés par l'application pour une recommandation (voir format_recommendations).
+    '''
+
+    if len(df_recommended_movies) == 0:
+        return set()
+    rows = format_recommendations(df_recommended_movies, k).index
+    return set(df_movies.loc[rows, "tconst"])
+
+
+def evaluate_backends(backends, df_movies, titles, baseline = BASELINE, k = 10):
+    '''
+    Passe les requêtes dans chaque moteur et compare leurs recommandations à celles du moteur de référence.
+
+    Parameters:
+    ----------
+    backends : dict
+        Moteurs à évaluer (voir default_backends), dont le moteur de référence.
+    df_movies : pandas.DataFrame
+        DataFrame des films (voir build_recommendation_table), avec un index 0..n-1.
+    titles : list
+        Titres des films requêtes.
+    baseline : str
+        Nom du moteur de référence.
+    k : int
+        Nombre de films affichés comparés.
+
+    Returns:
+    -------
+    Tuple[pandas.DataFrame, pandas.DataFrame]
+        - Le rapport : une ligne par moteur, avec le rappel ("recall@k", part des films de la référence
+          retrouvés) et le recouvrement ("overlap@k", indice de Jaccard) moyens, les centiles de latence
+          par requête (en ms), la durée de construction de l'index (en s) et sa mémoire (en Mo).
+        - Le détail : une ligne par moteur et par requête.
+
+    Notes:
+    ------
+    Les films comparés sont ceux affichés par l'application (format_recommendations) : les k premiers,
+    en privilégiant les films "recommandés". Le modèle de référence entraîne un modèle par requête : son
+    index est vide et son coût est compté dans la latence.
+    '''
+
+    df_movies = df_movies.reset_index(drop = True)
+
+    list_details = []
+    dict_costs = {}
+    displayed = {}
+    for name, (build, recommend) in backends.items():
+        start = time.perf_counter()
+        index = build(df_movies)
+        build_seconds = time.perf_counter() - start
+        dict_costs[name] = (build_seconds, index_memory_bytes(index) / 1024 ** 2)
+
+        for titre_film in titles:
+            start = time.perf_counter()
+            df_recommended_movies = recommend(index, df_movies, titre_film)
+            latency_ms = (time.perf_counter() - start) * 1000
+            displayed[name, titre_film] = _displayed_tconst(df_movies, df_recommended_movies, k)
+            list_details.append({"backend" : name, "title" : titre_film, "latency_ms" : latency_ms,
+                                 "nb_movies" : len(displayed[name, titre_film])})
+
+    df_details = pd.DataFrame(list_details)
+
+    # Rappel et recouvrement par rapport au moteur de référence
+    recall, overlap = [], []
+    for name, titre_film in zip(df_details["backend"], df_details["title"]):
+        reference, movies = displayed[baseline, titre_film], displayed[name, titre_film]
+        recall.append(len(reference & movies) / len(reference) if len(reference) > 0 else np.nan)
+        overlap.append(len(reference & movies) / len(reference | movies) if len(reference | movies) > 0 else np.nan)
+    df_details[f"recall@{k}"] = recall
+    df_details[f"overlap@{k}"] = overlap
+
+    list_report = []
+    for name, df_backend in df_details.groupby("backend", sort = False):
+        latency = df_backend["latency_ms"].to_numpy()
+        list_report.append({
+            "backend" : name,
+            f"recall@{k}" : df_backend[f"recall@{k}"].mean(),
+            f"overlap@{k}" : df_backend[f"overlap@{k}"].mean(),
+            "latency_p50_ms" : np.percentile(latency, 50),
+            "latency_p95_ms" : np.percentile(latency, 95),
+            "latency_p99_ms" : np.percentile(latency, 99),
+            "build_s" : dict_costs[name][0],
+            "memory_mb" : dict_costs[name][1],
+            "nb_queries" : len(df_backend),
+            "nb_empty" : int((df_backend["nb_movies"] == 0).sum())})
+
+    return pd.DataFrame(list_report), df_details
+
+
+def append_report(df_report, path, label = "", nb_movies = None, data_version = None):
+    '''
+    Ajoute un rapport d'évaluation à un fichier csv, avec la date, un libellé, la taille et la version
+    des données, pour comparer les exécutions successives.
+    '''
+
+    df_report = df_report.assign(run_at = datetime.datetime.now().isoformat(timespec = "seconds"),
+                                 label = label, nb_movies = nb_movies, data_version = data_version)
+    df_report.to_csv(path, mode = "a", header = not os.path.exists(path), index = False)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(
+        description = "Évaluation des moteurs de recommandation sur les données d'une région de la version "
+                      "courante du jeu de données partitionné")
+    parser.add_argument("--dataset-dir", default = DATASET_DIR)
+    parser.add_argument("--region", default = "FR")
+    parser.add_argument("--min-year", type = int, default = DATASET_MIN_YEAR)
+    parser.add_argument("--queries", type = int, default = 100, help = "nombre de films requêtes")
+    parser.add_argument("--k", type = int, default = 10, help = "nombre de films affichés comparés")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--output", default = "evaluation_report.csv", help = "fichier csv des rapports")
+    parser.add_argument("--label", default = "", help = "libellé de l'exécution dans le rapport")
+    args = parser.parse_args(argv)
+
+    version_dir = current_dataset_dir(args.dataset_dir)
+    if version_dir is None:
+        parser.error(f"aucune version du jeu de données publiée dans {args.dataset_dir}")
+    data_version = read_current_manifest(args.dataset_dir)["version"]
+
+    df_movies = read_partitions(version_dir, "movies", args.region, year_min = args.min_year)
+    df_actors = read_partitions(version_dir, "actors", args.region, year_min = args.min_year)
+    df_directors = read_partitions(version_dir, "directors", args.region, year_min = args.min_year)
+    if len(df_movies) == 0:
+        parser.error(f"aucun film pour la région {args.region} dans {version_dir}")
+
+    # Mêmes traitements que l'application pour une région : films sans les genres exclus par process_genres,
+    # personnes de ces seuls films, films "recommandés" des acteurs et réalisateurs les plus populaires
+    movies_genres = process_genres(df_movies)
+    df_actors = keep_processed_movies(movies_genres, df_actors)
+    df_directors = keep_processed_movies(movies_genres, df_directors)
+    list_all_genres = movies_genres[1]["Genre"]
+    df_recommendation = build_movies_recommendation(df_actors, df_directors, group_persons_votes_ratings(df_actors),
+                                                    group_persons_votes_ratings(df_directors))
+
+    titles = sample_queries(df_recommendation, args.queries, args.seed)
+    df_report, _ = evaluate_backends(default_backends(df_actors, df_directors, list_all_genres),
+                                     df_recommendation, titles, k = args.k)
+    append_report(df_report, args.output, label = args.label, nb_movies = len(df_recommendation),
+                  data_version = data_version)
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(df_report.round(3).to_string(index = False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# Graphe films - personnes (acteurs, réalisateurs) stocké en tableaux CSR, pour les recommandations
+# "mêmes acteurs / réalisateurs" et les classements des collaborateurs
+import numpy as np
+import pandas as pd
+
+# Rôles d'une personne dans un film (combinables : une personne peut jouer dans le film qu'elle réalise)
+ROLE_ACTOR = 1
+ROLE_DIRECTOR = 2
+
+
+def _csr_from_pairs(rows, columns, nb_rows):
+    '''
+    Construit les tableaux CSR (indptr, indices) d'une relation donnée par des couples (ligne, colonne)
+    d'entiers : les voisins de la ligne i sont indices[indptr[i]:indptr[i + 1]], triés.
+    Renvoie aussi l'ordre des couples dans "indices", pour ordonner des valeurs portées par les couples.
+    '''
+
+    order = np.lexsort((columns, rows))
+    indptr = np.zeros(nb_rows + 1, dtype = np.int64)
+    np.cumsum(np.bincount(rows, minlength = nb_rows), out = indptr[1:])
+    return indptr, columns[order].astype(np.int32), order
+
+
+def _neighbors(indptr, indices, rows):
+    '''
+    Renvoie la concaténation des voisins des lignes données, en un seul parcours vectorisé des tableaux CSR.
+    '''
+
+    rows = np.asarray(rows, dtype = np.int64)
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    if lengths.sum() == 0:
+        return np.array([], dtype = indices.dtype)
+    # Position de chaque voisin dans "indices" : début de sa ligne + rang dans la ligne
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return indices[offsets + np.arange(lengths.sum())]
+
+
+def build_cast_graph(df_actors, df_directors):
+    '''
+    Construit le graphe biparti films - personnes à partir des lignes film - acteur et film - réalisateur.
+
+    Parameters:
+    ----------
+    df_actors, df_directors : pandas.DataFrame
+        Lignes film - personne, avec les colonnes "tconst", "nconst" et "primaryName".
+
+    Returns:
+    -------
+    dict
+        Dictionnaire contenant :
+        - 'tconst' : identifiants des films (le film d'entier i est tconst[i])
+        - 'nconst', 'names' : identifiants et noms des personnes (la personne d'entier j est nconst[j])
+        - 'is_actor', 'is_director' : rôles de chaque personne
+        - 'movie_indptr', 'movie_indices' : personnes de chaque film (CSR)
+        - 'person_indptr', 'person_indices' : films de chaque personne (CSR)
+        - 'person_roles' : rôle de la personne dans chacun de ses films, aligné sur 'person_indices'
+          (ROLE_ACTOR, ROLE_DIRECTOR ou les deux)
+
+    Notes:
+    ------
+    Les identifiants IMDb sont remplacés une seule fois par des entiers consécutifs : les requêtes
+    parcourent ensuite les tableaux CSR (quelques tranches de tableaux numpy) au lieu de fusionner des DataFrames.
+    Une personne à la fois actrice et réalisatrice d'un film n'y est reliée qu'une fois.
+    '''
+
+    df_links = pd.concat([df_actors[["tconst", "nconst", "primaryName"]].assign(director = False),
+                          df_directors[["tconst", "nconst", "primaryName"]].assign(director = True)],
+                         ignore_index = True)
+
+    movie_codes, tconst = pd.factorize(df_links["tconst"])
+    person_codes, nconst = pd.factorize(df_links["nconst"])
+    nb_movies, nb_persons = len(tconst), len(nconst)
+
+    # Nom et rôles de chaque personne
+    names = np.empty(nb_persons, dtype = object)
+    names[person_codes] = df_links["primaryName"].to_numpy(dtype = object)
+    is_director = np.zeros(nb_persons, dtype = bool)
+    is_director[person_codes[df_links["director"].to_numpy()]] = True
+    is_actor = np.zeros(nb_persons, dtype = bool)
+    is_actor[person_codes[~df_links["director"].to_numpy()]] = True
+
+    # Suppression des liens en double (même personne, même film), en conservant les rôles de chaque lien
+    pairs, pair_codes = np.unique(movie_codes.astype(np.int64) * nb_persons + person_codes, return_inverse = True)
+    roles = np.zeros(len(pairs), dtype = np.int8)
+    np.bitwise_or.at(roles, pair_codes.ravel(),
+                     np.where(df_links["director"].to_numpy(), ROLE_DIRECTOR, ROLE_ACTOR).astype(np.int8))
+    movie_codes, person_codes = pairs // max(nb_persons, 1), pairs % max(nb_persons, 1)
+
+    movie_indptr, movie_indices, _ = _csr_from_pairs(movie_codes, person_codes, nb_movies)
+    person_indptr, person_indices, person_order = _csr_from_pairs(person_codes, movie_codes, nb_persons)
+
+    return {"tconst" : np.asarray(tconst, dtype = object), "nconst" : np.asarray(nconst, dtype = object),
+            "names" : names, "is_actor" : is_actor, "is_director" : is_director,
+            "movie_indptr" : movie_indptr, "movie_indices" : movie_indices,
+            "person_indptr" : person_indptr, "person_indices" : person_indices,
+            "person_roles" : roles[person_order]}
+
+
+def person_rows(graph, name):
+    '''
+    Renvoie les entiers des personnes portant un nom (plusieurs en cas d'homonymes, comme dans les classements).
+    '''
+
+    return np.flatnonzero(graph["names"] == name)
+
+
+def shared_people_counts(graph, movie_rows):
+    '''
+    Compte, pour chaque film du graphe, le nombre de personnes qu'il partage avec les films donnés.
+
+    Parameters:
+    ----------
+    graph : dict
+        Graphe renvoyé par build_cast_graph.
+    movie_rows : array-like
+        Entiers des films de départ.
+
+    Returns:
+    -------
+    numpy.ndarray
+        Nombre de personnes en commun, pour chaque film du graphe (films de départ compris).
+    '''
+
+    people = np.unique(_neighbors(graph["movie_indptr"], graph["movie_indices"], movie_rows))
+    movies = _neighbors(graph["person_indptr"], graph["person_indices"], people)
+    return np.bincount(movies, minlength = len(graph["tconst"]))
+
+
+def collaborators(graph, rows, role = None, nb_persons = 20):
+    '''
+    Classe les personnes ayant travaillé avec une personne, par nombre de films en commun.
+
+    Parameters:
+    ----------
+    graph : dict
+        Graphe renvoyé par build_cast_graph.
+    rows : array-like
+        Entiers de la personne (voir person_rows).
+    role : str, optional
+        "actor" ou "director" pour ne garder que les acteurs/actrices ou les réalisateurs.
+    nb_persons : int
+        Nombre de collaborateurs renvoyés.
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Colonnes "nconst", "primaryName" et "nb_movies" (nombre de films en commun), triées par nombre
+        de films décroissant.
+    '''
+
+    rows = np.asarray(rows, dtype = np.int64)
+    movies = np.unique(_neighbors(graph["person_indptr"], graph["person_indices"], rows))
+    counts = np.bincount(_neighbors(graph["movie_indptr"], graph["movie_indices"], movies),
+                         minlength = len(graph["nconst"]))
+    counts[rows] = 0
+    if role == "actor":
+        counts[~graph["is_actor"]] = 0
+    elif role == "director":
+        counts[~graph["is_director"]] = 0
+
+    candidates = np.flatnonzero(counts)
+    k = min(nb_persons, len(candidates))
+    if k > 0:
+        candidates = candidates[np.argpartition(-counts[candidates], k - 1)[:k]]
+    # Tri par nombre de films décroissant, puis par nom
+    candidates = candidates[np.lexsort((graph["names"][candidates].astype(str), -counts[candidates]))]
+
+    return pd.DataFrame({"nconst" : graph["nconst"][candidates], "primaryName" : graph["names"][candidates],
+                         "nb_movies" : counts[candidates]})
+
+
+def recommend_movies_same_people(graph, df_movies, titre_film, k = 50):
+    '''
+    Recommande les films partageant le plus d'acteurs et de réalisateurs avec un film choisi.
+
+    Parameters:
+    ----------
+    graph : dict
+        Graphe renvoyé par build_cast_graph.
+    df_movies : pandas.DataFrame
+        DataFrame des films parmi lesquels recommander (colonnes "tconst", "title" et "numVotes").
+    titre_film : str
+        Titre du film choisi.
+    k : int
+        Nombre de films renvoyés.
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Les k films ayant le plus de personnes en commun avec le film choisi (à égalité, les plus votés
+        d'abord), avec une colonne "shared_people". Vide si le titre est inconnu.
+    '''
+
+    query = df_movies["title"] == titre_film
+    if not query.any():
+        return df_movies.iloc[0:0]
+
+    # Entier de chaque film de df_movies dans le graphe (-1 si le film n'a ni acteur ni réalisateur connu)
+    graph_rows = pd.Index(graph["tconst"]).get_indexer(df_movies["tconst"])
+    query_rows = graph_rows[query.to_numpy() & (graph_rows >= 0)]
+    counts = shared_people_counts(graph, query_rows[:1])
+
+    # Même comportement que les autres méthodes : le premier film portant ce titre sert de requête,
+    # tous les films de ce titre sont exclus des résultats
+    shared_people = np.where(graph_rows >= 0, counts[graph_rows], 0)
+    shared_people[query.to_numpy()] = 0
+    candidates = np.flatnonzero(shared_people)
+    order = np.lexsort((-df_movies["numVotes"].to_numpy()[candidates], -shared_people[candidates]))[:k]
+
+    return df_movies.iloc[candidates[order]].assign(shared_people = shared_people[candidates[order]])
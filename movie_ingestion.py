@@ -0,0 +1,290 @@
+# Lecture "out-of-core" (à mémoire bornée) des fichiers IMDb title.principals et name.basics
+import math
+import os
+import shutil
+import tempfile
+import zlib
+
+import pandas as pd
+
+from movie_download import local_path
+
+# Catégories de personnes conservées dans le fichier title.principals
+ACTOR_CATEGORIES = ["actor", "actress"]
+DIRECTOR_CATEGORIES = ["director"]
+
+# Colonnes des lignes film - personne renvoyées
+PERSON_COLUMNS = ["tconst", "nconst", "category", "primaryName", "averageRating", "numVotes"]
+
+# Estimation de la place occupée en mémoire par une ligne lue (en octets), pour dimensionner les "chunks"
+BYTES_PER_ROW = 250
+
+# Facteur entre la taille d'un fichier décompressé et sa taille une fois chargé dans un DataFrame
+MEMORY_EXPANSION_FACTOR = 3
+
+# Quantité de données compressées (en octets) décompressée pour estimer le taux de compression d'un fichier .gz
+COMPRESSION_SAMPLE_BYTES = 4 * 1024 ** 2
+
+# Taille des blocs lus et décompressés pour cette estimation (en octets)
+COMPRESSION_BLOCK_BYTES = 256 * 1024
+
+# Nombre maximum de redécoupages successifs d'une partition trop grande pour le budget restant
+MAX_SPLIT_DEPTH = 4
+
+# Nombre de partitions utilisé quand la taille des fichiers n'est pas connue
+DEFAULT_NB_PARTITIONS = 64
+
+
+def _uncompressed_size(path):
+    '''
+    Estime la taille d'un fichier une fois décompressé : pour un fichier .gz, le taux de compression
+    est mesuré en décompressant le début du fichier (la taille stockée en fin de fichier gzip
+    est tronquée à 4 Go).
+    '''
+
+    size = os.path.getsize(path)
+    if not path.endswith(".gz"):
+        return size
+    # Décompression bloc par bloc : les données décompressées ne sont que comptées, jamais gardées en mémoire
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    nb_compressed = nb_bytes = 0
+    with open(path, "rb") as file:
+        while nb_compressed < COMPRESSION_SAMPLE_BYTES and not decompressor.eof:
+            data = file.read(COMPRESSION_BLOCK_BYTES)
+            if not data:
+                break
+            nb_compressed += len(data)
+            while data and not decompressor.eof:
+                nb_bytes += len(decompressor.decompress(data, COMPRESSION_BLOCK_BYTES))
+                data = decompressor.unconsumed_tail
+    return size * nb_bytes / max(1, nb_compressed)
+
+
+def _nb_partitions(paths, memory_budget_bytes):
+    '''
+    Calcule le nombre de partitions nécessaire pour qu'une partition de chaque fichier,
+    une fois chargée, tienne dans environ un quart du budget mémoire.
+    '''
+
+    if not all(os.path.isfile(path) for path in paths):
+        return DEFAULT_NB_PARTITIONS
+    total_size = sum(_uncompressed_size(path) for path in paths)
+    return max(1, math.ceil(total_size * MEMORY_EXPANSION_FACTOR / (memory_budget_bytes / 4)))
+
+
+def _spill_partitions(df_chunk, key, nb_partitions, spill_path_pattern, depth = 0):
+    '''
+    Répartit les lignes d'un "chunk" par hachage de la colonne clé, et les ajoute
+    aux fichiers de partition correspondants sur le disque. Le hachage dépend de "depth" : une partition
+    redécoupée (voir _split_partition) est répartie autrement que par le découpage qui l'a produite.
+    '''
+
+    partitions = pd.util.hash_array(df_chunk[key].to_numpy(dtype = object), hash_key = f"{depth:016d}") % nb_partitions
+    for partition, df_partition in df_chunk.groupby(partitions):
+        spill_path = spill_path_pattern.format(partition)
+        df_partition.to_csv(spill_path, sep = '\t', index = False, mode = 'a',
+                            header = not os.path.exists(spill_path))
+
+
+def _partition_memory(paths):
+    '''
+    Estime la mémoire nécessaire à la fusion d'une partition, d'après la taille de ses fichiers.
+    '''
+
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path)) * MEMORY_EXPANSION_FACTOR
+
+
+def _split_partition(paths, nb_partitions, depth, chunksize):
+    '''
+    Redécoupe une partition (ses fichiers title.principals et name.basics) en nb_partitions partitions,
+    relues par "chunks", et renvoie les chemins des nouvelles partitions. Les fichiers d'origine sont supprimés.
+    '''
+
+    list_paths = []
+    for path in paths:
+        pattern = path[:-len(".tsv")] + f"_{depth}_{{:04d}}.tsv"
+        if os.path.exists(path):
+            for chunk in pd.read_csv(path, delimiter = '\t', dtype = 'string', chunksize = chunksize):
+                _spill_partitions(chunk, "nconst", nb_partitions, pattern, depth = depth)
+            os.remove(path)
+        list_paths.append([pattern.format(partition) for partition in range(nb_partitions)])
+    return list(zip(*list_paths))
+
+
+def iter_title_principals_and_name_basics_out_of_core(path_principals, path_name_basics, df_title_ratings,
+    memory_budget_mb = 512, tconst_filter = None, spill_dir = None, keep_results = False):
+    '''
+    Lit et fusionne les fichiers title.principals et name.basics avec les notes des films, partition par
+    partition, sans jamais charger l'un des deux fichiers en entier en mémoire.
+
+    Parameters:
+    ----------
+    Voir load_title_principals_and_name_basics_out_of_core, et :
+    keep_results : bool
+        Indique que l'appelant garde en mémoire les partitions renvoyées, puis les concatène : leur taille
+        est alors décomptée deux fois du budget mémoire (partitions et copie concaténée).
+
+    Returns:
+    -------
+    generator
+        Générateur de tuples (acteurs/actrices, réalisateurs) : les lignes film - personne d'une partition
+        des personnes, avec les colonnes de load_title_principals_and_name_basics_out_of_core. Chaque personne
+        n'apparaît que dans une partition.
+
+    Notes:
+    ------
+    Permet de traiter les partitions une à une (par exemple pour les écrire sur le disque) sans garder
+    le résultat entier en mémoire. Les fichiers de partition sont supprimés à la fin du parcours.
+    Le budget mémoire couvre les notes des films conservés, le résultat gardé par l'appelant et les lectures
+    et fusions : une partition trop grande pour ce qu'il en reste est redécoupée avant d'être fusionnée.
+    Une erreur MemoryError est levée si les notes et le résultat ne laissent plus de place aux fusions.
+    '''
+
+    # Les URLs sont lues depuis le cache local des téléchargements
+    path_principals = local_path(path_principals)
+    path_name_basics = local_path(path_name_basics)
+
+    # Notes des seuls films conservés, décomptées du budget
+    df_ratings = df_title_ratings[["tconst", "averageRating", "numVotes"]]
+    if tconst_filter is not None:
+        tconst_filter = pd.Index(pd.unique(pd.Series(tconst_filter, dtype = "string")))
+        df_ratings = df_ratings[df_ratings["tconst"].isin(tconst_filter)]
+    memory_budget_bytes = memory_budget_mb * 1024 ** 2
+    used_bytes = df_ratings.memory_usage(deep = True).sum()
+
+    def available_bytes():
+        available = memory_budget_bytes - used_bytes
+        if available <= 0:
+            raise MemoryError(f"Budget mémoire de {memory_budget_mb} Mo insuffisant : les notes des films "
+                              f"et le résultat occupent déjà {used_bytes / 1024 ** 2:.0f} Mo")
+        return available
+
+    chunksize = max(10000, int(available_bytes() / 4 / BYTES_PER_ROW))
+    nb_partitions = _nb_partitions([path_principals, path_name_basics], available_bytes())
+
+    spill_dir = tempfile.mkdtemp(prefix = "imdb_spill_", dir = spill_dir)
+    principals_pattern = os.path.join(spill_dir, "principals_{:04d}.tsv")
+    names_pattern = os.path.join(spill_dir, "names_{:04d}.tsv")
+
+    try:
+        # Partitionnement du fichier title.principals
+        df_chunks_principals = pd.read_csv(
+            path_principals, usecols = ['tconst', 'nconst', 'category'],
+            dtype = {'tconst': 'string', 'nconst': 'string', 'category': 'string'}, delimiter = '\t',
+            chunksize = chunksize)
+
+        for chunk in df_chunks_principals:
+            # Conservation des seuls acteurs, actrices et réalisateurs
+            chunk = chunk[chunk['category'].isin(ACTOR_CATEGORIES + DIRECTOR_CATEGORIES)]
+            if tconst_filter is not None:
+                chunk = chunk[chunk['tconst'].isin(tconst_filter)]
+            chunk = chunk.drop_duplicates()
+            _spill_partitions(chunk, "nconst", nb_partitions, principals_pattern)
+
+        # Partitionnement du fichier name.basics
+        df_chunks_name = pd.read_csv(
+            path_name_basics, usecols = ['nconst', 'primaryName'],
+            dtype = {'nconst': 'string', 'primaryName': 'string'}, delimiter = '\t', chunksize = chunksize)
+
+        for chunk in df_chunks_name:
+            _spill_partitions(chunk, "nconst", nb_partitions, names_pattern)
+
+        # Fusion partition par partition, en redécoupant les partitions trop grandes pour le budget restant
+        pending = [(principals_pattern.format(partition), names_pattern.format(partition), 0)
+                   for partition in reversed(range(nb_partitions))]
+        while pending:
+            path_partition_principals, path_partition_names, depth = pending.pop()
+            if not os.path.exists(path_partition_principals) or not os.path.exists(path_partition_names):
+                continue
+
+            memory = _partition_memory([path_partition_principals, path_partition_names])
+            if memory > available_bytes() and depth < MAX_SPLIT_DEPTH:
+                nb_splits = max(2, math.ceil(memory / available_bytes()))
+                split_chunksize = max(1000, int(available_bytes() / 4 / BYTES_PER_ROW))
+                pending.extend((paths[0], paths[1], depth + 1) for paths in reversed(_split_partition(
+                    [path_partition_principals, path_partition_names], nb_splits, depth + 1, split_chunksize)))
+                continue
+
+            df_principals = pd.read_csv(
+                path_partition_principals, delimiter = '\t',
+                dtype = {'tconst': 'string', 'nconst': 'string', 'category': 'category'})
+            # Les doublons répartis sur plusieurs "chunks" se retrouvent dans la même partition
+            df_principals = df_principals.drop_duplicates()
+            df_names = pd.read_csv(
+                path_partition_names, delimiter = '\t',
+                dtype = {'nconst': 'string', 'primaryName': 'string'})
+
+            df_movies_names = pd.merge(left = df_principals, right = df_names, how = 'inner', on = "nconst")
+            df_movies_ratings = pd.merge(left = df_movies_names, right = df_ratings, how = 'inner', on = "tconst")
+            del df_principals, df_names, df_movies_names
+
+            df_actors = df_movies_ratings.loc[df_movies_ratings["category"].isin(ACTOR_CATEGORIES), PERSON_COLUMNS]
+            df_directors = df_movies_ratings.loc[df_movies_ratings["category"].isin(DIRECTOR_CATEGORIES), PERSON_COLUMNS]
+            del df_movies_ratings
+            if keep_results:
+                used_bytes += 2 * (df_actors.memory_usage(deep = True).sum() +
+                                   df_directors.memory_usage(deep = True).sum())
+            yield df_actors, df_directors
+    finally:
+        # Suppression des fichiers de partition
+        shutil.rmtree(spill_dir, ignore_errors = True)
+
+
+def load_title_principals_and_name_basics_out_of_core(path_principals, path_name_basics, df_title_ratings,
+    memory_budget_mb = 512, tconst_filter = None, spill_dir = None):
+    '''
+    Charge et fusionne les fichiers title.principals et name.basics avec les notes des films,
+    sans jamais charger l'un des deux fichiers en entier en mémoire.
+
+    Parameters:
+    ----------
+    path_principals : str
+        Chemin ou URL du fichier title.principals.tsv(.gz).
+    path_name_basics : str
+        Chemin ou URL du fichier name.basics.tsv(.gz).
+    df_title_ratings : pandas.DataFrame
+        DataFrame des notes (colonnes "tconst", "averageRating", "numVotes").
+    memory_budget_mb : int
+        Budget mémoire (en Mo) pour les notes des films conservés, le résultat, et la lecture et la fusion
+        des partitions.
+    tconst_filter : array-like, optional
+        Identifiants des films à conserver. Les autres films sont écartés dès la lecture.
+    spill_dir : str, optional
+        Dossier dans lequel écrire les fichiers de partition temporaires (dossier temporaire du système par défaut).
+
+    Returns:
+    -------
+    Tuple[pandas.DataFrame, pandas.DataFrame]
+        Les DataFrames des acteurs/actrices et des réalisateurs avec les notes de leurs films,
+        avec les mêmes colonnes que load_and_process_title_principals_and_name_basics.
+
+    Notes:
+    ------
+    Les deux fichiers sont lus par "chunks" dimensionnés selon le budget mémoire. Chaque chunk est
+    réparti par hachage de la colonne "nconst" dans des fichiers de partition sur le disque, de sorte
+    que toutes les lignes d'une même personne se retrouvent dans la même partition des deux fichiers.
+    Les fusions sont ensuite faites partition par partition : seule une partition de chaque fichier
+    est en mémoire à un instant donné, en plus des notes et du résultat. Les notes (des seuls films
+    conservés) et le résultat déjà fusionné sont décomptés du budget : les partitions sont dimensionnées,
+    et redécoupées si besoin, sur ce qu'il en reste. L'augmentation du pic de mémoire du processus reste
+    sous le budget (mesure dans tests/test_movie_ingestion.py) ; MemoryError est levée si le résultat
+    seul le dépasse.
+    '''
+
+    list_actors = []
+    list_directors = []
+    for df_actors_partition, df_directors_partition in iter_title_principals_and_name_basics_out_of_core(
+        path_principals, path_name_basics, df_title_ratings, memory_budget_mb = memory_budget_mb,
+        tconst_filter = tconst_filter, spill_dir = spill_dir, keep_results = True):
+        list_actors.append(df_actors_partition)
+        list_directors.append(df_directors_partition)
+
+    df_actors_movies_ratings = pd.concat(list_actors, ignore_index = True) if list_actors \
+        else pd.DataFrame(columns = PERSON_COLUMNS)
+    df_directors_movies_ratings = pd.concat(list_directors, ignore_index = True) if list_directors \
+        else pd.DataFrame(columns = PERSON_COLUMNS)
+
+    df_actors_movies_ratings["category"] = df_actors_movies_ratings["category"].astype("category")
+    df_directors_movies_ratings["category"] = df_directors_movies_ratings["category"].astype("category")
+
+    return df_actors_movies_ratings, df_directors_movies_ratings
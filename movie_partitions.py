@@ -0,0 +1,437 @@
+# Jeu de données des films partitionné par région et par décennie de sortie (fichiers parquet),
+# publié par version des fichiers sources
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from movie_download import local_path, read_csv_cached, source_version, write_json_atomic
+from movie_ingestion import iter_title_principals_and_name_basics_out_of_core
+from movie_sources import (DATASET_MIN_YEAR, PATH_NAME_BASICS, PATH_TITLE_AKAS, PATH_TITLE_BASICS,
+                           PATH_TITLE_PRINCIPALS, URL_TITLE_RATINGS)
+
+# Dossier du jeu de données partitionné
+DATASET_DIR = os.environ.get("MOVIE_APP_DATASET_DIR", os.path.join(tempfile.gettempdir(), "movie_app_dataset"))
+
+# Tables du jeu de données : films, notes, acteurs/actrices et réalisateurs
+TABLES = ["movies", "ratings", "actors", "directors"]
+
+# Colonne de l'année de sortie, utilisée pour le partitionnement par décennie
+YEAR_COLUMN = "startYear"
+
+# Types des colonnes des tables des acteurs et des réalisateurs, relues depuis les fichiers temporaires
+PERSON_DTYPES = {"tconst" : "string", "title" : "string", "startYear" : "int32", "runtimeMinutes" : "int32",
+                 "genres" : "string", "nconst" : "string", "category" : "category", "primaryName" : "string",
+                 "averageRating" : "float64", "numVotes" : "int64"}
+
+# Fichier désignant la version publiée (courante) du jeu de données
+CURRENT_NAME = "current.json"
+
+# Nombre de versions publiées conservées (la version courante et la précédente, encore lue par les
+# instances démarrées avant la publication)
+NB_VERSIONS_KEPT = 2
+
+# Âge (en secondes) au-delà duquel le dossier temporaire d'une construction interrompue est supprimé
+STALE_BUILD_SECONDS = 24 * 3600
+
+
+def _partition_dir(dataset_dir, table, region, decade):
+    '''
+    Renvoie le dossier d'une partition, au format "table/region=FR/decade=1980".
+    '''
+
+    return os.path.join(dataset_dir, table, f"region={region}", f"decade={decade}")
+
+
+def write_partitioned(df, dataset_dir, table, region, part_name = "0"):
+    '''
+    Écrit un DataFrame dans le jeu de données, découpé par décennie de sortie.
+
+    Parameters:
+    ----------
+    df : pandas.DataFrame
+        Données à écrire, avec une colonne "startYear".
+    dataset_dir : str
+        Dossier d'une version du jeu de données (voir publish_dataset).
+    table : str
+        Nom de la table (voir TABLES).
+    region : str
+        Code de la région (ex. : "FR").
+    part_name : str
+        Nom du fichier écrit dans chaque partition. Réécrire le même nom remplace le fichier,
+        ce qui rend l'écriture idempotente.
+
+    Notes:
+    ------
+    Chaque fichier est écrit dans un fichier temporaire puis renommé : un lecteur ne voit jamais
+    de fichier partiellement écrit.
+    '''
+
+    decades = df[YEAR_COLUMN].astype(int) // 10 * 10
+    for decade, df_decade in df.groupby(decades):
+        partition_dir = _partition_dir(dataset_dir, table, region, decade)
+        os.makedirs(partition_dir, exist_ok = True)
+        fd, tmp_path = tempfile.mkstemp(dir = partition_dir, suffix = ".tmp")
+        os.close(fd)
+        df_decade.reset_index(drop = True).to_parquet(tmp_path, index = False)
+        os.replace(tmp_path, os.path.join(partition_dir, f"part-{part_name}.parquet"))
+
+
+def list_regions(dataset_dir, table = "movies"):
+    '''
+    Renvoie la liste triée des régions présentes dans une table du jeu de données.
+    '''
+
+    table_dir = os.path.join(dataset_dir, table)
+    if not os.path.isdir(table_dir):
+        return []
+    return sorted(name.split("=", 1)[1] for name in os.listdir(table_dir) if name.startswith("region="))
+
+
+def has_region(dataset_dir, region, tables = TABLES):
+    '''
+    Indique si toutes les tables données sont présentes dans le jeu de données pour une région.
+    '''
+
+    return all(region in list_regions(dataset_dir, table) for table in tables)
+
+
+def read_partitions(dataset_dir, table, region, year_min = None, year_max = None, columns = None):
+    '''
+    Lit une table du jeu de données pour une région et une période, en ne lisant que les partitions utiles.
+
+    Parameters:
+    ----------
+    dataset_dir : str
+        Dossier d'une version du jeu de données (voir current_dataset_dir).
+    table : str
+        Nom de la table (voir TABLES).
+    region : str
+        Code de la région (ex. : "FR").
+    year_min, year_max : int, optional
+        Années de sortie minimum et maximum (incluses).
+    columns : list, optional
+        Colonnes à lire (toutes par défaut).
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Les lignes de la table pour la région et la période demandées.
+
+    Notes:
+    ------
+    Les filtres sur la région et l'année sont "poussés" jusqu'aux dossiers des partitions : seuls
+    les fichiers de la région et des décennies qui recoupent la période sont lus, puis les années
+    sont filtrées exactement.
+    '''
+
+    region_dir = os.path.join(dataset_dir, table, f"region={region}")
+    if not os.path.isdir(region_dir):
+        return pd.DataFrame(columns = columns)
+
+    list_df = []
+    for decade_name in sorted(os.listdir(region_dir)):
+        if not decade_name.startswith("decade="):
+            continue
+        decade = int(decade_name.split("=", 1)[1])
+        if (year_min is not None and decade + 9 < year_min) or (year_max is not None and decade > year_max):
+            continue
+        decade_dir = os.path.join(region_dir, decade_name)
+        for file_name in sorted(os.listdir(decade_dir)):
+            if file_name.endswith(".parquet"):
+                list_df.append(pd.read_parquet(os.path.join(decade_dir, file_name), columns = columns))
+
+    if len(list_df) == 0:
+        return pd.DataFrame(columns = columns)
+    df = pd.concat(list_df, ignore_index = True)
+
+    if year_min is not None:
+        df = df[df[YEAR_COLUMN] >= year_min]
+    if year_max is not None:
+        df = df[df[YEAR_COLUMN] <= year_max]
+    return df.reset_index(drop = True)
+
+
+def read_current_manifest(dataset_dir):
+    '''
+    Renvoie le manifeste de la version courante du jeu de données ("version", "regions", "published_at"),
+    ou None si aucune version n'a été publiée.
+    '''
+
+    try:
+        with open(os.path.join(dataset_dir, CURRENT_NAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def current_dataset_dir(dataset_dir, version = None):
+    '''
+    Renvoie le dossier de la version courante du jeu de données, à passer aux fonctions de lecture
+    (list_regions, read_partitions...), ou None si aucune version n'est publiée. Si "version" est donnée,
+    renvoie None quand la version courante est différente (jeu de données à reconstruire).
+    '''
+
+    manifest = read_current_manifest(dataset_dir)
+    if manifest is None or (version is not None and manifest["version"] != version):
+        return None
+    path = os.path.join(dataset_dir, "versions", manifest["version"])
+    return path if os.path.isdir(path) else None
+
+
+def _prune_versions(dataset_dir, current_version):
+    '''
+    Supprime les versions publiées les plus anciennes et les constructions interrompues.
+    '''
+
+    versions_dir = os.path.join(dataset_dir, "versions")
+    versions = sorted((entry for entry in os.scandir(versions_dir) if entry.is_dir() and entry.name != current_version),
+                      key = lambda entry: entry.stat().st_mtime, reverse = True)
+    for entry in versions[NB_VERSIONS_KEPT - 1:]:
+        # Renommage (atomique) avant suppression : la version disparaît d'un coup pour les autres processus
+        trash_path = os.path.join(dataset_dir, f".trash-{entry.name}-{os.getpid()}")
+        try:
+            os.rename(entry.path, trash_path)
+        except OSError:
+            continue
+        shutil.rmtree(trash_path, ignore_errors = True)
+
+    for entry in os.scandir(dataset_dir):
+        if entry.name.startswith(".tmp-") and time.time() - entry.stat().st_mtime > STALE_BUILD_SECONDS:
+            shutil.rmtree(entry.path, ignore_errors = True)
+
+
+def publish_dataset(dataset_dir, version, build):
+    '''
+    Construit et publie une version du jeu de données, si elle n'est pas déjà la version courante.
+
+    Parameters:
+    ----------
+    dataset_dir : str
+        Dossier racine du jeu de données.
+    version : str
+        Version des données sources (voir movie_download.source_version).
+    build : function
+        Fonction écrivant les tables dans le dossier qui lui est passé (voir store_region_tables
+        et build_imdb_partitioned_dataset).
+
+    Returns:
+    -------
+    str
+        Dossier de la version publiée (voir current_dataset_dir).
+
+    Notes:
+    ------
+    La version est construite dans un dossier temporaire propre au processus, puis publiée en une fois par
+    renommage, et enfin désignée comme version courante par l'écriture atomique de "current.json". Les
+    lecteurs voient donc l'ancienne version complète ou la nouvelle, jamais un mélange des deux ; une
+    construction interrompue n'est jamais publiée et sera refaite au démarrage suivant. Si plusieurs
+    instances construisent la même version en même temps, la première publiée est conservée et les
+    autres abandonnent la leur : aucune ne supprime de fichiers en cours de lecture.
+    '''
+
+    path = current_dataset_dir(dataset_dir, version)
+    if path is not None:
+        return path
+
+    versions_dir = os.path.join(dataset_dir, "versions")
+    os.makedirs(versions_dir, exist_ok = True)
+    path = os.path.join(versions_dir, version)
+
+    if not os.path.isdir(path):
+        tmp_path = tempfile.mkdtemp(prefix = ".tmp-", dir = dataset_dir)
+        try:
+            build(tmp_path)
+            os.rename(tmp_path, path)
+        except OSError:
+            # Version publiée entre-temps par une autre instance
+            shutil.rmtree(tmp_path, ignore_errors = True)
+            if not os.path.isdir(path):
+                raise
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors = True)
+            raise
+
+    write_json_atomic(os.path.join(dataset_dir, CURRENT_NAME), {
+        "version" : version, "regions" : list_regions(path), "published_at" : time.time()})
+    _prune_versions(dataset_dir, version)
+    return path
+
+
+def store_region_tables(dataset_dir, region, df_movies, df_title_ratings, df_actors, df_directors):
+    '''
+    Enregistre les tables d'une région déjà chargée (par exemple les fichiers traités depuis GitHub)
+    dans le jeu de données partitionné.
+
+    Parameters:
+    ----------
+    dataset_dir : str
+        Dossier de la version du jeu de données en construction (voir publish_dataset).
+    region : str
+        Code de la région.
+    df_movies : pandas.DataFrame
+        Films de la région (une ligne par film, avec la colonne "startYear").
+    df_title_ratings : pandas.DataFrame
+        Notes des films ; seules celles des films de la région sont enregistrées.
+    df_actors, df_directors : pandas.DataFrame
+        Lignes film - acteur et film - réalisateur, avec la colonne "startYear".
+    '''
+
+    df_ratings = pd.merge(left = df_movies[["tconst", YEAR_COLUMN]], right = df_title_ratings,
+                          how = "inner", on = "tconst")
+    for table, df in zip(TABLES, [df_movies, df_ratings, df_actors, df_directors]):
+        write_partitioned(df, dataset_dir, table, region)
+
+
+def build_imdb_partitioned_dataset(path_akas, path_basics, path_principals, path_name_basics, df_title_ratings,
+    dataset_dir, regions = None, min_year = 1980, memory_budget_mb = 512, chunksize = 600000):
+    '''
+    Construit le jeu de données partitionné de toutes les régions à partir des fichiers IMDb.
+
+    Parameters:
+    ----------
+    path_akas, path_basics, path_principals, path_name_basics : str
+        Chemins ou URLs des fichiers title.akas, title.basics, title.principals et name.basics.
+    df_title_ratings : pandas.DataFrame
+        DataFrame des notes (fichier title.ratings).
+    dataset_dir : str
+        Dossier de la version du jeu de données en construction (voir publish_dataset).
+    regions : list, optional
+        Régions à conserver (toutes par défaut).
+    min_year : int
+        Première année de sortie conservée.
+    memory_budget_mb : int
+        Budget mémoire de la lecture des acteurs et réalisateurs (voir movie_ingestion).
+    chunksize : int
+        Nombre de lignes lues à la fois dans les fichiers title.akas et title.basics.
+
+    Returns:
+    -------
+    list
+        Liste des régions écrites dans le jeu de données.
+
+    Notes:
+    ------
+    Les traitements sont ceux de load_and_process_title_akas_and_basics, sans le filtre sur la région :
+    chaque film est écrit dans la partition de chacune des régions où il est distribué, avec son titre
+    dans cette région. Changer de marché revient alors à lire d'autres partitions, sans relire les fichiers IMDb.
+    Seuls les films conservés (toutes régions) et les notes restent en mémoire : les acteurs et réalisateurs
+    sont lus partition par partition et répartis par région dans des fichiers temporaires, puis écrits une
+    région à la fois. La construction, longue, se fait hors ligne (voir main) et non au démarrage de l'application.
+    '''
+
+    # Films (type "movie") sortis à partir de min_year, avec une durée et des genres
+    list_basics = []
+    df_chunks_basics = read_csv_cached(
+        path_basics, usecols = ['tconst', 'titleType', 'startYear', 'runtimeMinutes', 'genres'],
+        dtype = {'tconst': 'string', 'titleType': 'string', 'startYear': 'string',
+                 'runtimeMinutes': 'string', 'genres': 'string'},
+        delimiter = '\t', low_memory = False, chunksize = chunksize)
+    for chunk in df_chunks_basics:
+        chunk = chunk[(chunk["titleType"] == "movie") & chunk["startYear"].str.isnumeric().fillna(False) &
+                      (chunk["runtimeMinutes"] != "\\N") & (chunk["genres"] != "\\N")]
+        chunk = chunk.astype({"startYear": "int32", "runtimeMinutes": "int32"})
+        list_basics.append(chunk[chunk["startYear"] >= min_year].drop(columns = "titleType"))
+    df_basics = pd.concat(list_basics, ignore_index = True)
+
+    # Titres des films par région
+    list_akas = []
+    df_chunks_akas = read_csv_cached(
+        path_akas, usecols = ['titleId', 'title', 'region'],
+        dtype = {'titleId': 'string', 'title': 'string', 'region': 'string'}, delimiter = '\t',
+        chunksize = chunksize)
+    for chunk in df_chunks_akas:
+        chunk = chunk[chunk["region"].notna() & (chunk["region"] != "\\N") & chunk["titleId"].isin(df_basics["tconst"])]
+        if regions is not None:
+            chunk = chunk[chunk["region"].isin(regions)]
+        list_akas.append(chunk)
+    df_akas = pd.concat(list_akas, ignore_index = True).drop_duplicates(subset = ["titleId", "region"])
+
+    df_movies = pd.merge(left = df_basics, right = df_akas, how = "inner", left_on = "tconst", right_on = "titleId")
+    df_movies = df_movies[["tconst", "title", "startYear", "runtimeMinutes", "genres", "region"]]
+    tconst_filter = df_basics["tconst"]
+    del df_basics, df_akas
+
+    # Films et notes de chaque région
+    list_regions_written = []
+    for region, df_region_movies in df_movies.groupby("region"):
+        df_region_movies = df_region_movies.drop(columns = "region")
+        df_ratings = pd.merge(left = df_region_movies[["tconst", YEAR_COLUMN]], right = df_title_ratings,
+                              how = "inner", on = "tconst")
+        write_partitioned(df_region_movies, dataset_dir, "movies", region)
+        write_partitioned(df_ratings, dataset_dir, "ratings", region)
+        list_regions_written.append(region)
+
+    # Acteurs et réalisateurs des films conservés, lus avec une mémoire bornée partition par partition
+    # (des personnes), et répartis par région dans des fichiers temporaires au fil de la lecture
+    spill_dir = tempfile.mkdtemp(prefix = "imdb_regions_", dir = dataset_dir)
+    try:
+        for df_partitions in iter_title_principals_and_name_basics_out_of_core(
+            path_principals, path_name_basics, df_title_ratings, memory_budget_mb = memory_budget_mb,
+            tconst_filter = tconst_filter, spill_dir = spill_dir):
+            for table, df_persons_ratings in zip(["actors", "directors"], df_partitions):
+                df_persons = pd.merge(left = df_movies, right = df_persons_ratings, how = "inner", on = "tconst")
+                for region, df_region_persons in df_persons.groupby("region"):
+                    spill_path = os.path.join(spill_dir, f"{table}_{region}.tsv")
+                    df_region_persons.drop(columns = "region").to_csv(
+                        spill_path, sep = '\t', index = False, mode = 'a', header = not os.path.exists(spill_path))
+
+        # Écriture des acteurs et réalisateurs, une région à la fois
+        for region in list_regions_written:
+            for table in ["actors", "directors"]:
+                spill_path = os.path.join(spill_dir, f"{table}_{region}.tsv")
+                if not os.path.exists(spill_path):
+                    continue
+                df_persons = pd.read_csv(spill_path, delimiter = '\t', dtype = PERSON_DTYPES,
+                                         keep_default_na = False, na_values = [""])
+                df_persons["weighted_rating"] = df_persons["averageRating"] * df_persons["numVotes"]
+                df_persons["nb_movies"] = 1
+                write_partitioned(df_persons, dataset_dir, table, region)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors = True)
+
+    return list_regions_written
+
+
+def imdb_dataset_version(path_akas, path_basics, path_principals, path_name_basics, path_ratings, revalidate = False):
+    '''
+    Version du jeu de données construit depuis les fichiers IMDb (voir movie_download.source_version).
+    '''
+
+    return source_version([path_akas, path_basics, path_principals, path_name_basics, path_ratings],
+                          revalidate = revalidate)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(
+        description = "Construction hors ligne du jeu de données partitionné de toutes les régions depuis les "
+                      "fichiers IMDb, publié comme version courante s'il a changé")
+    # Par défaut, les fichiers sources de l'application (movie_sources.py) : l'application ne retrouve
+    # le jeu de données que s'il est construit depuis ses propres fichiers
+    parser.add_argument("--akas", default = PATH_TITLE_AKAS)
+    parser.add_argument("--basics", default = PATH_TITLE_BASICS)
+    parser.add_argument("--principals", default = PATH_TITLE_PRINCIPALS)
+    parser.add_argument("--name-basics", default = PATH_NAME_BASICS)
+    parser.add_argument("--ratings", default = URL_TITLE_RATINGS)
+    parser.add_argument("--dataset-dir", default = DATASET_DIR)
+    parser.add_argument("--regions", nargs = "*", help = "régions à conserver (toutes par défaut)")
+    parser.add_argument("--min-year", type = int, default = DATASET_MIN_YEAR)
+    parser.add_argument("--memory-budget-mb", type = int, default = 512)
+    args = parser.parse_args(argv)
+
+    # Les URLs sont revalidées une seule fois, puis lues depuis le cache des téléchargements
+    paths = [local_path(path) for path in [args.akas, args.basics, args.principals, args.name_basics, args.ratings]]
+    version = imdb_dataset_version(args.akas, args.basics, args.principals, args.name_basics, args.ratings)
+    df_title_ratings = pd.read_csv(paths[4], delimiter = '\t', low_memory = False)
+    version_dir = publish_dataset(args.dataset_dir, version, lambda version_dir: build_imdb_partitioned_dataset(
+        *paths[:4], df_title_ratings, version_dir,
+        regions = args.regions, min_year = args.min_year, memory_budget_mb = args.memory_budget_mb))
+    print(f"Version {version} : {len(list_regions(version_dir))} régions dans {version_dir}")
+
+
+if __name__ == "__main__":
+    main()
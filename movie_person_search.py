@@ -0,0 +1,161 @@
+# Recherche d'acteurs et de réalisateurs par nom : index des noms normalisés et listes des films
+# de chaque personne (tableaux de positions dans la table des films du graphe films - personnes)
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from movie_graph import ROLE_ACTOR, ROLE_DIRECTOR
+
+# Libellés des rôles d'une personne dans un film
+ROLE_LABELS = {ROLE_ACTOR : "Acteur/Actrice", ROLE_DIRECTOR : "Réalisateur",
+               ROLE_ACTOR | ROLE_DIRECTOR : "Acteur/Actrice et réalisateur"}
+
+
+def normalize_name(name):
+    '''
+    Normalise un nom pour la recherche : sans accents, en minuscules, la ponctuation remplacée par des espaces
+    ("Émilie Dequenne" -> "emilie dequenne", "Jean-Pierre" -> "jean pierre").
+    '''
+
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(char for char in name if not unicodedata.combining(char)).casefold()
+    return " ".join(re.split(r"[^\w]+", name)).strip()
+
+
+def build_person_search_index(graph, df_movies_ratings):
+    '''
+    Construit l'index de recherche des personnes à partir du graphe films - personnes.
+
+    Parameters:
+    ----------
+    graph : dict
+        Graphe renvoyé par movie_graph.build_cast_graph.
+    df_movies_ratings : pandas.DataFrame
+        Films avec les colonnes "tconst", "title", "startYear", "averageRating" et "numVotes"
+        (une ou plusieurs lignes par film, par exemple les lignes film - acteur).
+
+    Returns:
+    -------
+    dict
+        Dictionnaire contenant :
+        - 'tokens', 'token_persons' : mots des noms normalisés, triés, et personne de chaque mot
+        - 'names', 'nconst' : noms et identifiants des personnes (ceux du graphe)
+        - 'movies' : table des films, dans l'ordre des entiers des films du graphe
+        - 'person_indptr', 'person_indices', 'person_roles' : listes des films de chaque personne
+          (positions dans la table des films) et rôles, reprises du graphe
+        - 'nb_movies', 'numVotes', 'weighted_rating' : statistiques précalculées de chaque personne
+
+    Notes:
+    ------
+    Les mots triés permettent de trouver par recherche dichotomique (numpy.searchsorted) toutes les personnes
+    dont un mot du nom commence par le texte saisi, sans parcourir les noms. Les films d'une personne sont
+    une tranche des listes du graphe, qui renvoient à des positions dans la table des films.
+    '''
+
+    names = graph["names"]
+    nb_persons = len(names)
+
+    # Mots des noms normalisés, triés, avec la personne de chaque mot
+    list_tokens = [normalize_name(name).split() for name in names]
+    token_persons = np.repeat(np.arange(nb_persons), [len(tokens) for tokens in list_tokens])
+    tokens = np.array([token for tokens in list_tokens for token in tokens], dtype = str)
+    order = np.argsort(tokens, kind = "stable")
+
+    # Table des films dans l'ordre des entiers du graphe
+    df_movies = df_movies_ratings[["tconst", "title", "startYear", "averageRating", "numVotes"]].drop_duplicates(
+        subset = "tconst").set_index("tconst").reindex(pd.Index(graph["tconst"], name = "tconst")).reset_index()
+
+    # Nombre de films, votes et moyenne des notes pondérée par les votes de chaque personne,
+    # comme dans les classements des acteurs et réalisateurs
+    person_of_link = np.repeat(np.arange(nb_persons), np.diff(graph["person_indptr"]))
+    votes = df_movies["numVotes"].fillna(0).to_numpy(dtype = np.float64)[graph["person_indices"]]
+    ratings = df_movies["averageRating"].fillna(0).to_numpy(dtype = np.float64)[graph["person_indices"]]
+    sum_votes = np.bincount(person_of_link, weights = votes, minlength = nb_persons)
+    sum_weighted = np.bincount(person_of_link, weights = votes * ratings, minlength = nb_persons)
+    weighted_rating = np.divide(sum_weighted, sum_votes, out = np.full(nb_persons, np.nan), where = sum_votes > 0)
+
+    return {"tokens" : tokens[order], "token_persons" : token_persons[order], "names" : names,
+            "nconst" : graph["nconst"], "movies" : df_movies,
+            "person_indptr" : graph["person_indptr"], "person_indices" : graph["person_indices"],
+            "person_roles" : graph["person_roles"], "nb_movies" : np.diff(graph["person_indptr"]),
+            "numVotes" : sum_votes.astype(np.int64), "weighted_rating" : weighted_rating}
+
+
+def _match_tokens(person_index, query_tokens):
+    '''
+    Renvoie les personnes ayant, pour chaque mot saisi, un mot du nom commençant par ce mot.
+    '''
+
+    tokens = person_index["tokens"]
+    candidates = None
+    for token in query_tokens:
+        # Mots commençant par "token" : tranche [token, token + plus grand caractère) des mots triés
+        start = np.searchsorted(tokens, token, side = "left")
+        end = np.searchsorted(tokens, token + "\U0010ffff", side = "left")
+        persons = np.unique(person_index["token_persons"][start:end])
+        candidates = persons if candidates is None else np.intersect1d(candidates, persons, assume_unique = True)
+    return candidates
+
+
+def search_persons(person_index, query, nb_results = 20):
+    '''
+    Recherche les personnes dont le nom correspond au texte saisi (autocomplétion).
+
+    Parameters:
+    ----------
+    person_index : dict
+        Index renvoyé par build_person_search_index.
+    query : str
+        Texte saisi : chaque mot doit être le début d'un mot du nom ("bel jean" trouve "Jean-Paul Belmondo").
+    nb_results : int
+        Nombre de personnes renvoyées.
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Les personnes trouvées, les plus votées d'abord, avec les colonnes "nconst", "primaryName",
+        "nb_movies", "numVotes" et "weighted_rating", indexées par leur entier dans l'index (voir filmography).
+    '''
+
+    query_tokens = normalize_name(query).split()
+    if len(query_tokens) == 0:
+        candidates = np.array([], dtype = np.int64)
+    else:
+        candidates = _match_tokens(person_index, query_tokens)
+
+    # Les personnes les plus votées d'abord
+    k = min(nb_results, len(candidates))
+    if k > 0:
+        candidates = candidates[np.argpartition(-person_index["numVotes"][candidates], k - 1)[:k]]
+    candidates = candidates[np.argsort(-person_index["numVotes"][candidates], kind = "stable")]
+
+    return pd.DataFrame({"nconst" : person_index["nconst"][candidates], "primaryName" : person_index["names"][candidates],
+                         "nb_movies" : person_index["nb_movies"][candidates],
+                         "numVotes" : person_index["numVotes"][candidates],
+                         "weighted_rating" : person_index["weighted_rating"][candidates]},
+                        index = pd.Index(candidates, name = "person"))
+
+
+def filmography(person_index, person):
+    '''
+    Renvoie les films d'une personne, du plus récent au plus ancien.
+
+    Parameters:
+    ----------
+    person_index : dict
+        Index renvoyé par build_person_search_index.
+    person : int
+        Entier de la personne dans l'index (index du DataFrame renvoyé par search_persons).
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Colonnes "tconst", "title", "startYear", "averageRating", "numVotes" et "role" (voir ROLE_LABELS).
+    '''
+
+    start, end = person_index["person_indptr"][person], person_index["person_indptr"][person + 1]
+    df_filmography = person_index["movies"].iloc[person_index["person_indices"][start:end]].assign(
+        role = [ROLE_LABELS[role] for role in person_index["person_roles"][start:end]])
+    return df_filmography.sort_values(by = ["startYear", "numVotes"], ascending = False).reset_index(drop = True)
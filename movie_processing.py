@@ -0,0 +1,161 @@
+# Traitements des films et des personnes d'une région, partagés par l'application Streamlit et par l'évaluation
+# hors ligne des moteurs de recommandation (movie_evaluation.py) : les deux travaillent sur les mêmes tables
+import pandas as pd
+
+from movie_disk_cache import disk_cache, track_version
+from movie_recommendation import build_recommendation_table
+
+# Nombre d'acteurs et de réalisateurs les plus populaires dont les films sont "recommandés"
+NB_TOP_ACTORS_RECOMMENDED = 200
+NB_TOP_DIRECTORS_RECOMMENDED = 50
+
+
+@disk_cache()
+def process_genres(df):
+    '''
+    Extrait les différents genres à partir du DataFrame donné, transforme la chaîne représentant les genres
+    en liste, supprime certaines lignes en fonction des genres spécifiés, et renvoie un DataFrame des genres.
+
+    Parameters:
+    ----------
+    df : pandas.DataFrame
+        DataFrame contenant les données traitées avec une colonne "genres" représentant les genres de chaque film.
+
+    Returns:
+    -------
+    Tuple[pandas.DataFrame, pandas.DataFrame]
+        Un tuple contenant deux DataFrames :
+        - Le premier DataFrame est une copie du DataFrame d'entrée avec les modifications suivantes :
+            - La colonne "genres" est convertie en listes de genres.
+            - Les lignes contenant des genres spécifiés à supprimer sont supprimées.
+        - Le deuxième DataFrame contient les genres et le nombre d'occurrences de chaque genre.
+
+    Notes:
+    ------
+    La fonction extrait les différents genres présents dans la colonne "genres" du DataFrame donné.
+    Elle transforme la chaîne de genres en une liste de genres. Ensuite, elle crée un dictionnaire
+    qui associe chaque genre à son nombre d'occurrences. Un DataFrame des genres est ensuite créé à
+    partir du dictionnaire, trié par le nombre d'occurrences décroissant. Enfin, la fonction supprime
+    les lignes du DataFrame d'entrée qui contiennent certains genres spécifiés à supprimer, et renvoie
+    le DataFrame modifié ainsi que le DataFrame des genres.
+    '''
+
+    # Création d'une copie du DataFrame et reset des index
+    df_copy = df.copy()
+    df_copy.reset_index(inplace = True, drop = True)
+    df_copy["genres"] = df_copy["genres"].astype("object")
+
+    # Initialisation d'un dictionnaire qui va servir à lister les genres présents, avec :
+        # chaque clé est un genre
+        # chaque valeur est la nombre d'occurences de ce genre
+    dict_genres = {}
+
+    list_tmp = [] # liste temporaire utilisée dans la boucle
+    nb_movies = len(df_copy) # Nbre de films
+
+    # Boucle sur les films de notre DataFrame ..._copy
+    for i in range(nb_movies):
+        list_tmp = df_copy["genres"][i].split(",")
+            # Affectation la liste des genres de la ligne courant à la ligne temp
+        df_copy["genres"][i] = list_tmp
+            # Remplacement de la valeur dans la colonne "genres" par cette liste de genres
+        # Vérification, pour chaque genre de cette liste, s'il est déjà présent dans le dictionnaire
+        for str_genre in list_tmp:
+            if not str_genre in dict_genres:
+                # Si le genre n'est pas dans le dictionnaire, on l'ajoute
+                dict_genres[str_genre] = 1
+            else:
+                # Si le genre est déjà dans le dictionnaire, on incrémente son nombre d'occurences
+                dict_genres[str_genre] += 1
+    
+    # Création d'un DataFrame des genres
+    df_genres = pd.DataFrame.from_dict(dict_genres, orient = 'index', columns = ['Occurences'])
+    df_genres.sort_values(by = "Occurences", ascending = False, inplace = True)
+    df_genres.reset_index(inplace = True)
+    df_genres.rename(columns = {"index" : "Genre"}, inplace = True)
+    df_genres["Selected"] = False
+    
+    # Changement de type de données de la colonne "Genre", passage en type "string"
+    df_genres["Genre"] = df_genres["Genre"].astype("string")
+
+    # Liste des genres que l'on veut supprimer
+    list_genres_to_delete = ['Adult','News', 'Reality-TV', 'Talk-Show', 'Short', 'Game-Show']
+
+    # Ajout d'une colonne "genres_to_delete" montrant s'il y a l'un des genres à supprimer dans la colonne "genres" (True)
+    df_copy["genres_to_delete"] = df_copy.genres.apply(lambda x : any(gen in x for gen in list_genres_to_delete))
+    
+    # Suppression des lignes pour lesquelles "genres_to_delete" est True, c'est-à-dire
+    # les lignes ayant un genre que l'on veut supprimer
+    df_copy.drop(df_copy[df_copy.genres_to_delete == True].index, inplace = True)
+    
+    # Reset des index
+    df_copy.reset_index(inplace = True, drop = True)
+    
+    # Suppression de la colonne temporaire "genres_to_delete"
+    df_copy.drop("genres_to_delete", axis = 1, inplace = True)
+    
+    return df_copy, df_genres
+
+
+@track_version()
+def keep_processed_movies(movies_genres, df_persons):
+    '''
+    Renvoie les lignes film - personne (acteur ou réalisateur) des seuls films conservés par process_genres
+    (movies_genres est le résultat de process_genres).
+    '''
+
+    return df_persons[df_persons["tconst"].isin(movies_genres[0]["tconst"])]
+
+
+@track_version()
+def group_persons_votes_ratings(df_movies_persons_rating):
+    '''
+    Renvoie, par personne (acteur ou réalisateur), le nombre de votes, la moyenne pondérée des notes
+    ("weighted_rating") et le nombre de films.
+    '''
+
+    # Création d'un nouveau DataFrame en conservant les colonnes qui nous intéressent
+    df_persons_votes_ratings = df_movies_persons_rating[
+        ["nconst", "primaryName", "numVotes", "weighted_rating", "nb_movies", "startYear"]]
+
+    # Groupement des données par personne, en sommant les autres colonnes
+    df_group_persons_votes_ratings = df_persons_votes_ratings.groupby(by = ["primaryName"]).agg(
+        {"numVotes" : "sum", "weighted_rating" : "sum", "nb_movies" : "sum"})
+
+    # Calcul de la moyenne des notes pondérée en divisant weighted_rating par le nombre de votes
+    df_group_persons_votes_ratings["weighted_rating"] = \
+        df_group_persons_votes_ratings["weighted_rating"] / df_group_persons_votes_ratings["numVotes"]
+
+    # Reset des index pour remettre le nom de la personne en colonne
+    df_group_persons_votes_ratings.reset_index(inplace = True)
+
+    return df_group_persons_votes_ratings
+
+
+@disk_cache()
+def build_movies_recommendation(df_movies_actors_rating, df_movies_directors_rating, df_group_actors_votes_ratings,
+                                df_group_directors_votes_ratings):
+    '''
+    Renvoie le DataFrame des films à recommander (une ligne par film, avec la colonne "recommended"), calculé
+    une seule fois par version des données à partir des acteurs et des réalisateurs ayant le plus de votes
+    (mêmes classements que les "tops" de l'application sur toutes les années).
+
+    Parameters:
+    ----------
+    df_movies_actors_rating, df_movies_directors_rating : pandas.DataFrame
+        Lignes film - acteur et film - réalisateur des films conservés (voir keep_processed_movies).
+    df_group_actors_votes_ratings, df_group_directors_votes_ratings : pandas.DataFrame
+        Classements des acteurs et des réalisateurs (voir group_persons_votes_ratings).
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Voir movie_recommendation.build_recommendation_table.
+    '''
+
+    df_top_actors = df_group_actors_votes_ratings.sort_values(
+        by = ['numVotes'], ascending = False).head(NB_TOP_ACTORS_RECOMMENDED)
+    df_top_directors = df_group_directors_votes_ratings.sort_values(
+        by = ['numVotes'], ascending = False).head(NB_TOP_DIRECTORS_RECOMMENDED)
+    return build_recommendation_table(df_movies_actors_rating, df_movies_directors_rating,
+                                      df_top_actors["primaryName"], df_top_directors["primaryName"])
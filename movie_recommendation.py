@@ -0,0 +1,479 @@
+# Moteurs de recommandation de films utilisés par l'application Streamlit
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import normalize
+
+# Variables numériques utilisées par les moteurs de recommandation
+NUMERIC_COLUMNS = ["startYear", "runtimeMinutes", "averageRating", "numVotes", "recommended"]
+
+# Colonnes affichées dans le tableau des films recommandés, et leurs libellés
+RECOMMENDATION_COLUMNS = {"startYear" : "Année", "runtimeMinutes" : "Durée", "genres" : "Genres", "title": "Titre",
+    "averageRating" : "Note moy.", "numVotes" : "Nbre de votes", "recommended" : "Recommandé"}
+
+
+def parse_genres(genres):
+    '''
+    Transforme la représentation des genres d'un film en liste de genres.
+
+    Parameters:
+    ----------
+    genres : str ou list
+        Genres du film, sous forme de liste ou de chaîne ("Drama,Comedy", "['Drama', 'Comedy']"
+        ou "'Drama', 'Comedy'" selon la source des données).
+
+    Returns:
+    -------
+    list
+        Liste des genres du film, sans espaces, crochets ni guillemets.
+    '''
+
+    if isinstance(genres, (list, tuple, np.ndarray)):
+        return [str(genre) for genre in genres]
+    if not isinstance(genres, str):
+        return []
+    list_genres = [genre.strip(" '\"") for genre in genres.strip("[]").split(",")]
+    return [genre for genre in list_genres if len(genre) > 0]
+
+
+def _remove_brackets(string):
+    '''
+    Supprime les crochets ("[" et "]") au début et à la fin d'une chaîne de caractères.
+    '''
+
+    if len(string) > 0:
+        if string[0] == "[":
+            string = string[1:]
+        if string[-1] == "]":
+            string = string[:-1]
+        return string
+    else:
+        return ""
+
+
+def build_recommendation_table(df_actors, df_directors, top_actors_names, top_directors_names):
+    '''
+    Construit le DataFrame des films utilisé par les moteurs de recommandation (une ligne par film),
+    avec la colonne "recommended".
+
+    Parameters:
+    ----------
+    df_actors : pandas.DataFrame
+        Lignes film - acteur, avec les colonnes des films ("tconst", "startYear", "runtimeMinutes", "genres",
+        "title", "averageRating", "numVotes") et le nom de l'acteur ("primaryName").
+    df_directors : pandas.DataFrame
+        Lignes film - réalisateur, avec les colonnes "tconst" et "primaryName".
+    top_actors_names, top_directors_names : list
+        Noms des acteurs les plus populaires (top 200) et des réalisateurs les plus populaires (top 50).
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Une ligne par film ayant au moins un acteur et un réalisateur, avec la colonne "recommended".
+
+    Notes:
+    ------
+    Critères pour passer "recommandé" à 1 (pour chaque couple acteur - réalisateur du film, la colonne
+    "recommended" étant la somme sur les couples) :
+    60 min <= durée <= 180 min ET
+        1. nbre votes >= 100 K ET note moyenne >= 7 OU
+        2. nbre votes >= 10 K ET note moyenne >= 5 ET acteur dans le top 200 des acteurs les plus populaires OU
+        3. nbre votes >= 10 K ET note moyenne >= 5 ET réalisateur dans le top 50 des réalisateurs les plus populaires
+
+    Les couples acteur - réalisateur ne sont pas construits : on compte, par film (identifiant entier),
+    les acteurs, les acteurs du top, les réalisateurs et les réalisateurs du top (semi-jointures sur
+    les noms des tops), et la somme sur les couples s'en déduit. Pour un film vérifiant le critère 1, tous
+    les couples comptent (nb_acteurs x nb_réalisateurs) ; pour un film vérifiant seulement le critère de
+    popularité, les couples ayant un acteur ou un réalisateur du top comptent
+    (nb_top_acteurs x nb_réalisateurs + nb_acteurs x nb_top_réalisateurs - nb_top_acteurs x nb_top_réalisateurs).
+    '''
+
+    movie_columns = ["tconst", "startYear", "runtimeMinutes", "genres", "title", "averageRating", "numVotes"]
+
+    # Identifiants entiers des films, communs aux acteurs et aux réalisateurs
+    movie_codes, tconst = pd.factorize(pd.concat([df_actors["tconst"], df_directors["tconst"]], ignore_index = True))
+    actor_codes, director_codes = movie_codes[:len(df_actors)], movie_codes[len(df_actors):]
+    nb_movies = len(tconst)
+
+    # Nombre d'acteurs et de réalisateurs de chaque film, et nombre de ceux appartenant aux tops
+    nb_actors = np.bincount(actor_codes, minlength = nb_movies)
+    nb_top_actors = np.bincount(actor_codes, weights = df_actors["primaryName"].isin(top_actors_names).to_numpy(),
+                                minlength = nb_movies).astype(np.int64)
+    nb_directors = np.bincount(director_codes, minlength = nb_movies)
+    nb_top_directors = np.bincount(
+        director_codes, weights = df_directors["primaryName"].isin(top_directors_names).to_numpy(),
+        minlength = nb_movies).astype(np.int64)
+
+    # Une ligne par film ayant au moins un acteur et un réalisateur
+    has_director = nb_directors[actor_codes] > 0
+    df_recommendation = df_actors.loc[has_director, movie_columns].drop_duplicates(subset = "tconst")
+    df_recommendation = df_recommendation.dropna().sort_values(by = "tconst").reset_index(drop = True)
+    codes = tconst.get_indexer(df_recommendation["tconst"])
+
+    runtime_ok = ((df_recommendation['runtimeMinutes'] >= 60) & (df_recommendation['runtimeMinutes'] <= 180)).to_numpy()
+    popular = runtime_ok & ((df_recommendation['numVotes'] >= 10000) & (df_recommendation['averageRating'] >= 5)).to_numpy()
+    very_popular = runtime_ok & (
+        (df_recommendation['numVotes'] >= 100000) & (df_recommendation['averageRating'] >= 7)).to_numpy()
+
+    # Somme du critère sur les couples acteur - réalisateur de chaque film
+    nb_pairs = nb_actors[codes] * nb_directors[codes]
+    nb_top_pairs = (nb_top_actors[codes] * nb_directors[codes] + nb_actors[codes] * nb_top_directors[codes] -
+                    nb_top_actors[codes] * nb_top_directors[codes])
+    df_recommendation["recommended"] = np.where(very_popular, nb_pairs, np.where(popular, nb_top_pairs, 0))
+
+    # Changement de type des colonnes
+    df_recommendation = df_recommendation.astype(
+        {"recommended" : int, "startYear" : int, "runtimeMinutes" : int, "title" : "string"})
+
+    # Suppression des crochets ("brackets" "[" et "]") de la chaîne de caractères des genres
+    df_recommendation["genres"] = df_recommendation["genres"].apply(_remove_brackets)
+
+    return df_recommendation
+
+
+def recommend_movies_nearest_neighbors(df_movies, list_all_genres, titre_film, k = 50):
+    '''
+    Recommande des films proches d'un film choisi, avec le modèle "NearestNeighbors" entraîné
+    sur les variables numériques des films ayant des genres en commun avec le film choisi.
+
+    Parameters:
+    ----------
+    df_movies : pandas.DataFrame
+        DataFrame des films (une ligne par film) avec les colonnes "title", "genres" et NUMERIC_COLUMNS.
+    list_all_genres : list
+        Liste de tous les genres connus.
+    titre_film : str
+        Titre du film choisi.
+    k : int
+        Nombre de voisins demandés au modèle.
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Les k films les plus proches, du plus proche au plus éloigné (vide si le titre est inconnu).
+
+    Notes:
+    ------
+    Les films candidats sont d'abord filtrés par "paliers" de genres : les films ayant tous les genres
+    du film choisi s'il y en a au moins 50, sinon ceux ayant tous ses genres sauf un.
+    '''
+
+    if not (df_movies["title"] == titre_film).any():
+        return df_movies.iloc[0:0]
+
+    # Définition des genres du film choisi
+    genres_film = df_movies.loc[df_movies["title"] == titre_film, "genres"].values[0]
+
+    # Définition de la liste des genres du film choisi
+    list_genres_film = []
+    for genre in list_all_genres:
+        if genre in genres_film:
+            list_genres_film.append(genre)
+
+    # Fonction vérifiant si un genre de la liste est compris dans une chaîne
+    def check_genre_match(string):
+        nb_matches = 0
+        for genre in list_genres_film:
+            if genre in string:
+                nb_matches += 1
+        return nb_matches
+
+    # Copie du DataFrame de base dans un df temporaire df_movie_tmp
+    df_movie_tmp = df_movies.copy()
+
+    # Suppression du film choisi par l'utilisateur du DataFrame d'entraînement
+    df_movie_tmp = df_movie_tmp[df_movie_tmp["title"] != titre_film]
+
+    # Application de la fonction pour vérifier si les genres du film choisi "matchent"
+    # avec les genres des films du DataFrame
+    df_movie_tmp["nb_genre_matches"] = df_movie_tmp["genres"].apply(check_genre_match)
+
+    # On ne garde que les films pour lesquels le genre "matche" avec le film choisi
+    nb_mini_genre_matches = 50
+    if len(df_movie_tmp[df_movie_tmp["nb_genre_matches"] == len(list_genres_film)]) >= nb_mini_genre_matches:
+        df_movie_tmp = df_movie_tmp[df_movie_tmp["nb_genre_matches"] == len(list_genres_film)]
+    elif len(list_genres_film) > 1:
+        df_movie_tmp = df_movie_tmp[df_movie_tmp["nb_genre_matches"] >= len(list_genres_film) - 1]
+    else:
+        df_movie_tmp = df_movie_tmp[df_movie_tmp["nb_genre_matches"] == len(list_genres_film)]
+
+    if len(df_movie_tmp) == 0:
+        return df_movie_tmp
+
+    # Définition des variable explicatives X, ici nos variables quantitatives (numériques)
+    X = df_movie_tmp[NUMERIC_COLUMNS]
+
+    # Création et entraînement du modèle "NearestNeighbors" (plus proches voisins)
+    modelNN = NearestNeighbors(n_neighbors = min(k, len(X))).fit(X)
+
+    # kneighbors renvoie les distances et indices des k plus proches voisins renoyés par le modèle :
+    neighbors = modelNN.kneighbors(df_movies.loc[df_movies['title'] == titre_film, X.columns].head(1))
+
+    # DataFrame des films recommandés, à partir des index des plus proches voisins
+    return df_movie_tmp.iloc[neighbors[1][0]]
+
+
+def format_recommendations(df_recommended_movies, nb_movies = 10):
+    '''
+    Met en forme les films recommandés pour l'affichage : on privilégie les films "recommandés"
+    s'il y en a suffisamment, on renomme les colonnes et on ne garde que les premiers films.
+
+    Parameters:
+    ----------
+    df_recommended_movies : pandas.DataFrame
+        Films recommandés, du plus pertinent au moins pertinent.
+    nb_movies : int
+        Nombre de films à afficher.
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Films recommandés avec les colonnes renommées pour l'affichage.
+    '''
+
+    df_recommended_movies = df_recommended_movies[list(RECOMMENDATION_COLUMNS)]
+    if len(df_recommended_movies[df_recommended_movies.recommended > 0]) > nb_movies:
+        df_recommended_movies = df_recommended_movies[df_recommended_movies.recommended > 0]
+    df_recommended_movies = df_recommended_movies.rename(columns = RECOMMENDATION_COLUMNS)
+    return df_recommended_movies.head(nb_movies)
+
+
+def _tfidf_block(df_links, movie_index, nb_movies):
+    '''
+    Construit la matrice creuse films x personnes (acteurs ou réalisateurs) pondérée par TF-IDF,
+    dont les lignes sont normalisées (norme L2).
+    '''
+
+    # Lignes (films) et colonnes (personnes) de chaque lien film - personne
+    rows = movie_index.get_indexer(df_links["tconst"])
+    person_codes, _ = pd.factorize(df_links["nconst"])
+    df_pairs = pd.DataFrame({"row" : rows, "col" : person_codes})
+    df_pairs = df_pairs[df_pairs["row"] >= 0].drop_duplicates()
+    nb_persons = int(person_codes.max()) + 1 if len(person_codes) > 0 else 0
+
+    # IDF "lissé" : une personne présente dans peu de films est plus discriminante
+    document_frequency = np.bincount(df_pairs["col"].to_numpy(), minlength = nb_persons)
+    idf = np.log((1 + nb_movies) / (1 + document_frequency)) + 1
+
+    matrix = sparse.csr_matrix(
+        (idf[df_pairs["col"].to_numpy()], (df_pairs["row"].to_numpy(), df_pairs["col"].to_numpy())),
+        shape = (nb_movies, nb_persons), dtype = np.float32)
+    return normalize(matrix, norm = "l2", axis = 1)
+
+
+def build_content_index(df_movies, df_actors, df_directors, genres_weight = 1.0, actors_weight = 1.0,
+    directors_weight = 1.0):
+    '''
+    Construit l'index de similarité de contenu des films : une matrice creuse films x caractéristiques
+    (genres en "multi-hot", acteurs et réalisateurs pondérés par TF-IDF) et les variables numériques
+    standardisées.
+
+    Parameters:
+    ----------
+    df_movies : pandas.DataFrame
+        DataFrame des films (une ligne par film) avec les colonnes "tconst", "genres" et NUMERIC_COLUMNS.
+    df_actors : pandas.DataFrame
+        DataFrame des liens film - acteur, avec les colonnes "tconst" et "nconst".
+    df_directors : pandas.DataFrame
+        DataFrame des liens film - réalisateur, avec les colonnes "tconst" et "nconst".
+    genres_weight, actors_weight, directors_weight : float
+        Poids relatifs des blocs de caractéristiques dans la similarité cosinus.
+
+    Returns:
+    -------
+    dict
+        Dictionnaire contenant :
+        - 'tconst' : identifiants des films, dans l'ordre des lignes des matrices
+        - 'features' : matrice creuse (CSR) films x caractéristiques, lignes de norme 1
+        - 'numeric' : matrice des variables numériques standardisées
+        - 'genres' : liste des genres, dans l'ordre des colonnes du bloc des genres
+
+    Notes:
+    ------
+    Chaque bloc est normalisé puis multiplié par la racine de son poids, avant une normalisation
+    finale des lignes : le produit scalaire de deux lignes est alors une similarité cosinus
+    pondérée par bloc. Le nombre de votes est passé au logarithme avant la standardisation,
+    pour qu'il ne domine plus les distances.
+    '''
+
+    df_movies = df_movies.reset_index(drop = True)
+    movie_index = pd.Index(df_movies["tconst"])
+    nb_movies = len(df_movies)
+
+    # Bloc des genres : une colonne par genre, 1 si le film a ce genre
+    list_movie_genres = df_movies["genres"].apply(parse_genres)
+    df_movie_genres = list_movie_genres.explode().dropna()
+    genre_codes, list_genres = pd.factorize(df_movie_genres)
+    genres_block = sparse.csr_matrix(
+        (np.ones(len(genre_codes), dtype = np.float32), (df_movie_genres.index.to_numpy(), genre_codes)),
+        shape = (nb_movies, len(list_genres)))
+    genres_block.sum_duplicates()
+    genres_block.data[:] = 1
+    genres_block = normalize(genres_block, norm = "l2", axis = 1)
+
+    # Blocs des acteurs et des réalisateurs, pondérés par TF-IDF
+    actors_block = _tfidf_block(df_actors, movie_index, nb_movies)
+    directors_block = _tfidf_block(df_directors, movie_index, nb_movies)
+
+    features = sparse.hstack([
+        genres_block * np.sqrt(genres_weight),
+        actors_block * np.sqrt(actors_weight),
+        directors_block * np.sqrt(directors_weight)], format = "csr", dtype = np.float32)
+    features = normalize(features, norm = "l2", axis = 1)
+
+    # Variables numériques standardisées
+    numeric = df_movies[NUMERIC_COLUMNS].to_numpy(dtype = np.float64)
+    numeric[:, NUMERIC_COLUMNS.index("numVotes")] = np.log1p(numeric[:, NUMERIC_COLUMNS.index("numVotes")])
+    std = numeric.std(axis = 0)
+    std[std == 0] = 1
+    numeric = ((numeric - numeric.mean(axis = 0)) / std).astype(np.float32)
+
+    return {"tconst" : movie_index.to_numpy(), "features" : features, "numeric" : numeric,
+            "genres" : list(list_genres)}
+
+
+def score_movies(content_index, query_rows, blend_weight = 0.5, negative_rows = (), negative_weight = 0.5):
+    '''
+    Calcule le score de similarité de tous les films avec un ou plusieurs films requêtes.
+
+    Parameters:
+    ----------
+    content_index : dict
+        Index renvoyé par build_content_index.
+    query_rows : array-like of int
+        Lignes des films requêtes (films aimés) dans l'index.
+    blend_weight : float
+        Poids de la similarité de contenu (genres, acteurs, réalisateurs) entre 0 et 1,
+        le reste étant donné à la similarité des variables numériques.
+    negative_rows : array-like of int
+        Lignes des films pas aimés, dont la similarité est retranchée.
+    negative_weight : float
+        Poids des films pas aimés face aux films aimés.
+
+    Returns:
+    -------
+    numpy.ndarray
+        Score de chaque film de l'index (plus il est élevé, plus le film est proche).
+
+    Notes:
+    ------
+    La similarité de contenu est obtenue par un seul produit matrice creuse - vecteur creux,
+    sans ré-entraînement de modèle. La similarité numérique vaut 1 / (1 + distance euclidienne).
+    Avec plusieurs films, le vecteur requête est un "profil" : la moyenne des lignes des films aimés,
+    moins negative_weight fois la moyenne des lignes des films pas aimés. Le coût du calcul ne dépend
+    donc pas du nombre de films requêtes, tous les films étant notés en un seul passage.
+    '''
+
+    query_rows = np.atleast_1d(query_rows)
+    negative_rows = np.atleast_1d(np.asarray(negative_rows, dtype = np.int64))
+
+    # Vecteur requête : moyenne des lignes des films aimés, moins celle des films pas aimés
+    query_vector = content_index["features"][query_rows].mean(axis = 0)
+    if len(negative_rows) > 0:
+        query_vector = query_vector - negative_weight * content_index["features"][negative_rows].mean(axis = 0)
+    query_vector = sparse.csr_matrix(query_vector)
+    content_scores = np.asarray((content_index["features"] @ query_vector.T).todense()).ravel()
+
+    numeric_query = content_index["numeric"][query_rows].mean(axis = 0)
+    numeric_distances = np.sqrt(((content_index["numeric"] - numeric_query) ** 2).sum(axis = 1))
+    numeric_scores = 1 / (1 + numeric_distances)
+    if len(negative_rows) > 0:
+        numeric_negative = content_index["numeric"][negative_rows].mean(axis = 0)
+        numeric_scores = numeric_scores - negative_weight / (
+            1 + np.sqrt(((content_index["numeric"] - numeric_negative) ** 2).sum(axis = 1)))
+
+    return blend_weight * content_scores + (1 - blend_weight) * numeric_scores
+
+
+def top_k_rows(scores, k, exclude_rows = ()):
+    '''
+    Renvoie les lignes des k meilleurs scores, triées par score décroissant, sans les lignes exclues.
+    La sélection se fait avec numpy.argpartition, sans trier l'ensemble des scores.
+    '''
+
+    scores = np.array(scores, dtype = np.float64)
+    scores[np.asarray(exclude_rows, dtype = np.int64)] = -np.inf
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.array([], dtype = np.int64)
+    rows = np.argpartition(-scores, k - 1)[:k]
+    return rows[np.argsort(-scores[rows], kind = "stable")]
+
+
+def recommend_movies_content(content_index, df_movies, titre_film, k = 50, blend_weight = 0.5):
+    '''
+    Recommande des films proches d'un film choisi avec l'index de similarité de contenu.
+
+    Parameters:
+    ----------
+    content_index : dict
+        Index renvoyé par build_content_index à partir de df_movies.
+    df_movies : pandas.DataFrame
+        DataFrame des films ayant servi à construire l'index (mêmes lignes, même ordre).
+    titre_film : str
+        Titre du film choisi.
+    k : int
+        Nombre de films renvoyés.
+    blend_weight : float
+        Poids de la similarité de contenu face aux variables numériques (voir score_movies).
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Les k films les plus proches, du plus proche au plus éloigné (vide si le titre est inconnu).
+    '''
+
+    query_rows = np.flatnonzero((df_movies["title"] == titre_film).to_numpy())
+    if len(query_rows) == 0:
+        return df_movies.iloc[0:0]
+
+    # Même comportement que le modèle des plus proches voisins : le premier film portant ce titre
+    # sert de requête, tous les films de ce titre sont exclus des résultats
+    scores = score_movies(content_index, query_rows[:1], blend_weight)
+    return df_movies.iloc[top_k_rows(scores, k, exclude_rows = query_rows)]
+
+
+def recommend_movies_profile(content_index, df_movies, liked_titles, disliked_titles = (), k = 50, blend_weight = 0.5,
+    negative_weight = 0.5):
+    '''
+    Recommande des films à partir d'un profil de goûts : plusieurs films aimés et, éventuellement, pas aimés.
+
+    Parameters:
+    ----------
+    content_index : dict
+        Index renvoyé par build_content_index à partir de df_movies.
+    df_movies : pandas.DataFrame
+        DataFrame des films ayant servi à construire l'index (mêmes lignes, même ordre).
+    liked_titles : list
+        Titres des films aimés.
+    disliked_titles : list
+        Titres des films pas aimés.
+    k : int
+        Nombre de films renvoyés.
+    blend_weight : float
+        Poids de la similarité de contenu face aux variables numériques (voir score_movies).
+    negative_weight : float
+        Poids des films pas aimés face aux films aimés (voir score_movies).
+
+    Returns:
+    -------
+    pandas.DataFrame
+        Les k films les plus proches du profil, sans les films aimés ni pas aimés (vide si aucun
+        titre aimé n'est connu).
+    '''
+
+    titles = df_movies["title"].to_numpy()
+
+    # Comme pour un seul film, le premier film portant chaque titre sert au profil,
+    # tous les films de ces titres sont exclus des résultats
+    liked = np.isin(titles, list(liked_titles))
+    disliked = np.isin(titles, list(disliked_titles))
+    if not liked.any():
+        return df_movies.iloc[0:0]
+    liked_rows = pd.Series(np.flatnonzero(liked)).groupby(titles[liked]).first().to_numpy()
+    disliked_rows = pd.Series(np.flatnonzero(disliked), dtype = np.int64).groupby(titles[disliked]).first().to_numpy()
+
+    scores = score_movies(content_index, liked_rows, blend_weight, negative_rows = disliked_rows,
+                          negative_weight = negative_weight)
+    return df_movies.iloc[top_k_rows(scores, k, exclude_rows = np.flatnonzero(liked | disliked))]
@@ -0,0 +1,19 @@
+# Fichiers sources IMDb, partagés par l'application et par la construction hors ligne du jeu de données
+# partitionné (python movie_partitions.py) : la version du jeu de données est calculée sur ces fichiers,
+# l'application ne retrouve donc le jeu de données construit que s'ils sont les mêmes des deux côtés
+
+# Chemins des fichiers IMDb (chargement depuis IMDb ou en local)
+#PATH_TITLE_AKAS = r"https://datasets.imdbws.com/title.akas.tsv.gz"
+PATH_TITLE_AKAS = r"C:/Données/d_ Wild Code School/d_ Projet 02/datasets/title_akas.tsv"
+#PATH_TITLE_BASICS = r"https://datasets.imdbws.com/title.basics.tsv.gz"
+PATH_TITLE_BASICS = r"C:/Données/d_ Wild Code School/d_ Projet 02/datasets/title_basics.tsv"
+#PATH_TITLE_PRINCIPALS = r"https://datasets.imdbws.com/title.principals.tsv.gz"
+PATH_TITLE_PRINCIPALS = r"C:/Données/d_ Wild Code School/d_ Projet 02/datasets/title_principals.tsv"
+#PATH_NAME_BASICS = r"https://datasets.imdbws.com/name.basics.tsv.gz"
+PATH_NAME_BASICS = r"C:/Données/d_ Wild Code School/d_ Projet 02/datasets/name_basics.tsv"
+
+# URL du fichier des notes sur IMDb
+URL_TITLE_RATINGS = r"https://datasets.imdbws.com/title.ratings.tsv.gz"
+
+# Première année de sortie des films conservés
+DATASET_MIN_YEAR = 1980
@@ -0,0 +1,173 @@
+# Préchargement ("warm-up") des données en arrière-plan, au démarrage du serveur
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# États possibles d'une tâche de préchargement
+STATUS_PENDING = "en attente"
+STATUS_RUNNING = "en cours"
+STATUS_DONE = "prêt"
+STATUS_ERROR = "erreur"
+
+
+class WarmUp:
+    '''
+    Charge les sources de données en parallèle, puis calcule les tables dérivées en arrière-plan
+    dès que les données dont elles dépendent sont disponibles.
+
+    Parameters:
+    ----------
+    sources : dict
+        Dictionnaire nom -> fonction sans argument chargeant une source de données.
+    derived : dict, optional
+        Dictionnaire nom -> (fonction, liste des noms des dépendances). La fonction est appelée
+        avec les résultats des dépendances, dans l'ordre de la liste.
+    max_workers : int, optional
+        Nombre maximum de threads chargeant les sources (par défaut, un par source).
+    max_derived_workers : int, optional
+        Nombre maximum de threads calculant les tables dérivées (par défaut, un par table dérivée).
+
+    Notes:
+    ------
+    Les sources étant surtout des téléchargements et des lectures de fichiers, les threads passent
+    l'essentiel de leur temps en attente d'entrées/sorties : le temps de chargement total est celui
+    de la source la plus lente, et non la somme des temps de chargement. Les tables dérivées ont leurs
+    propres threads : une table prête à être calculée n'attend pas la fin du chargement des autres sources.
+    '''
+
+    def __init__(self, sources, derived = None, max_workers = None, max_derived_workers = None):
+        self._sources = dict(sources)
+        self._derived = dict(derived or {})
+        self._executor = ThreadPoolExecutor(max_workers = max_workers or max(1, len(self._sources)),
+                                            thread_name_prefix = "warm_up")
+        self._derived_executor = ThreadPoolExecutor(
+            max_workers = max_derived_workers or max(1, len(self._derived)), thread_name_prefix = "warm_up_derived")
+        self._lock = threading.Lock()
+        self._futures = {name: Future() for name in list(self._sources) + list(self._derived)}
+        self._status = {name: STATUS_PENDING for name in self._futures}
+        self._durations = {}
+        self._started_at = None
+
+    def _run(self, name, func, *args):
+        '''
+        Exécute une tâche dans un thread, et renseigne son état, sa durée et son résultat.
+        '''
+
+        future = self._futures[name]
+        if not future.set_running_or_notify_cancel():
+            return
+        self._status[name] = STATUS_RUNNING
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except BaseException as error:
+            self._status[name] = STATUS_ERROR
+            future.set_exception(error)
+        else:
+            self._status[name] = STATUS_DONE
+            future.set_result(result)
+        finally:
+            self._durations[name] = time.perf_counter() - start
+
+    def _schedule_derived(self, name):
+        '''
+        Lance le calcul d'une table dérivée dès que toutes ses dépendances sont disponibles.
+        '''
+
+        func, dependencies = self._derived[name]
+        remaining = [len(dependencies)]
+
+        def on_dependency_done(_):
+            with self._lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            dependency_futures = [self._futures[dependency] for dependency in dependencies]
+            failed = [future for future in dependency_futures if future.exception() is not None]
+            if failed:
+                self._status[name] = STATUS_ERROR
+                self._futures[name].set_exception(failed[0].exception())
+            else:
+                self._derived_executor.submit(self._run, name, func,
+                                              *[future.result() for future in dependency_futures])
+
+        if len(dependencies) == 0:
+            self._derived_executor.submit(self._run, name, func)
+        for dependency in dependencies:
+            self._futures[dependency].add_done_callback(on_dependency_done)
+
+    def start(self):
+        '''
+        Lance le chargement de toutes les sources et la préparation des tables dérivées.
+        '''
+
+        self._started_at = time.perf_counter()
+        for name in self._derived:
+            self._schedule_derived(name)
+        for name, func in self._sources.items():
+            self._executor.submit(self._run, name, func)
+        return self
+
+    def retry_failed(self):
+        '''
+        Relance les tâches en erreur (source injoignable, fichier manquant...) et les tables dérivées qui
+        en dépendent, une fois toutes les tâches terminées. Les résultats des autres tâches sont conservés.
+        Renvoie la liste des tâches relancées.
+        '''
+
+        with self._lock:
+            # Tâches encore en cours : une table dérivée en attente dépend peut-être d'une tâche en erreur
+            if not all(future.done() for future in self._futures.values()):
+                return []
+            failed = [name for name, status in self._status.items() if status == STATUS_ERROR]
+            # Les tables dérivées d'une tâche en erreur sont elles aussi en erreur : toutes sont relancées
+            for name in failed:
+                self._futures[name] = Future()
+                self._status[name] = STATUS_PENDING
+                self._durations.pop(name, None)
+
+        for name in failed:
+            if name in self._derived:
+                self._schedule_derived(name)
+        for name in failed:
+            if name in self._sources:
+                self._executor.submit(self._run, name, self._sources[name])
+        return failed
+
+    def status(self):
+        '''
+        Renvoie un dictionnaire nom -> état de chaque tâche.
+        '''
+
+        return dict(self._status)
+
+    def durations(self):
+        '''
+        Renvoie un dictionnaire nom -> durée (en secondes) de chaque tâche terminée.
+        '''
+
+        return dict(self._durations)
+
+    def is_ready(self, names = None):
+        '''
+        Indique si les tâches données (toutes par défaut) sont terminées.
+        '''
+
+        names = self._futures if names is None else names
+        return all(self._futures[name].done() for name in names)
+
+    def progress(self, names = None):
+        '''
+        Renvoie la proportion (entre 0 et 1) des tâches données (toutes par défaut) qui sont terminées.
+        '''
+
+        names = list(self._futures if names is None else names)
+        return sum(self._futures[name].done() for name in names) / max(1, len(names))
+
+    def result(self, name, timeout = None):
+        '''
+        Renvoie le résultat d'une tâche, en attendant sa fin si besoin.
+        L'exception levée par la tâche est relevée en cas d'erreur.
+        '''
+
+        return self._futures[name].result(timeout = timeout)
@@ -0,0 +1,42 @@
+# Tests des cumuls par année
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_aggregates import build_cumulative_aggregates, window_sums, yearly_values
+
+# Une personne nommée "NA" est lue comme une valeur manquante par pandas.read_csv
+CSV_PERSONS = '''primaryName,startYear,numVotes,nb_movies
+Jean Gabin,1980,100,1
+Jean Gabin,1985,50,1
+NA,1985,70,1
+Lino Ventura,1990,30,1
+'''
+
+
+def test_rows_without_key_are_ignored_like_groupby():
+    df = pd.read_csv(io.StringIO(CSV_PERSONS))
+    assert df["primaryName"].isna().sum() == 1
+
+    aggregates = build_cumulative_aggregates(df, "primaryName", ["numVotes", "nb_movies"])
+    df_window = window_sums(aggregates, 1980, 1990)
+
+    df_expected = df.groupby("primaryName")[["numVotes", "nb_movies"]].sum()
+    pd.testing.assert_frame_equal(df_window, df_expected, check_names = False)
+    assert list(yearly_values(aggregates, 1980, 1990)["key"]) == ["Jean Gabin", "Jean Gabin", "Lino Ventura"]
+
+
+def test_window_sums_match_groupby_on_the_period():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"genres" : rng.choice(["Drama", "Comedy", "Action"], 500),
+                       "startYear" : rng.integers(1980, 2020, 500), "numVotes" : rng.integers(0, 1000, 500)})
+    aggregates = build_cumulative_aggregates(df, "genres", ["numVotes"])
+
+    df_period = df[df["startYear"].between(1990, 1999)]
+    df_expected = df_period.groupby("genres")[["numVotes"]].sum()
+    pd.testing.assert_frame_equal(window_sums(aggregates, 1990, 1999), df_expected, check_names = False)
@@ -0,0 +1,92 @@
+# Tests des clés du cache des résultats sur le disque
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import movie_disk_cache
+from movie_disk_cache import disk_cache, mark_version, track_version
+
+DF_RATINGS = pd.DataFrame({"tconst" : ["tt0000001", "tt0000002", "tt0000003"], "averageRating" : [7.5, 8.0, 6.0],
+                           "numVotes" : [100, 200, 300]})
+
+
+def count_content_hashes(monkeypatch):
+    # Nombre de DataFrames hachés par leur contenu
+    calls = []
+    hash_pandas_object = pd.util.hash_pandas_object
+    monkeypatch.setattr(pd.util, "hash_pandas_object", lambda *args, **kwargs: calls.append(1) or
+                        hash_pandas_object(*args, **kwargs))
+    return calls
+
+
+def cache_entries(cache_dir):
+    return [name for name in os.listdir(cache_dir) if not name.startswith(".")]
+
+
+def test_results_are_passed_on_by_key_without_hashing_their_content(tmp_path, monkeypatch):
+    calls = count_content_hashes(monkeypatch)
+
+    @disk_cache(cache_dir = str(tmp_path))
+    def load(version):
+        return DF_RATINGS.copy()
+
+    @track_version()
+    def weight(df):
+        return df.assign(weighted_rating = df["averageRating"] * df["numVotes"])
+
+    @disk_cache(cache_dir = str(tmp_path))
+    def total(df):
+        return float(df["weighted_rating"].sum())
+
+    assert total(weight(load("v1"))) == 4150.0
+    # Second appel : résultats relus sur le disque, identifiés par les mêmes clés
+    assert total(weight(load("v1"))) == 4150.0
+    assert len(calls) == 0
+    assert len(cache_entries(tmp_path)) == 2
+
+    # Autre version des données : nouvelles clés, nouveaux résultats
+    total(weight(load("v2")))
+    assert len(calls) == 0
+    assert len(cache_entries(tmp_path)) == 4
+
+
+def test_unmarked_arguments_are_hashed_by_content(tmp_path, monkeypatch):
+    calls = count_content_hashes(monkeypatch)
+    nb_calls = []
+
+    @disk_cache(cache_dir = str(tmp_path))
+    def total(df):
+        nb_calls.append(1)
+        return int(df["numVotes"].sum())
+
+    assert total(DF_RATINGS.copy()) == total(DF_RATINGS.copy()) == 600
+    assert len(nb_calls) == 1
+    assert len(calls) == 2
+
+
+def test_container_items_are_marked_and_keys_are_forgotten(tmp_path):
+    df, array = DF_RATINGS.copy(), np.arange(3)
+    mark_version((df, {"votes" : array}), "k")
+
+    assert movie_disk_cache._value_key(df) == "k/0"
+    assert movie_disk_cache._value_key(array) == "k/1/votes"
+    assert movie_disk_cache._value_key(DF_RATINGS) is None
+
+    del df
+    assert "k/0" not in [key for ref, key in movie_disk_cache._VALUE_KEYS.values()]
+
+
+def test_cached_dataframe_numeric_columns_are_memory_mapped(tmp_path):
+    @disk_cache(cache_dir = str(tmp_path))
+    def load():
+        return DF_RATINGS.copy()
+
+    load()
+    df = load()
+
+    pd.testing.assert_frame_equal(df, DF_RATINGS, check_dtype = False)
+    assert not df["numVotes"].to_numpy().flags.owndata
@@ -0,0 +1,213 @@
+# Tests de la couche de téléchargement, avec un serveur HTTP local à la place des serveurs IMDb et GitHub
+import gzip
+import hashlib
+import http.server
+import os
+import sys
+import threading
+import urllib.error
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import movie_download
+from movie_download import cached_download, read_cache_metadata, read_csv_cached, source_version
+from movie_ingestion import load_title_principals_and_name_basics_out_of_core
+
+
+class FileServer(http.server.ThreadingHTTPServer):
+    '''
+    Serveur HTTP local servant des fichiers en mémoire, avec ETag et réponses conditionnelles.
+    '''
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FileHandler)
+        self.files = {}
+        self.status_code = None
+        self.nb_requests = 0
+        self.nb_transfers = 0
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.server_address[1]}/{name}"
+
+
+class FileHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        server.nb_requests += 1
+        if server.status_code is not None:
+            self.send_error(server.status_code)
+            return
+        content = server.files.get(self.path.lstrip("/"))
+        if content is None:
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.sha256(content).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        server.nb_transfers += 1
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FileServer()
+    thread = threading.Thread(target = server.serve_forever, daemon = True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse = True)
+def no_proxy(monkeypatch):
+    # Les requêtes vers le serveur local ne doivent pas passer par un proxy
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+
+
+def test_unchanged_file_is_not_transferred_again(server, tmp_path):
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t10\n"
+    url = server.url("ratings.tsv")
+
+    path = cached_download(url, cache_dir = str(tmp_path))
+    assert cached_download(url, cache_dir = str(tmp_path)) == path
+    assert server.nb_transfers == 1
+    assert read_cache_metadata(url, str(tmp_path))["sha256"] == hashlib.sha256(server.files["ratings.tsv"]).hexdigest()
+
+
+def test_changed_file_is_downloaded_and_changes_the_version(server, tmp_path):
+    url = server.url("ratings.tsv")
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t10\n"
+    version = source_version([url], cache_dir = str(tmp_path), revalidate = True)
+
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t11\n"
+    path = cached_download(url, cache_dir = str(tmp_path))
+
+    assert server.nb_transfers == 2
+    with open(path, "rb") as file:
+        assert file.read() == server.files["ratings.tsv"]
+    assert source_version([url], cache_dir = str(tmp_path)) != version
+
+
+@pytest.mark.parametrize("status_code", [500, 502, 503])
+def test_server_error_falls_back_to_the_cache(server, tmp_path, status_code):
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t10\n"
+    url = server.url("ratings.tsv")
+    path = cached_download(url, cache_dir = str(tmp_path))
+
+    server.status_code = status_code
+    assert cached_download(url, cache_dir = str(tmp_path)) == path
+
+
+def test_server_error_without_cache_is_raised(server, tmp_path):
+    server.status_code = 503
+    with pytest.raises(urllib.error.HTTPError):
+        cached_download(server.url("ratings.tsv"), cache_dir = str(tmp_path))
+
+
+def test_missing_file_is_raised_even_with_cache(server, tmp_path):
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t10\n"
+    url = server.url("ratings.tsv")
+    cached_download(url, cache_dir = str(tmp_path))
+
+    del server.files["ratings.tsv"]
+    with pytest.raises(urllib.error.HTTPError):
+        cached_download(url, cache_dir = str(tmp_path))
+
+
+def test_unreachable_server_falls_back_to_the_cache(server, tmp_path):
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t10\n"
+    url = server.url("ratings.tsv")
+    path = cached_download(url, cache_dir = str(tmp_path))
+
+    server.shutdown()
+    server.server_close()
+    assert cached_download(url, cache_dir = str(tmp_path), timeout = 5) == path
+
+
+def test_unchanged_cache_file_is_not_hashed_again(server, tmp_path, monkeypatch):
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t10\n"
+    url = server.url("ratings.tsv")
+    cached_download(url, cache_dir = str(tmp_path))
+
+    calls = []
+    file_sha256 = movie_download._file_sha256
+    monkeypatch.setattr(movie_download, "_file_sha256", lambda path: calls.append(path) or file_sha256(path))
+    cached_download(url, cache_dir = str(tmp_path))
+    assert calls == []
+
+
+def test_cache_file_is_reused_without_request_when_not_revalidated(server, tmp_path):
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t10\n"
+    url = server.url("ratings.tsv")
+    source_version([url], cache_dir = str(tmp_path), revalidate = True)
+    nb_requests = server.nb_requests
+
+    df = read_csv_cached(url, cache_dir = str(tmp_path), revalidate = False, delimiter = "\t")
+    assert server.nb_requests == nb_requests
+    assert list(df["tconst"]) == ["tt0000001"]
+
+
+def test_cache_file_not_matching_its_metadata_is_downloaded_again(server, tmp_path):
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t10\n"
+    url = server.url("ratings.tsv")
+    path = cached_download(url, cache_dir = str(tmp_path))
+
+    # Arrêt entre l'écriture d'un nouveau fichier (même taille) et celle de ses métadonnées
+    with open(path, "wb") as file:
+        file.write(b"tconst\tnumVotes\ntt0000001\t99\n")
+    cached_download(url, cache_dir = str(tmp_path), revalidate = False)
+    assert server.nb_transfers == 2
+    with open(path, "rb") as file:
+        assert file.read() == server.files["ratings.tsv"]
+
+
+def test_corrupted_cache_file_is_downloaded_again(server, tmp_path):
+    server.files["ratings.tsv"] = b"tconst\tnumVotes\ntt0000001\t10\n"
+    url = server.url("ratings.tsv")
+    path = cached_download(url, cache_dir = str(tmp_path))
+    with open(path, "wb") as file:
+        file.write(b"fichier corrompu")
+
+    cached_download(url, cache_dir = str(tmp_path))
+    assert server.nb_transfers == 2
+    with open(path, "rb") as file:
+        assert file.read() == server.files["ratings.tsv"]
+
+
+def test_out_of_core_loading_reads_urls_through_the_cache(server, tmp_path, monkeypatch):
+    monkeypatch.setattr("movie_download.CACHE_DIR", str(tmp_path / "cache"))
+    server.files["title.principals.tsv.gz"] = gzip.compress(
+        b"tconst\tordering\tnconst\tcategory\n"
+        b"tt0000001\t1\tnm0000001\tactor\ntt0000001\t2\tnm0000002\tdirector\ntt0000002\t1\tnm0000001\tactor\n")
+    server.files["name.basics.tsv.gz"] = gzip.compress(
+        b"nconst\tprimaryName\nnm0000001\tJean Gabin\nnm0000002\tJean Renoir\n")
+    df_ratings = pd.DataFrame({"tconst" : ["tt0000001", "tt0000002"], "averageRating" : [7.5, 8.0],
+                               "numVotes" : [100, 200]})
+
+    for _ in range(2):
+        df_actors, df_directors = load_title_principals_and_name_basics_out_of_core(
+            server.url("title.principals.tsv.gz"), server.url("name.basics.tsv.gz"), df_ratings,
+            spill_dir = str(tmp_path))
+
+    assert server.nb_transfers == 2
+    assert sorted(df_actors["tconst"]) == ["tt0000001", "tt0000002"]
+    assert df_directors["primaryName"].tolist() == ["Jean Renoir"]
+
+    # Les fichiers ".gz" du cache sont lus directement par pandas
+    df_names = read_csv_cached(server.url("name.basics.tsv.gz"), delimiter = "\t")
+    assert df_names["primaryName"].tolist() == ["Jean Gabin", "Jean Renoir"]
+    assert server.nb_transfers == 2
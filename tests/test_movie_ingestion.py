@@ -0,0 +1,155 @@
+# Tests de la lecture "out-of-core" des fichiers title.principals et name.basics
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import movie_ingestion
+from movie_ingestion import _nb_partitions, load_title_principals_and_name_basics_out_of_core
+
+
+def write_imdb_files(directory, nb_rows, nb_movies = 20000, nb_persons = 40000, seed = 0):
+    '''
+    Écrit des fichiers title.principals, name.basics (compressés) et title.ratings synthétiques.
+    '''
+
+    rng = np.random.default_rng(seed)
+    df_principals = pd.DataFrame({
+        "tconst" : pd.Series(rng.integers(0, nb_movies, nb_rows)).map("tt{:07d}".format),
+        "ordering" : 1,
+        "nconst" : pd.Series(rng.integers(0, nb_persons, nb_rows)).map("nm{:07d}".format),
+        "category" : rng.choice(["actor", "actress", "director", "writer", "producer"], nb_rows),
+        "job" : "\\N",
+        "characters" : '["Personnage"]'})
+    df_names = pd.DataFrame({"nconst" : [f"nm{person:07d}" for person in range(nb_persons)],
+                             "primaryName" : [f"Prénom Nom{person}" for person in range(nb_persons)],
+                             "birthYear" : 1970})
+    df_ratings = pd.DataFrame({"tconst" : [f"tt{movie:07d}" for movie in range(nb_movies)],
+                               "averageRating" : rng.integers(10, 100, nb_movies) / 10,
+                               "numVotes" : rng.integers(1, 10000, nb_movies)})
+
+    paths = {name : os.path.join(directory, file_name) for name, file_name in
+             [("principals", "title.principals.tsv.gz"), ("names", "name.basics.tsv.gz"), ("ratings", "title.ratings.tsv")]}
+    df_principals.to_csv(paths["principals"], sep = "\t", index = False)
+    df_names.to_csv(paths["names"], sep = "\t", index = False)
+    df_ratings.to_csv(paths["ratings"], sep = "\t", index = False)
+    return paths
+
+
+def read_ratings(path):
+    return pd.read_csv(path, delimiter = "\t", dtype = {"tconst" : "string"})
+
+
+def load_in_memory(paths, df_ratings, categories):
+    '''
+    Chargement de référence : les deux fichiers entiers en mémoire.
+    '''
+
+    df_principals = pd.read_csv(paths["principals"], delimiter = "\t", usecols = ["tconst", "nconst", "category"],
+                                dtype = "string")
+    df_principals = df_principals[df_principals["category"].isin(categories)].drop_duplicates()
+    df_names = pd.read_csv(paths["names"], delimiter = "\t", usecols = ["nconst", "primaryName"], dtype = "string")
+    return df_principals.merge(df_names, on = "nconst").merge(df_ratings, on = "tconst")
+
+
+def sort_rows(df):
+    return df.astype({"category" : "string"}).sort_values(["tconst", "nconst", "category"]).reset_index(drop = True)
+
+
+def test_same_rows_as_in_memory_loading_with_duplicates_across_chunks(tmp_path):
+    # Beaucoup de doublons (peu de films et de personnes), répartis sur plusieurs "chunks" de 10000 lignes
+    paths = write_imdb_files(tmp_path, nb_rows = 60000, nb_movies = 300, nb_persons = 300)
+    df_ratings = read_ratings(paths["ratings"])
+
+    df_actors, df_directors = load_title_principals_and_name_basics_out_of_core(
+        paths["principals"], paths["names"], df_ratings, memory_budget_mb = 8, spill_dir = str(tmp_path))
+
+    for df_result, categories in [(df_actors, ["actor", "actress"]), (df_directors, ["director"])]:
+        df_expected = load_in_memory(paths, df_ratings, categories)
+        assert not df_result.duplicated(["tconst", "nconst", "category"]).any()
+        pd.testing.assert_frame_equal(sort_rows(df_result)[df_expected.columns], sort_rows(df_expected),
+                                      check_dtype = False)
+
+
+def test_partitions_too_large_for_the_budget_are_split(tmp_path, monkeypatch):
+    # Une seule partition au départ, estimée trop grande pour le budget : elle doit être redécoupée
+    paths = write_imdb_files(tmp_path, nb_rows = 60000, nb_movies = 3000, nb_persons = 3000)
+    df_ratings = read_ratings(paths["ratings"])
+    monkeypatch.setattr(movie_ingestion, "_nb_partitions", lambda paths, memory_budget_bytes: 1)
+    monkeypatch.setattr(movie_ingestion, "MEMORY_EXPANSION_FACTOR", 50)
+    splits = []
+    split_partition = movie_ingestion._split_partition
+    monkeypatch.setattr(movie_ingestion, "_split_partition", lambda *args: splits.append(args) or
+                        split_partition(*args))
+
+    df_actors, df_directors = load_title_principals_and_name_basics_out_of_core(
+        paths["principals"], paths["names"], df_ratings, memory_budget_mb = 16, spill_dir = str(tmp_path))
+
+    assert len(splits) > 0
+    for df_result, categories in [(df_actors, ["actor", "actress"]), (df_directors, ["director"])]:
+        df_expected = load_in_memory(paths, df_ratings, categories)
+        pd.testing.assert_frame_equal(sort_rows(df_result)[df_expected.columns], sort_rows(df_expected),
+                                      check_dtype = False)
+
+
+def test_result_larger_than_the_budget_raises_memory_error(tmp_path):
+    paths = write_imdb_files(tmp_path, nb_rows = 60000, nb_movies = 3000, nb_persons = 3000)
+
+    with pytest.raises(MemoryError):
+        load_title_principals_and_name_basics_out_of_core(
+            paths["principals"], paths["names"], read_ratings(paths["ratings"]), memory_budget_mb = 1,
+            spill_dir = str(tmp_path))
+
+
+def test_nb_partitions_accounts_for_compression(tmp_path):
+    paths = write_imdb_files(tmp_path, nb_rows = 50000)
+    compressed_size = os.path.getsize(paths["principals"]) + os.path.getsize(paths["names"])
+    budget_bytes = compressed_size * 2
+
+    # Sur la taille compressée, une seule partition suffirait
+    assert _nb_partitions([paths["principals"], paths["names"]], budget_bytes) > 1
+
+
+PEAK_MEMORY_SCRIPT = textwrap.dedent('''
+    import sys
+    sys.path.insert(0, {package_dir!r})
+    import pandas as pd
+    from movie_ingestion import load_title_principals_and_name_basics_out_of_core
+    df_ratings = pd.read_csv({ratings!r}, delimiter = "\\t", dtype = {{"tconst" : "string"}})
+    tconst_filter = df_ratings["tconst"].iloc[::20]
+    def peak_kb():
+        with open("/proc/self/status") as file:
+            return int(next(line for line in file if line.startswith("VmHWM")).split()[1])
+    before = peak_kb()
+    result = load_title_principals_and_name_basics_out_of_core(
+        {principals!r}, {names!r}, df_ratings, memory_budget_mb = {budget_mb!r}, tconst_filter = tconst_filter)
+    print((peak_kb() - before) / 1024)
+''')
+
+
+def peak_memory_increase_mb(paths, budget_mb):
+    '''
+    Augmentation du pic de mémoire résidente (en Mo, Linux) d'un processus neuf pendant le chargement.
+    '''
+
+    script = PEAK_MEMORY_SCRIPT.format(package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                       ratings = paths["ratings"], principals = paths["principals"],
+                                       names = paths["names"], budget_mb = budget_mb)
+    output = subprocess.run([sys.executable, "-c", script], capture_output = True, text = True, check = True)
+    return float(output.stdout.split()[-1])
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason = "pic de mémoire lu dans /proc (Linux)")
+def test_peak_memory_below_budget(tmp_path):
+    paths = write_imdb_files(tmp_path, nb_rows = 1500000, nb_movies = 100000, nb_persons = 200000)
+
+    # Le pic de mémoire comprend les notes des films conservés (5 %), le résultat et les fusions.
+    # Mesuré : environ 8 Mo pour un budget de 16 Mo, 25 Mo pour 32 Mo (170 Mo en lisant les fichiers entiers)
+    for budget_mb in [16, 32]:
+        assert peak_memory_increase_mb(paths, budget_mb) < budget_mb
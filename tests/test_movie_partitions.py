@@ -0,0 +1,115 @@
+# Tests de la publication par version du jeu de données partitionné
+import multiprocessing
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import movie_partitions
+from movie_partitions import (current_dataset_dir, imdb_dataset_version, list_regions, publish_dataset, read_partitions,
+                              store_region_tables)
+
+DF_MOVIES = pd.DataFrame({"tconst" : ["tt0000001", "tt0000002"], "title" : ["Le Cercle rouge", "Ran"],
+                          "startYear" : [1985, 1995]})
+DF_RATINGS = pd.DataFrame({"tconst" : ["tt0000001", "tt0000002"], "averageRating" : [7.5, 8.0],
+                           "numVotes" : [100, 200]})
+
+
+def build_region(version_dir, region = "FR"):
+    store_region_tables(version_dir, region, DF_MOVIES, DF_RATINGS, DF_MOVIES, DF_MOVIES)
+
+
+def test_publish_makes_the_version_current(tmp_path):
+    version_dir = publish_dataset(str(tmp_path), "v1", build_region)
+
+    assert current_dataset_dir(str(tmp_path)) == version_dir
+    assert current_dataset_dir(str(tmp_path), "v1") == version_dir
+    assert current_dataset_dir(str(tmp_path), "v2") is None
+    assert list_regions(version_dir) == ["FR"]
+    assert len(read_partitions(version_dir, "movies", "FR", year_min = 1990)) == 1
+
+
+def test_same_version_is_not_built_again(tmp_path):
+    publish_dataset(str(tmp_path), "v1", build_region)
+    publish_dataset(str(tmp_path), "v1", lambda version_dir: pytest.fail("version déjà publiée"))
+
+
+def test_interrupted_build_is_never_published(tmp_path):
+    version_dir = publish_dataset(str(tmp_path), "v1", build_region)
+
+    def interrupted_build(version_dir):
+        build_region(version_dir)
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        publish_dataset(str(tmp_path), "v2", interrupted_build)
+
+    assert current_dataset_dir(str(tmp_path)) == version_dir
+    assert sorted(os.listdir(tmp_path)) == ["current.json", "versions"]
+
+
+def test_new_version_replaces_the_current_one_and_old_versions_are_pruned(tmp_path):
+    for version in ["v1", "v2", "v3"]:
+        publish_dataset(str(tmp_path), version, lambda version_dir, version = version: build_region(
+            version_dir, region = version.upper()))
+
+    assert list_regions(current_dataset_dir(str(tmp_path))) == ["V3"]
+    # La version courante et la précédente sont conservées
+    assert sorted(os.listdir(tmp_path / "versions")) == ["v2", "v3"]
+
+
+def publish_v1(dataset_dir):
+    return publish_dataset(dataset_dir, "v1", build_region)
+
+
+def test_concurrent_builds_publish_a_single_version(tmp_path):
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        version_dirs = pool.map(publish_v1, [str(tmp_path)] * 4)
+
+    assert len(set(version_dirs)) == 1
+    assert sorted(os.listdir(tmp_path)) == ["current.json", "versions"]
+    assert len(read_partitions(version_dirs[0], "actors", "FR")) == 2
+
+
+def write_imdb_sources(directory):
+    '''
+    Écrit des fichiers IMDb minimaux (deux films distribués en France, l'un aussi aux États-Unis).
+    '''
+
+    tables = {
+        "title.akas.tsv" : pd.DataFrame({"titleId" : ["tt0000001", "tt0000002", "tt0000002"],
+                                         "title" : ["Le Cercle rouge", "Ran", "Ran"], "region" : ["FR", "FR", "US"]}),
+        "title.basics.tsv" : pd.DataFrame({"tconst" : ["tt0000001", "tt0000002"], "titleType" : "movie",
+                                           "startYear" : ["1985", "1995"], "runtimeMinutes" : ["140", "162"],
+                                           "genres" : ["Crime,Drama", "Drama"]}),
+        "title.principals.tsv" : pd.DataFrame({"tconst" : ["tt0000001", "tt0000002"], "nconst" : ["nm1", "nm2"],
+                                               "category" : ["actor", "director"]}),
+        "name.basics.tsv" : pd.DataFrame({"nconst" : ["nm1", "nm2"], "primaryName" : ["Alain Delon", "Akira Kurosawa"]}),
+        "title.ratings.tsv" : DF_RATINGS}
+    paths = {}
+    for file_name, df in tables.items():
+        paths[file_name] = str(directory / file_name)
+        df.to_csv(paths[file_name], sep = "\t", index = False)
+    return paths
+
+
+def test_offline_build_is_found_with_the_application_sources(tmp_path, monkeypatch):
+    # La construction hors ligne, sans option, lit les fichiers sources de l'application (movie_sources)
+    paths = write_imdb_sources(tmp_path)
+    for constant, file_name in [("PATH_TITLE_AKAS", "title.akas.tsv"), ("PATH_TITLE_BASICS", "title.basics.tsv"),
+                                ("PATH_TITLE_PRINCIPALS", "title.principals.tsv"),
+                                ("PATH_NAME_BASICS", "name.basics.tsv"), ("URL_TITLE_RATINGS", "title.ratings.tsv")]:
+        monkeypatch.setattr(movie_partitions, constant, paths[file_name])
+    dataset_dir = str(tmp_path / "dataset")
+
+    movie_partitions.main(["--dataset-dir", dataset_dir])
+
+    version = imdb_dataset_version(movie_partitions.PATH_TITLE_AKAS, movie_partitions.PATH_TITLE_BASICS,
+                                   movie_partitions.PATH_TITLE_PRINCIPALS, movie_partitions.PATH_NAME_BASICS,
+                                   movie_partitions.URL_TITLE_RATINGS)
+    version_dir = current_dataset_dir(dataset_dir, version)
+    assert list_regions(version_dir) == ["FR", "US"]
+    assert list(read_partitions(version_dir, "directors", "US")["primaryName"]) == ["Akira Kurosawa"]
@@ -0,0 +1,47 @@
+# Tests des traitements des films et des personnes partagés par l'application et par l'évaluation
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import movie_disk_cache
+from movie_processing import group_persons_votes_ratings, keep_processed_movies, process_genres
+
+DF_MOVIES = pd.DataFrame({
+    "tconst" : ["tt0000001", "tt0000002", "tt0000003"], "title" : ["Le Cercle rouge", "Journal", "Le Samouraï"],
+    "startYear" : [1980, 1981, 1982], "runtimeMinutes" : [140, 30, 105], "genres" : ["Crime,Drama", "News", "Crime"],
+    "averageRating" : [8.0, 6.0, 7.5], "numVotes" : [100, 50, 80]})
+
+DF_ACTORS = pd.DataFrame({
+    "tconst" : ["tt0000001", "tt0000002", "tt0000003", "tt0000001"],
+    "nconst" : ["nm0000001", "nm0000002", "nm0000001", "nm0000003"],
+    "primaryName" : ["Alain Delon", "Présentateur", "Alain Delon", "Yves Montand"],
+    "startYear" : [1980, 1981, 1982, 1980], "numVotes" : [100, 50, 80, 100], "averageRating" : [8.0, 6.0, 7.5, 8.0]})
+
+
+@pytest.fixture(autouse = True)
+def results_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(movie_disk_cache, "RESULTS_CACHE_DIR", str(tmp_path))
+
+
+def persons(df_movies, df_persons):
+    return df_persons.merge(df_movies[["tconst", "title", "runtimeMinutes", "genres"]], on = "tconst").assign(
+        weighted_rating = lambda df: df["averageRating"] * df["numVotes"], nb_movies = 1)
+
+
+def test_persons_of_excluded_genres_are_dropped():
+    movies_genres = process_genres(DF_MOVIES)
+    assert list(movies_genres[0]["tconst"]) == ["tt0000001", "tt0000003"]
+    assert "News" in set(movies_genres[1]["Genre"])
+
+    df_actors = keep_processed_movies(movies_genres, DF_ACTORS)
+    assert "Présentateur" not in set(df_actors["primaryName"])
+
+    df_group = group_persons_votes_ratings(persons(movies_genres[0], df_actors))
+    assert df_group.set_index("primaryName")["numVotes"].to_dict() == {"Alain Delon" : 180, "Yves Montand" : 100}
+    assert df_group.set_index("primaryName").loc["Alain Delon", "weighted_rating"] == pytest.approx(
+        (8.0 * 100 + 7.5 * 80) / 180)
+
@@ -0,0 +1,36 @@
+# Tests du préchargement des données en arrière-plan
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_warmup import STATUS_DONE, STATUS_ERROR, WarmUp
+
+
+def test_failed_tasks_and_their_dependents_are_retried():
+    calls = {"Films" : 0, "Notes" : 0}
+
+    def load_movies():
+        calls["Films"] += 1
+        if calls["Films"] == 1:
+            raise FileNotFoundError("movies.csv")
+        return ["Le Cercle rouge"]
+
+    def load_ratings():
+        calls["Notes"] += 1
+        return [7.5]
+
+    warm_up = WarmUp({"Films" : load_movies, "Notes" : load_ratings},
+                     {"Films notés" : (lambda movies, ratings: list(zip(movies, ratings)), ["Films", "Notes"])}).start()
+    with pytest.raises(FileNotFoundError):
+        warm_up.result("Films notés", timeout = 10)
+    warm_up.result("Notes", timeout = 10)
+    assert warm_up.status() == {"Films" : STATUS_ERROR, "Notes" : STATUS_DONE, "Films notés" : STATUS_ERROR}
+
+    assert sorted(warm_up.retry_failed()) == ["Films", "Films notés"]
+    assert warm_up.result("Films notés", timeout = 10) == [("Le Cercle rouge", 7.5)]
+    # La source chargée sans erreur n'est pas rechargée
+    assert calls == {"Films" : 2, "Notes" : 1}
+    assert warm_up.retry_failed() == []